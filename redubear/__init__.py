@@ -6,6 +6,8 @@
 # according to those terms.
 from . import benchmark
 from . import memory
+from . import oracle
+from . import commands
 from . import utils
 from . import reducers
 
@@ -5,4 +5,10 @@
 # This file may not be copied, modified, or distributed except
 # according to those terms.
 from .tests import Tests
+from .scheduler import CpuBudget, RuntimeEstimator, longest_first, predict_makespan
+from .calibration import calibrate
+from .result_cache import ResultCache
+from .exporter import ProgressExporter
+from .adaptive import AdaptiveConcurrency
+from .remote import Agent, Coordinator
 from .benchmark import Benchmark
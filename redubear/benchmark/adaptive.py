@@ -0,0 +1,173 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import json
+import time
+
+from os import sched_getaffinity
+from pathlib import Path
+
+from redubear.benchmark.exporter import _process_tree_usage
+from redubear.utils import get_logger
+
+# PSI thresholds (share of the time in %, avg10) of lowering and of raising the concurrency.
+CPU_PRESSURE_HIGH = 40.
+CPU_PRESSURE_LOW = 10.
+MEMORY_PRESSURE_HIGH = 10.
+MEMORY_PRESSURE_LOW = 1.
+# Runnable tasks per CPU above which the concurrency is lowered.
+RUN_QUEUE_HIGH = 1.5
+# Memory (MB) kept free for the rest of the machine.
+MEMORY_HEADROOM = 512
+
+
+def read_pressure(resource: str) -> float:
+    """
+    The avg10 of the "some" line of /proc/pressure/<resource> (None if PSI is unavailable).
+    """
+    try:
+        with open(f'/proc/pressure/{resource}') as pressure:
+            for line in pressure:
+                if line.startswith('some'):
+                    return float(line.split()[1].split('=')[1])
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+def read_memory_available() -> float:
+    """
+    MemAvailable of /proc/meminfo in MB (None if unavailable).
+    """
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024.
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def read_run_queue() -> int:
+    """
+    The number of runnable tasks of the machine (from /proc/loadavg), except the reader.
+    """
+    try:
+        with open('/proc/loadavg') as loadavg:
+            return int(loadavg.read().split()[3].split('/')[0]) - 1
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class AdaptiveConcurrency:
+    """
+    Raises or lowers the number of concurrent reductions (between min_workers and
+    max_workers) based on the CPU and memory pressure (PSI), the available memory and
+    the run queue of the machine: one step down under pressure, one step up if the
+    machine is idle and every slot is used. Admission is memory-aware: a run is started
+    only if the historical peak RSS of its test fits into the available memory next to
+    the expected growth of the running ones. Every decision is appended to a JSON Lines
+    log.
+    """
+
+    def __init__(self, max_workers: int, min_workers: int = 1, interval: float = 5., log: Path = None) -> None:
+        self.max_workers = max(max_workers, 1)
+        self.min_workers = max(min(min_workers, self.max_workers), 1)
+        self.limit = max(self.max_workers // 2, self.min_workers)
+        self.interval = interval
+        self.log = log
+        self.cpus = len(sched_getaffinity(0))
+        self.last_update = 0.
+        self.reserved = dict()
+        self.deferred = set()
+        self.logger = get_logger('ReduBear')
+
+    def start(self) -> None:
+        self.logger.info(f'Adaptive concurrency: {self.limit} (between {self.min_workers} and {self.max_workers}) reductions.')
+        self.record({'event': 'start', 'limit': self.limit, 'min_workers': self.min_workers, 'max_workers': self.max_workers})
+
+    def update(self, running: int) -> int:
+        """
+        Adjusts the concurrency limit (at most once per interval) and returns it.
+        """
+        now = time.time()
+        if now - self.last_update < self.interval:
+            return self.limit
+        self.last_update = now
+
+        state = {
+            'cpu_pressure': read_pressure('cpu'),
+            'memory_pressure': read_pressure('memory'),
+            'memory_available (MB)': read_memory_available(),
+            'run_queue': read_run_queue(),
+        }
+        cpu, memory, available, run_queue = state.values()
+
+        reason = None
+        limit = self.limit
+        if memory is not None and memory > MEMORY_PRESSURE_HIGH:
+            limit, reason = limit - 1, 'memory pressure'
+        elif available is not None and available < MEMORY_HEADROOM:
+            limit, reason = limit - 1, 'low available memory'
+        elif cpu is not None and cpu > CPU_PRESSURE_HIGH:
+            limit, reason = limit - 1, 'cpu pressure'
+        elif run_queue is not None and run_queue > RUN_QUEUE_HIGH * self.cpus:
+            limit, reason = limit - 1, 'long run queue'
+        elif running >= self.limit and (cpu is None or cpu < CPU_PRESSURE_LOW) \
+                and (memory is None or memory < MEMORY_PRESSURE_LOW) and (run_queue is None or run_queue < self.cpus):
+            limit, reason = limit + 1, 'idle resources'
+
+        limit = min(max(limit, self.min_workers), self.max_workers)
+        if limit != self.limit:
+            self.logger.info(f'Concurrency {self.limit} -> {limit} ({reason}): {state}')
+            self.record(dict(state, event='limit', previous=self.limit, limit=limit, reason=reason, running=running))
+            self.limit = limit
+
+        return self.limit
+
+    def memory(self) -> tuple:
+        """
+        The available memory of the machine and the RSS of the running reductions (MB).
+        Read once per admission, not for every queued run.
+        """
+        return read_memory_available(), sum(rss for _, rss in _process_tree_usage().values()) / (1024 * 1024)
+
+    def fits(self, job, peak: float, running: int, available: float, current: float) -> bool:
+        """
+        Whether a run with the given historical peak RSS (MB, None if unknown) can be
+        started next to the running reductions using current MB, with available MB free
+        (None if unknown). The first run is always admitted.
+        """
+        if not peak or running == 0 or available is None:
+            return True
+
+        # The running reductions may not have reached their peaks yet (the runs admitted
+        # since the memory was read are only reserved).
+        outstanding = max(sum(self.reserved.values()) - current, 0.)
+        if peak + outstanding + MEMORY_HEADROOM <= available:
+            return True
+
+        if job not in self.deferred:
+            self.deferred.add(job)
+            self.logger.info(f'Deferred {job}: peak {peak:.0f} MB, outstanding {outstanding:.0f} MB, available {available:.0f} MB')
+            self.record({'event': 'deferred', 'job': job, 'peak (MB)': peak, 'outstanding (MB)': outstanding,
+                         'memory_available (MB)': available, 'running': running})
+        return False
+
+    def acquire(self, job, peak: float) -> None:
+        self.deferred.discard(job)
+        self.reserved[job] = peak or 0.
+
+    def release(self, job) -> None:
+        self.reserved.pop(job, None)
+
+    def record(self, decision: dict) -> None:
+        if self.log is None:
+            return
+
+        with open(self.log, 'a') as log:
+            log.write(json.dumps(dict(decision, time=round(time.time(), 3)), default=str) + '\n')
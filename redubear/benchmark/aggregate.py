@@ -0,0 +1,95 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+from itertools import combinations
+from math import comb
+from random import Random
+from statistics import median
+
+METRICS = ['runtime', 'tests_started', 'peak_memory (MB)', 'reducer_overhead (s)']
+
+
+def bootstrap_ci(samples: list[float], confidence: float = 0.95, resamples: int = 1000) -> list[float]:
+    """
+    Percentile bootstrap confidence interval of the median.
+    """
+    if len(samples) < 2:
+        return [samples[0], samples[0]]
+
+    rng = Random(0)  # Reproducible intervals for the same samples.
+    medians = sorted(median(rng.choices(samples, k=len(samples))) for _ in range(resamples))
+
+    tail = (1. - confidence) / 2.
+    return [medians[int(tail * (resamples - 1))], medians[int((1. - tail) * (resamples - 1))]]
+
+
+def summarize(samples: list[float]) -> dict:
+    center = median(samples)
+    return {
+        'median': center,
+        'mad': median(abs(s - center) for s in samples),
+        'min': min(samples),
+        'ci95': bootstrap_ci(samples),
+        'samples': samples,
+    }
+
+
+def aggregate(runs: dict) -> dict:
+    """
+    Merges the statistics of the repeated runs ({run_id: stats}) of a test. The
+    result is the statistics of the run with the median runtime extended with the
+    summary of every measured metric.
+    """
+    if not runs:
+        return {'error': 'no runs'}
+
+    succeeded = [stats for _, stats in sorted(runs.items()) if 'error' not in stats]
+    if not succeeded:
+        return next(iter(runs.values()))
+
+    ordered = sorted(succeeded, key=lambda stats: stats.get('runtime', 0))
+    stats = dict(ordered[(len(ordered) - 1) // 2])
+
+    stats['repeat'] = len(succeeded)
+    stats['failed_runs'] = len(runs) - len(succeeded)
+    stats['statistics'] = {metric: summarize([s[metric] for s in succeeded])
+                           for metric in METRICS if all(metric in s for s in succeeded)}
+
+    return stats
+
+
+def permutation_test(baseline: list[float], candidate: list[float], resamples: int = 10000) -> float:
+    """
+    One-sided p-value of the candidate being larger than the baseline (exact Mann-Whitney
+    test: the rank sum of the candidate over the permutations). The permutations are
+    enumerated exactly for small sample sizes (the usual case of repeated reductions),
+    and sampled otherwise. The smallest p-value of n and m samples is 1/C(n+m, m).
+    """
+    pooled = baseline + candidate
+    # Tied samples get their average rank.
+    order = sorted(range(len(pooled)), key=lambda i: pooled[i])
+    ranks = [0.] * len(pooled)
+    start = 0
+    while start < len(order):
+        end = start
+        while end + 1 < len(order) and pooled[order[end + 1]] == pooled[order[start]]:
+            end += 1
+        for i in order[start:end + 1]:
+            ranks[i] = (start + end) / 2. + 1.
+        start = end + 1
+
+    observed = sum(ranks[len(baseline):])
+
+    def statistic(indices):
+        return sum(ranks[i] for i in indices)
+
+    if comb(len(pooled), len(candidate)) <= resamples:
+        splits = list(combinations(range(len(pooled)), len(candidate)))
+    else:
+        rng = Random(0)
+        splits = [rng.sample(range(len(pooled)), len(candidate)) for _ in range(resamples)]
+
+    return sum(statistic(split) >= observed - 1e-9 for split in splits) / len(splits)
@@ -5,18 +5,30 @@
 # This file may not be copied, modified, or distributed except
 # according to those terms.
 
+import asyncio
+import signal
+import sys
 import time
 
-from concurrent.futures import ProcessPoolExecutor, wait, ALL_COMPLETED
+from collections import deque
+from concurrent.futures import CancelledError, Executor, ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
-from os import environ, makedirs
+from functools import partial
+from multiprocessing import active_children
+from os import environ, kill, makedirs
 from pathlib import Path
-from shutil import rmtree
+from shutil import copy2, rmtree
+from threading import Lock
 
-from redubear.benchmark import Tests
-from redubear.memory import PeakMemory
+from redubear.benchmark import Tests, AdaptiveConcurrency, CpuBudget, calibrate, ProgressExporter, ResultCache, RuntimeEstimator, longest_first, predict_makespan
+from redubear.benchmark.aggregate import aggregate
+from redubear.memory import PeakMemory, ProcSampler
+from redubear.oracle import OracleCache, OracleCheckpoint, OracleTracer
 from redubear.reducers import Reducer
-from redubear.utils import get_logger, run_command, ReportGenerator
+from redubear.utils import get_logger, handle_termination, run_command, run_command_async, run_in_process, terminate_commands, Journal, Limits, LimitExceeded, ReportGenerator, ResourceUsage, SizeMetrics, Workspace
+
+# Time for the post-processing of the interrupted runs after the grace period.
+INTERRUPT_MARGIN = 30
 
 
 def run_single(name: str,
@@ -24,101 +36,739 @@ def run_single(name: str,
                oracle: Path,
                input_file: Path,
                tag: str,
-               valgrind: bool,
+               memory_sampler: str,
                output: Path,
                temp: Path,
                force: bool,
-               logger):
+               logger,
+               limits: Limits = None,
+               memory_interval: float = 0.1,
+               run_id: str = None,
+               trace_oracle: bool = False,
+               verdict_cache: Path = None,
+               verdict_cache_size: int = 1000000,
+               in_process: bool = False,
+               cpus: list[int] = None,
+               workspace_root: Path = None,
+               result_cache: Path = None,
+               size_metrics: SizeMetrics = None,
+               checkpoint: bool = False,
+               trajectory: bool = False,
+               runner=None):
     # Note: "cannot pickle '_thread.lock' object" Exception occurs if this function is inside
     # the Benchmark class.
     temporal_dir = temp / 'redubear' / name / tag
     final_out_dir = output / name / tag
+    if run_id:
+        # Repeated measurements have their own directories (e.g., rep-0, warmup-0).
+        temporal_dir /= run_id
+        final_out_dir /= run_id
     stat_file = final_out_dir / 'picire.json'
 
     report = dict()
 
-    if not force:
-        reduced_file = final_out_dir / input_file.name
-        # Both statistics and the reduced file exist, returning the results of the
-        # previous experiment.
-        if stat_file.exists() and reduced_file.exists():
-            pervious_results = ReportGenerator.read(stat_file)
-            logger.info(f'[{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}] {name} load cached results')
-            report[name] = pervious_results
-            return report
+    cache_key = None
+    if result_cache:
+        results = ResultCache(result_cache)
+        cache_key = results.fingerprint(reducer, oracle, input_file, {
+            'run_id': run_id,
+            'memory_sampler': memory_sampler,
+            'limits': vars(limits) if limits else None,
+            'trace_oracle': trace_oracle,
+            'verdict_cache': bool(verdict_cache),
+            'in_process': in_process,
+            'workspace': bool(workspace_root),
+            'cpus': len(cpus) if cpus else None,
+            'checkpoint': checkpoint,
+            'trajectory': trajectory,
+        })
+
+        # An identical run (of any tag) was measured already, its results are copied.
+        if not force:
+            cached_results = results.load(cache_key, final_out_dir)
+            if cached_results is not None:
+                logger.info(f'[{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}] {name} load cached results ({cache_key[:12]})')
+                report[name] = cached_results
+                return report
 
     logger.info(f'[{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}] {name} started ...')
 
     makedirs(final_out_dir, exist_ok=True)
-    makedirs(temporal_dir, exist_ok=True)
+
+    original_oracle, original_input = oracle, input_file
+    workspace = None
+    if workspace_root:
+        # The reduction runs on an isolated copy of the test directory.
+        workspace = Workspace(workspace_root, temp / 'redubear' / 'workspaces')
+        oracle, input_file, temporal_dir = workspace.create(name, oracle, input_file)
+    else:
+        makedirs(temporal_dir, exist_ok=True)
 
     command = []
-    if valgrind:
+    if memory_sampler == 'valgrind':
         memory_measurer = PeakMemory(temporal_dir)
         command += memory_measurer.generate_command()
 
-    command += reducer.generate_command(oracle, input_file, temporal_dir, stat_file)
+    # The peak RSS of the reducer is not in /proc any more when it is a zombie, it is tracked
+    # for the resource accounting by a light sampler (unless it is the memory sampler). The
+    # in-process runs read it from the worker itself.
+    if memory_sampler == 'proc':
+        sampler = ProcSampler(memory_interval)
+    else:
+        sampler = ProcSampler(0.2, peak_only=True) if not in_process else None
+    usage = ResourceUsage()
+
+    # The reducer may get a wrapped oracle, but the original one is executed in its own directory.
+    test = oracle
+    cache = None
+    if verdict_cache:
+        cache = OracleCache(temporal_dir, verdict_cache, verdict_cache_size)
+        test = cache.wrap(test, input_file, identity=original_oracle)
 
-    exit_code, stdout = run_command(
-        command,
-        oracle.parent,
-        env=dict(environ, PYTHONOPTIMIZE='1', PERSES_CACHE_MEMORY_PROFILING_TIME_INTERVAL='3000'),
-    )
+    tracer = None
+    if trace_oracle:
+        tracer = OracleTracer(temporal_dir)
+        test = tracer.wrap(test, input_file)
 
+    checkpointer = None
+    if checkpoint or trajectory:
+        # The candidates of the trajectory are kept only if their tokens can be counted.
+        checkpointer = OracleCheckpoint(temporal_dir, trajectory, trajectory and bool(size_metrics) and size_metrics.counts_tokens(input_file))
+        test = checkpointer.wrap(test, input_file)
+
+    command += reducer.generate_command(test, input_file, temporal_dir, stat_file)
+
+    start_time = time.time()
+    try:
+        if in_process:
+            exit_code, stdout = run_in_process(
+                lambda: reducer.execute(command),
+                oracle.parent,
+                on_start=sampler.start if sampler else None,
+                cpus=cpus,
+                usage=usage,
+            )
+        else:
+            # E.g., a bridge to run_command_async of the asyncio engine.
+            exit_code, stdout = (runner or run_command)(
+                command,
+                oracle.parent,
+                env=dict(environ, PYTHONOPTIMIZE='1', PERSES_CACHE_MEMORY_PROFILING_TIME_INTERVAL='3000'),
+                limits=limits,
+                on_start=sampler.start if sampler else None,
+                cpus=cpus,
+                usage=usage,
+            )
+    except LimitExceeded as e:
+        logger.error(f'[{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}] {name} killed: {e}')
+        report[name] = {'error': e.reason, 'runtime': round(e.elapsed, 2)}
+        if e.reason == 'interrupted':
+            report[name].update(save_partial(reducer, checkpointer, input_file, original_input, temporal_dir, final_out_dir, size_metrics))
+        cleanup(temporal_dir, workspace)
+        return report
+    finally:
+        if sampler:
+            sampler.stop()
+
+    elapsed = time.time() - start_time
     logger.info(f'[{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}] {name} exited with: {exit_code}')
 
     if exit_code == 0:
         stats = reducer.post_process(stat_file, input_file, final_out_dir, temporal_dir)
+        if workspace:
+            stats['path_input'] = str(original_input)
+
+        if size_metrics:
+            for side, path in [('input', original_input), ('output', stats.get('path_output'))]:
+                if path:
+                    for metric, value in size_metrics.measure(Path(path)).items():
+                        stats[f'{metric}_{side}'] = value
 
-        if valgrind:
+        if memory_sampler == 'valgrind':
             stats['peak_memory (MB)'] = memory_measurer.get()
+        elif memory_sampler == 'proc':
+            stats['peak_memory (MB)'] = sampler.get()
+            stats['peak_pss (MB)'] = sampler.get_pss()
+            stats['memory_samples'] = sampler.samples
+
+        if sampler and sampler.peak_hwm:
+            usage.maxrss_reducer = max(usage.maxrss_reducer or 0, sampler.peak_hwm)
+        stats.update(usage.get())
+
+        if trajectory and stats.get('path_output'):
+            stats['trajectory'] = checkpointer.get_trajectory(start_time, elapsed, original_input, Path(stats['path_output']), size_metrics)
+
+        if tracer:
+            stats['oracle'] = tracer.get(stats.get('runtime', 0), getattr(reducer, 'jobs', 1))
+            tracer.save(final_out_dir)
+
+        if cache:
+            stats['verdict_cache'] = cache.get()
+
+        if cpus:
+            stats['cpus'] = cpus
+
+        if in_process:
+            # The subprocesses of the reducers run with PYTHONOPTIMIZE=1.
+            stats['python_optimize'] = sys.flags.optimize
 
         ReportGenerator.dump(stats, stat_file)
         report[name] = stats
+
+        if cache_key:
+            results.store(cache_key, final_out_dir)
     else:
         logger.error(stdout)
         report[name] = {'error': exit_code}
 
-    rmtree(temporal_dir)
+    cleanup(temporal_dir, workspace)
     return report
 
 
+def save_partial(reducer: Reducer, checkpointer: OracleCheckpoint, input_file: Path, original_input: Path,
+                 temporal_dir: Path, out_dir: Path, size_metrics: SizeMetrics = None) -> dict:
+    """
+    Saves the best intermediate output of an interrupted reduction: the one written by
+    the reducer, or the smallest interesting candidate of the oracle checkpoint.
+    """
+    partial = reducer.partial_output(input_file, temporal_dir) or (checkpointer.get() if checkpointer else None)
+    if partial is None:
+        return dict()
+
+    destination = out_dir / input_file.name
+    copy2(partial, destination)
+    stats = {'path_input': str(original_input), 'path_output': str(destination)}
+    if size_metrics:
+        for side, path in [('input', original_input), ('output', destination)]:
+            for metric, value in size_metrics.measure(path).items():
+                stats[f'{metric}_{side}'] = value
+    return stats
+
+
+def cleanup(temporal_dir: Path, workspace: Workspace) -> None:
+    if workspace:
+        workspace.remove()
+    else:
+        rmtree(temporal_dir)
+
+
 class Benchmark:
     def __init__(self,
                  inputs: Tests,
                  reducer: Reducer,
                  tag: str,
                  workers: int,
-                 valgrind: bool,
+                 memory_sampler: str,
                  output: Path,
                  temp: Path,
-                 force: bool) -> None:
+                 force: bool,
+                 schedule: str = 'longest-first',
+                 resume: bool = False,
+                 limits: Limits = None,
+                 memory_interval: float = 0.1,
+                 repeat: int = 1,
+                 warmup: int = 0,
+                 trace_oracle: bool = False,
+                 verdict_cache: Path = None,
+                 verdict_cache_size: int = 1000000,
+                 in_process: bool = False,
+                 pin_cpus: bool = False,
+                 workspace_root: Path = None,
+                 variants: dict = None,
+                 result_cache: Path = None,
+                 exporter: ProgressExporter = None,
+                 size_metrics: SizeMetrics = None,
+                 executor: Executor = None,
+                 checkpoint: bool = False,
+                 grace_period: float = 10.,
+                 calibration_runs: int = 0,
+                 trajectory: bool = False,
+                 concurrency: AdaptiveConcurrency = None) -> None:
+        """
+        variants: {tag: reducer} configurations of a sweep that share the workers
+        (replaces tag and reducer).
+        grace_period: time given to the reducers to exit after an interruption before they
+        are killed.
+        calibration_runs: oracle calls per test on the original input before the reductions.
+        trajectory: record the size of the best candidate over time.
+        concurrency: adjusts the number of concurrent runs (at most workers) to the load.
+        size_metrics: measures the inputs and the outputs of every reducer (default: the
+        shared cache of the size metrics).
+        """
         self.inputs = inputs
         self.reducer = reducer
         self.tag = tag
-        self.valgrind = valgrind
+        self.workers = workers
+        self.memory_sampler = memory_sampler
         self.output = output
         self.temp = temp
         self.force = force
+        self.schedule = schedule
+        self.resume = resume
+        self.limits = limits
+        self.memory_interval = memory_interval
+        self.repeat = repeat
+        self.warmup = warmup
+        self.trace_oracle = trace_oracle
+        self.verdict_cache = verdict_cache
+        self.verdict_cache_size = verdict_cache_size
+        self.in_process = in_process
+        self.budget = CpuBudget() if pin_cpus else None
+        self.workspace_root = workspace_root
+        self.result_cache = result_cache
+        self.exporter = exporter
+        self.size_metrics = size_metrics or SizeMetrics()
+        self.checkpoint = checkpoint
+        self.grace_period = grace_period
+        self.interrupted = None
+        self.calibration_runs = calibration_runs
+        self.trajectory = trajectory
+        self.concurrency = concurrency
+        self.peaks = dict()
+        self.test_names = []
+        self.calibration = dict()
+        self.predictions = dict()
+        self.variants = variants or {tag: reducer}
+        self.journals = {variant: Journal(output / f'ReduBear-{variant}.jsonl') for variant in self.variants}
+
+        for variant in self.variants.values():
+            if in_process and not variant.supports_in_process():
+                raise Exception(f'{type(variant).__name__} does not support in-process execution.')
 
-        self.executor = ProcessPoolExecutor(max_workers=workers)
         self.logger = get_logger('ReduBear')
+        if in_process and not sys.flags.optimize:
+            self.logger.warning('In-process reducers run with assertions (the interpreter was started without "-O"), '
+                                'their runtimes are not comparable to the subprocess runs.')
+
+        # E.g., a Coordinator that runs the jobs on remote agents (a pool of worker processes
+        # of run_all otherwise).
+        self.executor = executor
+        # The threads of the asyncio engine (see events).
+        self.threads = None
+
+    def run_ids(self) -> list:
+        """
+        Returns the ids of the runs of a test. A single measurement has no id.
+        """
+        if self.repeat == 1 and self.warmup == 0:
+            return [None]
+
+        return [f'warmup-{i}' for i in range(self.warmup)] + [f'rep-{i}' for i in range(self.repeat)]
 
     def run(self) -> dict:
-        futures = []
-        report = dict()
+        """
+        Returns the report of a single-configuration benchmark.
+        """
+        return next(iter(self.run_all().values()))
+
+    def run_all(self) -> dict:
+        """
+        Runs every test with every configuration through the same workers. Returns the
+        reports by tag.
+        """
+        jobs, runs, pending = self.plan()
 
+        executor = self.executor or ProcessPoolExecutor(max_workers=self.workers, initializer=handle_termination,
+                                                        initargs=(self.grace_period,))
         start_time = time.time()
-        for test_name, oracle, input_file in self.inputs:
-            futures.append(self.executor.submit(
-                run_single, test_name, self.reducer, oracle, input_file, self.tag, self.valgrind, self.output, self.temp, self.force, self.logger))
+        queue = deque(jobs)
+        running = dict()
+        while running or (queue and self.interrupted is None):
+            try:
+                if self.interrupted is None:
+                    for job, cpus in self.admit(queue, len(running)):
+                        running[self.submit(executor, job, cpus)] = (job, cpus)
 
-        # wait for all tasks to complete
-        done, not_done = wait(futures, return_when=ALL_COMPLETED)
+                done, _ = wait(running, timeout=1., return_when=FIRST_COMPLETED)
+            except KeyboardInterrupt:
+                # Ctrl-C without the signal handlers of the CLI.
+                self.interrupt()
+                continue
 
-        for result in done:
-            report.update(result.result())
+            if not done and self.overdue():
+                self.logger.error(f'{len(running)} runs did not stop after the interruption, their workers are killed.')
+                for child in active_children():
+                    child.kill()
+                break
 
-        self.logger.info(
-            f'Benchmark time: {timedelta(seconds=(time.time() - start_time))}')
-        return report
+            for future in done:
+                job, cpus = running.pop(future)
+                tag, (test_name, _, _), run_id = job
+                self.release(job, cpus)
+
+                self.collect(future, tag, test_name, run_id, runs, pending)
+
+        executor.shutdown(wait=self.interrupted is None, cancel_futures=True)
+        return self.complete(start_time)
+
+    async def events(self):
+        """
+        Asyncio engine: runs every test with every configuration as subprocesses of the
+        current process (at most workers at once) and yields an event when a run starts,
+        finishes or fails:
+
+            {'event': 'started'|'finished'|'failed', 'tag': ..., 'test': ..., 'run': ..., 'stats': ...}
+
+        The runs are journaled as with run_all, the reports are returned by reports()
+        afterwards. Cancelling the consumer (or closing the iterator) kills the process
+        tree of every running reduction, while interrupt() lets them save their partial
+        results.
+        """
+        if self.in_process:
+            raise Exception('In-process execution is not supported by the asyncio engine.')
+
+        # The preparation of the reducers and the calibration are blocking.
+        jobs, runs, pending = await asyncio.get_running_loop().run_in_executor(None, self.plan)
+
+        start_time = time.time()
+        queue = deque(jobs)
+        running = dict()
+        self.threads = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            while running or (queue and self.interrupted is None):
+                if self.interrupted is None:
+                    for job, cpus in self.admit(queue, len(running)):
+                        running[asyncio.ensure_future(self.run_async(job, cpus))] = (job, cpus)
+                        tag, (test_name, _, _), run_id = job
+                        yield {'event': 'started', 'tag': tag, 'test': test_name, 'run': run_id}
+
+                done, _ = await asyncio.wait(running, timeout=1., return_when=asyncio.FIRST_COMPLETED)
+                if not done and self.overdue():
+                    self.logger.error(f'{len(running)} runs did not stop after the interruption, they are killed.')
+                    break
+
+                for task in done:
+                    job, cpus = running.pop(task)
+                    tag, (test_name, _, _), run_id = job
+                    self.release(job, cpus)
+
+                    stats = self.collect(task, tag, test_name, run_id, runs, pending)
+                    yield {'event': 'failed' if 'error' in stats else 'finished',
+                           'tag': tag, 'test': test_name, 'run': run_id, 'stats': stats}
+        finally:
+            for task in running:
+                task.cancel()
+            # The cancelled runs remove their temporary files before the iterator exits.
+            await asyncio.gather(*running, return_exceptions=True)
+            self.threads.shutdown()
+            self.remove_temp_dirs()
+
+        self.complete(start_time)
+
+    def reports(self) -> dict:
+        return {tag: journal.read() for tag, journal in self.journals.items()}
+
+    def interrupt(self) -> None:
+        """
+        Stops admitting runs and forwards termination to the running ones (a repeated call
+        kills them at once). Safe to call from a signal handler. The interrupted runs are
+        journaled with their best intermediate output as "error": "interrupted", hence they
+        are run again on resume.
+        """
+        repeated = self.interrupted is not None
+        if not repeated:
+            self.interrupted = time.time()
+            self.logger.warning(f'Interrupted, waiting at most {self.grace_period}s for the running reductions ...')
+
+        # The commands of the asyncio engine run in this process, the others in the workers.
+        terminate_commands(0. if repeated else self.grace_period)
+        for child in active_children():
+            kill(child.pid, signal.SIGTERM)
+
+    def overdue(self) -> bool:
+        """
+        Whether the runs had enough time to stop (and to save their results) after an interruption.
+        """
+        return self.interrupted is not None and time.time() > self.interrupted + self.grace_period + INTERRUPT_MARGIN
+
+    def plan(self):
+        """
+        Prepares the reducers and the journals. Returns the jobs to run (in order), the
+        finished runs and the number of pending runs of the tests.
+        """
+        tests = list(self.inputs)
+        self.test_names = [name for name, _, _ in tests]
+        run_ids = self.run_ids()
+
+        runs = dict()
+        pending = dict()
+        for tag, reducer in self.variants.items():
+            journal = self.journals[tag]
+            remaining = tests
+            done_runs = dict()
+            if self.resume:
+                finished = journal.finished()
+                remaining = [test for test in tests if test[0] not in finished]
+                done_runs = {name: {run_id: stats for run_id, stats in test_runs.items() if 'error' not in stats}
+                             for name, test_runs in journal.runs().items()}
+                self.logger.info(f'Resuming {tag}: {len(finished)} finished, {len(remaining)} remaining tests.')
+            else:
+                journal.reset()
+
+            if remaining:
+                reducer.prepare(remaining, self.temp / 'redubear')
+
+            for name, _, _ in remaining:
+                runs[tag, name] = dict(done_runs.get(name, dict()))
+                pending[tag, name] = len([run_id for run_id in run_ids if run_id not in runs[tag, name]])
+
+        if self.calibration_runs:
+            self.calibration = self.calibrate([test for test in tests if any((tag, test[0]) in runs for tag in self.variants)])
+
+        costs = {name: calibration['latency_mean (s)'] for name, calibration in self.calibration.items() if 'error' not in calibration}
+        estimates, peaks, history = self.estimate(tests, costs)
+        if self.schedule == 'longest-first':
+            # A test is as long as its longest configuration.
+            tests = longest_first(tests, {name: max(estimates[tag][name] for tag in self.variants) for name, _, _ in tests})
+        # The estimates are in seconds only if there is history.
+        self.predictions = estimates if self.calibration and history else dict()
+
+        if self.concurrency:
+            self.peaks = peaks
+            self.concurrency.start()
+
+        # The repetitions are interleaved: every test is run once (with every configuration)
+        # before any of them is repeated.
+        jobs = [(tag, test, run_id) for run_id in run_ids for test in tests for tag in self.variants
+                if (tag, test[0]) in runs and run_id not in runs[tag, test[0]]]
+
+        # Every run of a test was journaled before the interruption, only the aggregation is missing.
+        for tag, name in [key for key, count in pending.items() if count == 0 and run_ids != [None]]:
+            self.finish(tag, name, runs[tag, name])
+
+        self.predicted = predict_makespan([estimates[tag][test[0]] for tag, test, _ in jobs], self.workers) \
+            if history else None
+
+        if self.exporter:
+            self.exporter.start({(tag, test[0], run_id): estimates[tag][test[0]] if history else None
+                                 for tag, test, run_id in jobs}, self.workers)
+
+        return jobs, runs, pending
+
+    def estimate(self, tests: list, costs: dict) -> tuple:
+        """
+        Estimates the runtimes and the peak RSS of the tests with every configuration from
+        the history of the same tag. A tag without history uses the history of every tag.
+        Returns the estimates and the peaks by tag, and whether the estimates are in seconds.
+        """
+        fallback = RuntimeEstimator(self.output)
+        estimates, peaks, history = dict(), dict(), True
+        for tag in self.variants:
+            estimator = RuntimeEstimator(self.output, tag)
+            estimates[tag] = estimator.estimate(tests, costs)
+            if not estimator.has_history():
+                estimator = fallback
+                estimates[tag] = estimator.estimate(tests, costs)
+            peaks[tag] = estimator.peak_memory(tests)
+            history = history and estimator.has_history()
+        return estimates, peaks, history
+
+    def calibrate(self, tests: list) -> dict:
+        """
+        Runs the oracle of every test on its original input calibration_runs times (the
+        tests in parallel on the workers). Returns the oracle latencies by test.
+        """
+        self.logger.info(f'Calibrating the oracles of {len(tests)} tests ({self.calibration_runs} runs each) ...')
+        with ThreadPoolExecutor(max_workers=max(self.workers, 1)) as pool:
+            futures = {name: pool.submit(calibrate, oracle, input_file, self.calibration_runs,
+                                         self.temp / 'redubear' / 'calibration' / name, self.limits)
+                       for name, oracle, input_file in tests}
+        calibration = {name: future.result() for name, future in futures.items()}
+
+        for name, stats in calibration.items():
+            if 'error' in stats:
+                self.logger.warning(f'The oracle of {name} cannot be calibrated: {stats["error"]}')
+            elif not stats['interesting']:
+                self.logger.warning(f'The original input of {name} is not interesting to its oracle.')
+        return calibration
+
+    def derive(self, tag: str, name: str, stats: dict) -> None:
+        """
+        Extends the statistics of a run with the oracle calibration, the overhead of the
+        reducer (runtime - tests_started * oracle cost / parallel jobs) and the predicted
+        runtime.
+        """
+        calibration = self.calibration.get(name)
+        if calibration is None or 'error' in stats:
+            return
+
+        stats['oracle_calibration'] = calibration
+        if 'error' not in calibration and 'runtime' in stats and 'tests_started' in stats:
+            jobs = getattr(self.variants[tag], 'jobs', 1) or 1
+            stats['reducer_overhead (s)'] = round(stats['runtime'] - stats['tests_started'] * calibration['latency_mean (s)'] / jobs, 2)
+
+        if name in self.predictions.get(tag, dict()):
+            stats['predicted_runtime (s)'] = round(self.predictions[tag][name], 2)
+
+    def admit(self, queue: deque, running: int) -> list:
+        """
+        Removes the first queued runs that fit into the free worker slots (and the CPU
+        budget, and the available memory with adaptive concurrency) from the queue.
+        Returns them with their CPUs.
+        """
+        workers = self.concurrency.update(running) if self.concurrency else self.workers
+
+        admitted = []
+        memory = None
+        for job in list(queue):
+            if running + len(admitted) >= workers:
+                break
+
+            key = (job[0], job[1][0], job[2])
+            if self.concurrency:
+                memory = memory or self.concurrency.memory()
+                if not self.concurrency.fits(key, self.peaks[job[0]].get(job[1][0]), running + len(admitted), *memory):
+                    continue
+
+            cpus = None
+            if self.budget:
+                cpus = self.budget.acquire(getattr(self.variants[job[0]], 'jobs', 1))
+                if cpus is None:
+                    continue
+
+            queue.remove(job)
+            admitted.append((job, cpus))
+            if self.concurrency:
+                self.concurrency.acquire(key, self.peaks[job[0]].get(job[1][0]))
+            if self.exporter:
+                self.exporter.job_started((job[0], job[1][0], job[2]))
+        return admitted
+
+    def release(self, job, cpus) -> None:
+        if cpus:
+            self.budget.release(cpus)
+        if self.concurrency:
+            self.concurrency.release((job[0], job[1][0], job[2]))
+
+    def remove_temp_dirs(self) -> None:
+        """
+        Removes the empty temporary directories of the tests (left by the runs of every
+        tag), once no run uses them.
+        """
+        for name in self.test_names:
+            directory = self.temp / 'redubear' / name
+            if not directory.is_dir():
+                continue
+            for path in sorted(directory.rglob('*'), reverse=True) + [directory]:
+                try:
+                    path.rmdir()
+                except OSError:
+                    # Not empty (or not a directory).
+                    pass
+
+    def complete(self, start_time: float) -> dict:
+        if self.exporter:
+            self.exporter.stop()
+        self.remove_temp_dirs()
+
+        if self.interrupted is not None:
+            self.logger.warning('The benchmark was interrupted, the unfinished tests are run with "--resume".')
+
+        makespan = time.time() - start_time
+        if self.predicted is not None:
+            self.logger.info(f'Predicted makespan ({self.schedule}): {timedelta(seconds=self.predicted)}')
+        self.logger.info(f'Benchmark time: {timedelta(seconds=makespan)}')
+
+        # The prediction can be checked against the actual makespan in the journals.
+        summary = {
+            'schedule': self.schedule,
+            'workers': self.workers,
+            'tags': list(self.variants),
+            'predicted_makespan (s)': round(self.predicted, 2) if self.predicted is not None else None,
+            'makespan (s)': round(makespan, 2),
+            'interrupted': self.interrupted is not None,
+        }
+        for journal in self.journals.values():
+            journal.append_summary(summary)
+        return self.reports()
+
+    def arguments(self, job, cpus) -> tuple:
+        """
+        The arguments of run_single for a job.
+        """
+        tag, (test_name, oracle, input_file), run_id = job
+        return (test_name, self.variants[tag], oracle, input_file, tag, self.memory_sampler, self.output, self.temp, self.force, self.logger, self.limits,
+                self.memory_interval, run_id, self.trace_oracle, self.verdict_cache, self.verdict_cache_size,
+                self.in_process, cpus, self.workspace_root, self.result_cache, self.size_metrics, self.checkpoint,
+                self.trajectory)
+
+    def submit(self, executor: Executor, job, cpus):
+        return executor.submit(run_single, *self.arguments(job, cpus))
+
+    async def run_async(self, job, cpus) -> dict:
+        """
+        Runs a job in a thread of the event loop, the reducer command itself is executed
+        by run_command_async. The post-processing of the run is blocking I/O, hence the
+        thread.
+        """
+        loop = asyncio.get_running_loop()
+        lock = Lock()
+        commands = []
+        cancelled = False
+
+        def runner(command, cwd, **kwargs):
+            start_time = time.time()
+            with lock:
+                if cancelled:
+                    raise LimitExceeded('cancelled', 0., '')
+                commands.append(asyncio.run_coroutine_threadsafe(run_command_async(command, cwd, **kwargs), loop))
+            try:
+                return commands[-1].result()
+            except CancelledError:
+                raise LimitExceeded('cancelled', time.time() - start_time, '')
+
+        thread = loop.run_in_executor(self.threads, partial(run_single, *self.arguments(job, cpus), runner=runner))
+        try:
+            return await asyncio.shield(thread)
+        except asyncio.CancelledError:
+            with lock:
+                cancelled = True
+                for command in commands:
+                    command.cancel()
+            await thread
+            raise
+
+    def collect(self, future, tag: str, test_name: str, run_id: str, runs: dict, pending: dict) -> dict:
+        """
+        Journals the result of a finished run as soon as it arrives. Returns its statistics.
+        """
+        try:
+            result = future.result()
+        except Exception as e:
+            self.logger.error(f'{test_name} ({tag}) failed: {e!r}')
+            result = {test_name: {'error': repr(e)}}
+
+        stats = result[test_name]
+        if self.calibration:
+            self.derive(tag, test_name, stats)
+            if run_id is None and 'error' not in stats:
+                ReportGenerator.dump(stats, self.output / test_name / tag / 'picire.json')
+
+        if self.exporter:
+            self.exporter.job_finished((tag, test_name, run_id), stats)
+
+        if run_id is None:
+            self.journals[tag].append(test_name, stats)
+            return stats
+
+        self.journals[tag].append(test_name, stats, run=run_id)
+        if stats.get('error') == 'interrupted':
+            # The test is not aggregated, it remains unfinished.
+            return stats
+
+        runs[tag, test_name][run_id] = stats
+        pending[tag, test_name] -= 1
+        if pending[tag, test_name] == 0:
+            self.finish(tag, test_name, runs[tag, test_name])
+        return stats
+
+    def finish(self, tag: str, name: str, runs: dict) -> None:
+        """
+        Aggregates the repeated runs of a test (warmups excluded) and saves the result.
+        """
+        stats = aggregate({run_id: stats for run_id, stats in runs.items() if not run_id.startswith('warmup')})
+
+        if 'error' not in stats:
+            ReportGenerator.dump(stats, self.output / name / tag / 'picire.json')
+
+        self.journals[tag].append(name, stats)
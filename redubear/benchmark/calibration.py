@@ -0,0 +1,48 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import math
+import shutil
+import time
+
+from pathlib import Path
+from statistics import fmean, pvariance
+
+from redubear.utils import run_command, Limits, LimitExceeded
+
+
+def calibrate(oracle: Path, input_file: Path, runs: int, work_dir: Path, limits: Limits = None) -> dict:
+    """
+    Runs the oracle on the original input the given times in a copy of the test directory
+    and returns the statistics of its latency. The candidate is passed as an argument
+    (Picire) and is also in the working directory of the oracle (Perses).
+    """
+    shutil.rmtree(work_dir, ignore_errors=True)
+    shutil.copytree(oracle.parent, work_dir, symlinks=True)
+    shutil.copy2(input_file, work_dir / input_file.name)
+
+    latencies = []
+    verdicts = []
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            exit_code, _ = run_command([str(work_dir / oracle.name), str(work_dir / input_file.name)], work_dir, limits=limits)
+            latencies.append(time.perf_counter() - start)
+            verdicts.append(exit_code)
+    except LimitExceeded as e:
+        return {'runs': len(latencies), 'error': e.reason}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    # Nearest rank, the p95 of a few runs is their maximum rather than an earlier sample.
+    ordered = sorted(latencies)
+    return {
+        'runs': runs,
+        'latency_mean (s)': round(fmean(latencies), 4),
+        'latency_p95 (s)': round(ordered[math.ceil(0.95 * len(ordered)) - 1], 4),
+        'latency_variance': round(pvariance(latencies), 6),
+        'interesting': all(verdict == 0 for verdict in verdicts),
+    }
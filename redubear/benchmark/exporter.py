@@ -0,0 +1,234 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import getpid, listdir, replace, sysconf
+from pathlib import Path
+from threading import Event, Lock, Thread
+
+from redubear.utils import get_logger
+
+CLK_TCK = sysconf('SC_CLK_TCK')
+PAGE_SIZE = sysconf('SC_PAGE_SIZE')
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels) -> str:
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items() if value is not None) + '}'
+
+
+def _process_tree_usage() -> dict:
+    """
+    Returns the (CPU seconds, RSS bytes) of the process tree of every worker (child) of
+    the current process, read from /proc.
+    """
+    children = dict()
+    usage = dict()
+    for entry in listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                fields = stat.read().rpartition(')')[2].split()
+        except OSError:
+            continue
+
+        pid = int(entry)
+        children.setdefault(int(fields[1]), []).append(pid)
+        # utime, stime and the times of the waited children.
+        usage[pid] = (sum(int(f) for f in fields[11:15]) / CLK_TCK, int(fields[21]) * PAGE_SIZE)
+
+    workers = dict()
+    for worker in children.get(getpid(), []):
+        cpu, rss = 0., 0
+        stack = [worker]
+        while stack:
+            pid = stack.pop()
+            cpu += usage[pid][0]
+            rss += usage[pid][1]
+            stack += children.get(pid, [])
+        workers[worker] = (cpu, rss)
+    return workers
+
+
+class ProgressExporter:
+    """
+    Live progress of a benchmark in the Prometheus text format. The metrics are rewritten
+    periodically into a file (for the textfile collector of the node exporter) and/or
+    served over HTTP on a local port. The state is updated by the benchmark loop and read
+    by the writer and the HTTP threads, under a lock.
+    """
+
+    def __init__(self, path: Path = None, port: int = None, interval: float = 5.) -> None:
+        self.path = path
+        self.port = port
+        self.interval = interval
+        self.workers = 1
+        self.start_time = time.time()
+        self.queued = dict()
+        self.running = dict()
+        self.finished = 0
+        self.failed = 0
+        self.finished_runtime = 0.
+        self.oracle_calls = 0
+        self.lock = Lock()
+        self.stopped = Event()
+        self.thread = None
+        self.server = None
+        self.logger = get_logger('ReduBear')
+
+    def start(self, jobs: dict, workers: int) -> None:
+        """
+        jobs: {(tag, test, run_id): estimated runtime (or None)}
+        """
+        with self.lock:
+            self.queued = dict(jobs)
+        self.workers = workers
+        self.start_time = time.time()
+
+        if self.port is not None:
+            exporter = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = exporter.render().encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self.server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+            Thread(target=self.server.serve_forever, daemon=True).start()
+            self.logger.info(f'Metrics: http://127.0.0.1:{self.server.server_port}/metrics')
+
+        if self.path is not None:
+            self.thread = Thread(target=self._write_periodically, daemon=True)
+            self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+        if self.path is not None:
+            self.write()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def job_started(self, job) -> None:
+        with self.lock:
+            self.running[job] = (time.time(), self.queued.pop(job, None))
+
+    def job_finished(self, job, stats: dict) -> None:
+        with self.lock:
+            started, _ = self.running.pop(job, (time.time(), None))
+            if 'error' in stats:
+                self.failed += 1
+            else:
+                self.finished += 1
+                self.finished_runtime += time.time() - started
+                self.oracle_calls += stats.get('tests_started', 0) or 0
+
+    def snapshot(self) -> tuple:
+        """
+        Consistent copies of the queued and the running runs.
+        """
+        with self.lock:
+            return dict(self.queued), dict(self.running)
+
+    def eta(self) -> float:
+        """
+        Remaining work (historical estimates, or the mean runtime of the finished runs if
+        there is no history) divided by the workers.
+        """
+        with self.lock:
+            mean = self.finished_runtime / self.finished if self.finished else None
+        queued, running = self.snapshot()
+        now = time.time()
+
+        remaining = 0.
+        for estimate in queued.values():
+            estimate = estimate if estimate is not None else mean
+            if estimate is None:
+                return float('nan')
+            remaining += estimate
+        for started, estimate in running.values():
+            estimate = estimate if estimate is not None else mean
+            if estimate is None:
+                return float('nan')
+            remaining += max(estimate - (now - started), 0.)
+
+        return remaining / max(self.workers, 1)
+
+    def render(self) -> str:
+        queued, running = self.snapshot()
+        with self.lock:
+            finished, failed, oracle_calls = self.finished, self.failed, self.oracle_calls
+        now = time.time()
+        lines = [
+            '# HELP redubear_jobs Number of runs by state.',
+            '# TYPE redubear_jobs gauge',
+            f'redubear_jobs{_labels(state="queued")} {len(queued)}',
+            f'redubear_jobs{_labels(state="running")} {len(running)}',
+            f'redubear_jobs{_labels(state="finished")} {finished}',
+            f'redubear_jobs{_labels(state="failed")} {failed}',
+            '# HELP redubear_elapsed_seconds Time since the start of the benchmark.',
+            '# TYPE redubear_elapsed_seconds gauge',
+            f'redubear_elapsed_seconds {now - self.start_time:.3f}',
+            '# HELP redubear_eta_seconds Estimated time until the benchmark finishes.',
+            '# TYPE redubear_eta_seconds gauge',
+            f'redubear_eta_seconds {self.eta():.3f}',
+            '# HELP redubear_oracle_calls_total Oracle calls (tests started) of the finished runs.',
+            '# TYPE redubear_oracle_calls_total counter',
+            f'redubear_oracle_calls_total {oracle_calls}',
+            '# HELP redubear_run_elapsed_seconds Elapsed time of the running runs.',
+            '# TYPE redubear_run_elapsed_seconds gauge',
+        ]
+        for (tag, test, run_id), (started, _) in running.items():
+            lines.append(f'redubear_run_elapsed_seconds{_labels(tag=tag, test=test, run=run_id)} {now - started:.3f}')
+
+        lines += [
+            '# HELP redubear_worker_cpu_seconds CPU time of the process tree of a worker (reducer and SUT).',
+            '# TYPE redubear_worker_cpu_seconds gauge',
+        ]
+        workers = _process_tree_usage()
+        for pid, (cpu, _) in sorted(workers.items()):
+            lines.append(f'redubear_worker_cpu_seconds{_labels(worker=pid)} {cpu:.2f}')
+
+        lines += [
+            '# HELP redubear_worker_rss_bytes Resident memory of the process tree of a worker.',
+            '# TYPE redubear_worker_rss_bytes gauge',
+        ]
+        for pid, (_, rss) in sorted(workers.items()):
+            lines.append(f'redubear_worker_rss_bytes{_labels(worker=pid)} {rss}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self) -> None:
+        # Atomic replace, the collector must not read a partial file.
+        staging = self.path.with_name(f'.{self.path.name}.tmp')
+        staging.write_text(self.render())
+        replace(staging, self.path)
+
+    def _write_periodically(self) -> None:
+        while not self.stopped.is_set():
+            try:
+                self.write()
+            except OSError as e:
+                self.logger.warning(f'Metrics cannot be written: {e}')
+            except Exception as e:
+                # The metrics must not stop for the rest of the benchmark.
+                self.logger.error(f'Metrics cannot be rendered: {e!r}')
+            self.stopped.wait(self.interval)
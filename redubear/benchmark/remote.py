@@ -0,0 +1,404 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import base64
+import inspect
+import io
+import json
+import pickle
+import shutil
+import signal
+import socket
+import tarfile
+import time
+
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import active_children
+from os import getpid, kill
+from pathlib import Path, PurePosixPath
+from threading import Event, Lock, Thread
+from urllib.error import HTTPError, URLError
+from urllib.parse import parse_qs, quote, urlsplit
+from urllib.request import Request, urlopen
+
+from redubear.utils import get_logger, handle_termination
+
+# Note: the jobs are pickled (like the jobs of ProcessPoolExecutor), the coordinator and
+# the agents must trust each other.
+
+
+def _job_dir(arguments: dict) -> Path:
+    out_dir = arguments['output'] / arguments['name'] / arguments['tag']
+    return out_dir / arguments['run_id'] if arguments['run_id'] else out_dir
+
+
+def _pack_test(oracle: Path, input_file: Path) -> bytes:
+    """
+    The directory of the oracle (and the input if it is elsewhere) as a tar.gz archive.
+    """
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+        archive.add(oracle.parent, arcname='test')
+        if input_file.parent != oracle.parent:
+            archive.add(input_file, arcname=f'test/{input_file.name}')
+    return buffer.getvalue()
+
+
+class Coordinator(Executor):
+    """
+    Executor that hands out the submitted run_single jobs to remote agents over HTTP
+    instead of running them locally. The agents pull jobs when they have free slots
+    (hence faster agents take more of the queue), keep their leases alive with
+    heartbeats, upload the artifacts of the runs and then the statistics. Jobs whose
+    lease expires (e.g., the agent died) are queued again at the front.
+    """
+
+    def __init__(self, address: str, lease_timeout: float = 60., max_attempts: int = 3) -> None:
+        host, _, port = address.rpartition(':')
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.lock = Lock()
+        self.queue = deque()
+        self.jobs = dict()
+        self.archives = dict()
+        self.next_id = 0
+        self.closed = False
+        self.agents = dict()
+        self.released = set()
+        self.stopped = Event()
+        self.logger = get_logger('ReduBear')
+
+        coordinator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                coordinator._handle(self, 'GET')
+
+            def do_POST(self):
+                coordinator._handle(self, 'POST')
+
+            def do_PUT(self):
+                coordinator._handle(self, 'PUT')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), Handler)
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        Thread(target=self._reap, daemon=True).start()
+        self.logger.warning(f'Coordinator is listening on {host or "127.0.0.1"}:{self.server.server_port}')
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        bound = inspect.signature(fn).bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = bound.arguments
+        future = Future()
+        with self.lock:
+            job_id = str(self.next_id)
+            self.next_id += 1
+            self.jobs[job_id] = {
+                'payload': base64.b64encode(pickle.dumps((fn, arguments))).decode(),
+                'arguments': arguments,
+                'future': future,
+                'agent': None,
+                'deadline': None,
+                'attempts': 0,
+            }
+            self.queue.append(job_id)
+        return future
+
+    def shutdown(self, wait=True, *, cancel_futures=False) -> None:
+        # The agents get "410 Gone" for their next lease requests and exit.
+        with self.lock:
+            self.closed = True
+        if wait:
+            # Give the polling agents the chance to learn that the benchmark is over.
+            deadline = time.time() + 10.
+            while time.time() < deadline:
+                with self.lock:
+                    alive = {agent for agent, seen in self.agents.items() if time.time() - seen < self.lease_timeout}
+                    if not alive - self.released:
+                        break
+                time.sleep(.2)
+        self.stopped.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _reap(self) -> None:
+        while not self.stopped.wait(1.):
+            now = time.time()
+            with self.lock:
+                for job_id, job in self.jobs.items():
+                    if job['agent'] is None or job['future'].done() or job['deadline'] > now:
+                        continue
+
+                    self.logger.warning(f'Job {job_id} ({job["arguments"]["name"]}) of {job["agent"]} was lost.')
+                    job['agent'] = None
+                    if job['attempts'] >= self.max_attempts:
+                        job['future'].set_exception(Exception(f'lost by the agents {job["attempts"]} times'))
+                    else:
+                        self.queue.appendleft(job_id)
+
+    def _handle(self, request, method: str) -> None:
+        url = urlsplit(request.path)
+        parts = PurePosixPath(url.path).parts[1:]
+        length = int(request.headers.get('Content-Length', 0))
+        body = request.rfile.read(length) if length else b''
+
+        try:
+            status, response = self._route(method, parts, body, parse_qs(url.query))
+        except (KeyError, ValueError) as e:
+            status, response = 400, {'error': repr(e)}
+
+        if isinstance(response, bytes):
+            data, content_type = response, 'application/octet-stream'
+        else:
+            data, content_type = json.dumps(response).encode(), 'application/json'
+
+        request.send_response(status)
+        request.send_header('Content-Type', content_type)
+        request.send_header('Content-Length', str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+    def _route(self, method: str, parts: tuple, body: bytes, query: dict):
+        if method == 'POST' and parts == ('lease',):
+            return self._lease(json.loads(body)['agent'])
+
+        if method == 'POST' and parts == ('heartbeat',):
+            message = json.loads(body)
+            with self.lock:
+                for job_id in message['jobs']:
+                    job = self.jobs.get(job_id)
+                    if job and job['agent'] == message['agent']:
+                        job['deadline'] = time.time() + self.lease_timeout
+            return 200, {}
+
+        if method == 'GET' and len(parts) == 2 and parts[0] == 'test':
+            with self.lock:
+                arguments = self.jobs[parts[1]]['arguments']
+                key = (arguments['oracle'], arguments['input_file'])
+                archive = self.archives.get(key)
+            if archive is None:
+                # Packed without the lock, the heartbeats must not wait for large tests.
+                archive = _pack_test(*key)
+                with self.lock:
+                    archive = self.archives.setdefault(key, archive)
+            return 200, archive
+
+        if method == 'PUT' and len(parts) > 2 and parts[0] == 'artifact':
+            relative = PurePosixPath(*parts[2:])
+            if relative.is_absolute() or '..' in relative.parts:
+                return 400, {'error': 'invalid artifact path'}
+
+            with self.lock:
+                job = self.jobs[parts[1]]
+                # The artifacts of a lost lease would overwrite the ones of the new holder (or of the result).
+                if job['agent'] != query['agent'][0] or job['future'].done():
+                    return 409, {'error': 'the job is not leased by the agent'}
+
+            destination = _job_dir(job['arguments']) / relative
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            destination.write_bytes(body)
+            return 200, {}
+
+        if method == 'POST' and len(parts) == 2 and parts[0] == 'result':
+            return self._result(parts[1], json.loads(body))
+
+        return 404, {'error': 'unknown endpoint'}
+
+    def _lease(self, agent: str):
+        with self.lock:
+            self.agents[agent] = time.time()
+            while self.queue:
+                job_id = self.queue.popleft()
+                job = self.jobs[job_id]
+                if job['future'].done():
+                    continue
+
+                if job['attempts'] == 0:
+                    job['future'].set_running_or_notify_cancel()
+                job['agent'] = agent
+                job['attempts'] += 1
+                job['deadline'] = time.time() + self.lease_timeout
+                self.logger.info(f'Job {job_id} ({job["arguments"]["name"]}) leased by {agent}.')
+                return 200, {'id': job_id, 'payload': job['payload']}
+
+            if self.closed:
+                self.released.add(agent)
+                return 410, {}
+            return 204, {}
+
+    def _result(self, job_id: str, message: dict):
+        with self.lock:
+            job = self.jobs[job_id]
+            if job['future'].done():
+                # A lost job was finished by another agent as well, the first result is kept.
+                return 200, {'accepted': False}
+            if job['agent'] != message['agent']:
+                # The lease expired, the artifacts may be uploaded by the new holder.
+                return 409, {'error': 'the job is not leased by the agent'}
+            job['agent'] = None
+
+        # The paths of the artifacts point to the directories of the agent.
+        arguments = job['arguments']
+        out_dir = str(_job_dir(arguments))
+        result = message['result']
+        for stats in result.values():
+            for key, value in stats.items():
+                if isinstance(value, str) and value.startswith(message['out_dir']):
+                    stats[key] = out_dir + value[len(message['out_dir']):]
+            if 'path_input' in stats:
+                stats['path_input'] = str(arguments['input_file'])
+            stats['agent'] = message['agent']
+
+        job['future'].set_result(result)
+        return 200, {'accepted': True}
+
+
+class Agent:
+    """
+    Worker of a coordinator. Runs the leased jobs with run_single in local processes
+    (in parallel on its slots) on a local copy of the test directory, then uploads the
+    artifacts and the statistics.
+    """
+
+    def __init__(self, url: str, slots: int, work_dir: Path, name: str = None,
+                 heartbeat: float = 10., poll: float = 2., verdict_cache: Path = None, result_cache: Path = None,
+                 patience: float = 300.) -> None:
+        self.url = url.rstrip('/')
+        self.slots = slots
+        self.work_dir = work_dir
+        self.name = name or f'{socket.gethostname()}-{getpid()}'
+        self.heartbeat = heartbeat
+        self.poll = poll
+        self.verdict_cache = verdict_cache
+        self.result_cache = result_cache
+        self.patience = patience
+        self.running = dict()
+        self.stopped = Event()
+        self.logger = get_logger('ReduBear')
+
+    def _request(self, method: str, path: str, body=None, data: bytes = None):
+        if body is not None:
+            data = json.dumps(body).encode()
+        request = Request(f'{self.url}{path}', data=data, method=method)
+        with urlopen(request, timeout=60) as response:
+            content = response.read()
+            return response.status, content
+
+    def run(self) -> int:
+        executor = ProcessPoolExecutor(max_workers=self.slots, initializer=handle_termination)
+        Thread(target=self._send_heartbeats, daemon=True).start()
+
+        finished = False
+        reachable = time.time()
+        try:
+            while not (finished and not self.running):
+                while not finished and len(self.running) < self.slots:
+                    try:
+                        status, content = self._request('POST', '/lease', {'agent': self.name})
+                    except HTTPError as e:
+                        if e.code != 410:
+                            raise
+                        finished = True
+                        break
+                    except URLError as e:
+                        self.logger.warning(f'Coordinator is unreachable: {e.reason}')
+                        if not self.running and time.time() - reachable > self.patience:
+                            self.logger.error(f'{self.name}: the coordinator is unreachable for {self.patience}s, giving up.')
+                            return 1
+                        break
+
+                    reachable = time.time()
+                    if status == 204:
+                        break
+
+                    job = json.loads(content)
+                    try:
+                        fn, arguments = self._localize(job)
+                    except (HTTPError, URLError) as e:
+                        # The lease expires, the job is reassigned.
+                        self.logger.error(f'{self.name}: the test of job {job["id"]} cannot be downloaded: {e}')
+                        shutil.rmtree(self.work_dir / 'jobs' / job['id'], ignore_errors=True)
+                        continue
+                    self.running[executor.submit(fn, **arguments)] = (job['id'], arguments)
+
+                if not self.running:
+                    if not finished:
+                        time.sleep(self.poll)
+                    continue
+
+                done, _ = wait(self.running, timeout=self.poll, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id, arguments = self.running.pop(future)
+                    self._report(job_id, arguments, future)
+        except KeyboardInterrupt:
+            # The workers stop their reductions, the leases expire and the jobs are handed out again.
+            self.logger.warning(f'{self.name}: interrupted, stopping the running jobs ...')
+            for child in active_children():
+                kill(child.pid, signal.SIGTERM)
+            raise
+        finally:
+            self.stopped.set()
+            executor.shutdown()
+
+        self.logger.info(f'{self.name}: the coordinator has no more jobs.')
+        return 0
+
+    def _localize(self, job: dict):
+        fn, arguments = pickle.loads(base64.b64decode(job['payload']))
+        job_dir = self.work_dir / 'jobs' / job['id']
+        shutil.rmtree(job_dir, ignore_errors=True)
+        job_dir.mkdir(parents=True)
+
+        _, archive = self._request('GET', f'/test/{job["id"]}')
+        with tarfile.open(fileobj=io.BytesIO(archive), mode='r:gz') as test:
+            test.extractall(job_dir, filter='data')
+
+        arguments['oracle'] = job_dir / 'test' / arguments['oracle'].name
+        arguments['input_file'] = job_dir / 'test' / arguments['input_file'].name
+        arguments['output'] = self.work_dir / 'output'
+        arguments['temp'] = self.work_dir / 'temp'
+        arguments['cpus'] = None
+        arguments['verdict_cache'] = self.verdict_cache
+        arguments['result_cache'] = self.result_cache
+        self.logger.info(f'{self.name}: job {job["id"]} ({arguments["name"]}) started.')
+        return fn, arguments
+
+    def _report(self, job_id: str, arguments: dict, future) -> None:
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {arguments['name']: {'error': repr(e)}}
+
+        out_dir = _job_dir(arguments)
+        try:
+            if 'error' not in result[arguments['name']]:
+                for artifact in out_dir.iterdir():
+                    if artifact.is_file():
+                        self._request('PUT', f'/artifact/{job_id}/{artifact.name}?agent={quote(self.name)}',
+                                      data=artifact.read_bytes())
+
+            self._request('POST', f'/result/{job_id}', {'agent': self.name, 'out_dir': str(out_dir), 'result': result})
+        except (HTTPError, URLError) as e:
+            # The lease expires, the job is reassigned.
+            self.logger.error(f'{self.name}: the result of job {job_id} cannot be reported: {e}')
+        finally:
+            shutil.rmtree(self.work_dir / 'jobs' / job_id, ignore_errors=True)
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    def _send_heartbeats(self) -> None:
+        while not self.stopped.wait(self.heartbeat):
+            jobs = [job_id for job_id, _ in list(self.running.values())]
+            if not jobs:
+                continue
+            try:
+                self._request('POST', '/heartbeat', {'agent': self.name, 'jobs': jobs})
+            except (HTTPError, URLError, OSError) as e:
+                self.logger.warning(f'{self.name}: heartbeat failed: {e}')
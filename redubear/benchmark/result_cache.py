@@ -0,0 +1,130 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import hashlib
+import json
+import platform
+import shutil
+
+from functools import cache
+from os import environ, getpid
+from pathlib import Path
+
+from redubear.utils import ReportGenerator
+
+# Environment variables that change the behaviour of the reducers or the oracles.
+ENVIRONMENT = ['PATH', 'PYTHONPATH', 'JAVA_HOME', 'JAVA_TOOL_OPTIONS', 'LANG', 'LC_ALL', 'CC', 'CXX']
+META = 'fingerprint.json'
+
+
+def _hash_file(path: Path, digest) -> None:
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+
+
+@cache
+def _cpu_model() -> str:
+    try:
+        with open('/proc/cpuinfo') as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith('model name'):
+                    return line.partition(':')[2].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+class ResultCache:
+    """
+    Content-addressed cache of successful runs, shared by every tag. The key is the
+    fingerprint of everything that determines a result: the generated reducer command
+    (with the run specific paths replaced by placeholders), the content of the input and
+    of the files next to the oracle, the version of the reducer, the measurement settings
+    and the relevant environment. The runtime and memory results are only valid on the
+    same host, hence the hostname and the CPU model are part of the environment (e.g., a
+    cache shared on NFS or by remote agents is not reused across hosts).
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    @staticmethod
+    def fingerprint(reducer, oracle: Path, input_file: Path, settings: dict) -> str:
+        command = reducer.generate_command(Path('@test') / oracle.name, Path('@test') / input_file.name,
+                                           Path('@temp'), Path('@stats'))
+
+        digest = hashlib.sha256(input_file.name.encode())
+        _hash_file(input_file, digest)
+        # The oracle may depend on the other files of its directory (e.g., helper scripts),
+        # but not on the transient files of the concurrent reductions of the same test.
+        artifacts = reducer.artifacts(input_file)
+        for path in sorted(oracle.parent.iterdir()):
+            if path.is_file() and path != input_file and not any(path.match(pattern) for pattern in artifacts):
+                digest.update(f'\0{path.name}\0'.encode())
+                _hash_file(path, digest)
+
+        return hashlib.sha256(json.dumps({
+            'command': command,
+            'test': digest.hexdigest(),
+            'reducer': reducer.describe_version(),
+            'settings': settings,
+            'environment': {name: environ.get(name) for name in ENVIRONMENT},
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'host': platform.node(),
+            'cpu': _cpu_model(),
+        }, sort_keys=True, default=str).encode()).hexdigest()
+
+    def load(self, key: str, out_dir: Path) -> dict:
+        """
+        Materializes a cached result into out_dir. Returns its statistics, or None on a miss.
+        """
+        entry = self.root / key[:2] / key
+        try:
+            meta = json.loads((entry / META).read_text())
+            out_dir.mkdir(parents=True, exist_ok=True)
+            for artifact in entry.iterdir():
+                if artifact.name != META:
+                    shutil.copy2(artifact, out_dir / artifact.name)
+        except (OSError, ValueError):
+            # Missing, or replaced by a concurrent store meanwhile.
+            return None
+
+        # The paths of the artifacts point to the directory of the cached run.
+        stats = ReportGenerator.read(out_dir / 'picire.json')
+        for k, v in stats.items():
+            if isinstance(v, str) and v.startswith(meta['out_dir']):
+                stats[k] = str(out_dir) + v[len(meta['out_dir']):]
+        stats['result_cache'] = {'fingerprint': key, 'source': meta['out_dir']}
+        ReportGenerator.dump(stats, out_dir / 'picire.json')
+        return stats
+
+    def store(self, key: str, out_dir: Path) -> None:
+        entry = self.root / key[:2] / key
+        staging = self.root / key[:2] / f'{key}.{getpid()}.tmp'
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+
+        # Only the artifacts of the run, not the directories of the repeated runs.
+        for artifact in out_dir.iterdir():
+            if artifact.is_file():
+                shutil.copy2(artifact, staging / artifact.name)
+        (staging / META).write_text(json.dumps({'out_dir': str(out_dir)}))
+
+        # Another worker (or a forced rerun) may have stored the same fingerprint meanwhile.
+        # The old entry is renamed aside, never deleted in place, so a concurrent load reads
+        # either a complete entry or none.
+        retired = self.root / key[:2] / f'{key}.{getpid()}.old'
+        try:
+            entry.rename(retired)
+        except FileNotFoundError:
+            pass
+        try:
+            staging.rename(entry)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+        shutil.rmtree(retired, ignore_errors=True)
@@ -0,0 +1,154 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import heapq
+
+from os import sched_getaffinity
+from pathlib import Path
+from statistics import median
+
+from redubear.utils import ReportGenerator
+
+
+class RuntimeEstimator:
+    """
+    Estimates the runtime of a test from the statistics of previous experiments
+    saved in the output directory: the ones of the given tag (i.e., of the same reducer
+    configuration), or of any tag if no tag is given. Tests without history are estimated
+    from their input size using the average runtime/byte rate of the known tests.
+    With calibrated oracle costs, the estimate is the number of oracle calls times
+    the cost plus the overhead of the reducer.
+    """
+
+    def __init__(self, output: Path, tag: str = None) -> None:
+        self.output = output
+        self.tag = tag
+        self.history = dict()
+        self.queries = dict()
+        self.overheads = dict()
+        self.memory = dict()
+
+    def load(self, name: str) -> list[float]:
+        if name in self.history:
+            return self.history[name]
+
+        runtimes = []
+        self.queries[name] = []
+        self.overheads[name] = []
+        self.memory[name] = []
+        stat_files = [self.output / name / self.tag / 'picire.json'] if self.tag else (self.output / name).glob('*/picire.json')
+        for stat_file in stat_files:
+            try:
+                stats = ReportGenerator.read(stat_file)
+            except (OSError, ValueError):
+                # Raw (not post-processed) statistics of a failed experiment.
+                continue
+
+            if 'runtime' in stats:
+                runtimes.append(float(stats['runtime']))
+            if 'tests_started' in stats:
+                self.queries[name].append(int(stats['tests_started']))
+            if 'reducer_overhead (s)' in stats:
+                self.overheads[name].append(float(stats['reducer_overhead (s)']))
+            # Measured by the memory sampler or by the resource accounting (reducer + SUT).
+            peaks = [stats.get('peak_memory (MB)'), stats.get('maxrss_tree'),
+                     (stats.get('maxrss_reducer') or 0) + (stats.get('maxrss_sut') or 0)]
+            peaks = [float(peak) for peak in peaks if isinstance(peak, (int, float)) and peak > 0]
+            if peaks:
+                self.memory[name].append(max(peaks))
+
+        self.history[name] = runtimes
+        return runtimes
+
+    def estimate(self, tests: list, oracle_costs: dict = None) -> dict:
+        """
+        Returns the estimated runtimes (in seconds) of the given (name, oracle, input_file) tests.
+        If none of the tests has history, the estimations are the input sizes (in bytes, or bytes
+        times the oracle cost) that are only usable for ordering.
+        """
+        known = dict()
+        sizes = dict()
+        for name, _, input_file in tests:
+            sizes[name] = input_file.stat().st_size
+            runtimes = self.load(name)
+            if runtimes:
+                known[name] = median(runtimes)
+
+        known_bytes = sum(sizes[name] for name in known)
+        rate = sum(known.values()) / known_bytes if known_bytes else 1.
+
+        estimates = {name: known.get(name, size * rate) for name, size in sizes.items()}
+        if not oracle_costs:
+            return estimates
+
+        # The oracle calls of the tests without history are estimated from the calls/byte rate.
+        queries = {name: median(self.queries[name]) for name in sizes if self.queries.get(name)}
+        query_bytes = sum(sizes[name] for name in queries)
+        query_rate = sum(queries.values()) / query_bytes if query_bytes else 1.
+
+        for name, size in sizes.items():
+            if name in oracle_costs:
+                overhead = median(self.overheads[name]) if self.overheads.get(name) else 0.
+                estimates[name] = queries.get(name, size * query_rate) * oracle_costs[name] + overhead
+        return estimates
+
+    def peak_memory(self, tests: list) -> dict:
+        """
+        Returns the highest peak RSS (MB) of the given tests in the previous experiments.
+        Tests without history get the median of the known tests (None if there are none).
+        """
+        known = dict()
+        for name, _, _ in tests:
+            self.load(name)
+            if self.memory[name]:
+                known[name] = max(self.memory[name])
+        default = median(known.values()) if known else None
+        return {name: known.get(name, default) for name, _, _ in tests}
+
+    def has_history(self) -> bool:
+        return any(self.history.values())
+
+
+def longest_first(tests: list, estimates: dict) -> list:
+    return sorted(tests, key=lambda test: estimates[test[0]], reverse=True)
+
+
+def predict_makespan(durations: list[float], workers: int) -> float:
+    """
+    Simulates list scheduling of the durations (in the given order) on the given number
+    of workers and returns the finish time of the last job.
+    """
+    slots = [0.] * max(workers, 1)
+    for duration in durations:
+        heapq.heappush(slots, heapq.heappop(slots) + duration)
+
+    return max(slots)
+
+
+class CpuBudget:
+    """
+    Treats the CPUs available to the process as a budget. A reduction acquires as
+    many CPUs as its reducer's parallel jobs and is pinned to them.
+    """
+
+    def __init__(self, cpus: list[int] = None) -> None:
+        self.cpus = sorted(cpus or sched_getaffinity(0))
+        self.free = list(self.cpus)
+
+    def acquire(self, count: int):
+        """
+        Returns the acquired CPUs, or None if not enough CPUs are free. Requests larger
+        than the whole budget are limited to the budget.
+        """
+        count = min(max(count, 1), len(self.cpus))
+        if count > len(self.free):
+            return None
+
+        acquired, self.free = self.free[:count], self.free[count:]
+        return acquired
+
+    def release(self, cpus: list[int]) -> None:
+        self.free = sorted(self.free + cpus)
@@ -0,0 +1,136 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import re
+
+from argparse import ArgumentParser, _AppendAction, _SubParsersAction
+from itertools import product
+from pathlib import Path
+
+
+def load_spec(path: Path) -> dict:
+    """
+    Reads a sweep specification (YAML or TOML) with two optional keys:
+
+        axes:      {option: [values]}    every combination of the values
+        configs:   [{option: value}]     explicit configurations (an optional "tag" key names it)
+
+    The options are the (reducer) command line options without the leading dashes.
+    """
+    if path.suffix in ['.yaml', '.yml']:
+        try:
+            import yaml
+        except ImportError:
+            raise Exception('PyYAML is required to read YAML sweep specifications.')
+        with open(path) as f:
+            spec = yaml.safe_load(f) or dict()
+    elif path.suffix == '.toml':
+        import tomllib
+        with open(path, 'rb') as f:
+            spec = tomllib.load(f)
+    else:
+        raise NotImplementedError('Currently only YAML and TOML sweep specifications are supported.')
+
+    if set(spec) - {'axes', 'configs'}:
+        raise Exception(f'Unknown keys in {path}: {", ".join(sorted(set(spec) - {"axes", "configs"}))}')
+    return spec
+
+
+def parse_axis(definition: str) -> tuple[str, list]:
+    """
+    Parses a "--set OPTION=V1,V2,..." axis, "true" and "false" are booleans (as in the
+    specifications).
+    """
+    option, separator, values = definition.partition('=')
+    if not separator or not option:
+        raise Exception(f'Invalid sweep axis: {definition} (expected OPTION=V1,V2,...)')
+    return option, [{'true': True, 'false': False}.get(value, value) for value in values.split(',')]
+
+
+def expand(spec: dict) -> list[dict]:
+    """
+    Returns the configurations ({option: value}) of a sweep: the product of the axes
+    followed by the explicit configurations.
+    """
+    axes = spec.get('axes', dict())
+    configs = [dict(zip(axes, values)) for values in product(*axes.values())] if axes else []
+    return configs + [dict(config) for config in spec.get('configs', [])]
+
+
+def append_options(parser: ArgumentParser) -> dict:
+    """
+    Returns the flags ({flag: every flag of the option}) of the repeatable (append action)
+    options of the parser and of its subparsers (e.g., --phase of Picireny).
+    """
+    return _options(parser, lambda action: isinstance(action, _AppendAction))
+
+
+def switch_options(parser: ArgumentParser) -> dict:
+    """
+    Returns the flags ({flag: every flag of the option}) of the options without a value
+    (e.g., store_true) of the parser and of its subparsers.
+    """
+    return _options(parser, lambda action: action.option_strings and action.nargs == 0)
+
+
+def _options(parser: ArgumentParser, predicate) -> dict:
+    options = dict()
+    for action in parser._actions:
+        if isinstance(action, _SubParsersAction):
+            for subparser in action.choices.values():
+                options.update(_options(subparser, predicate))
+        elif predicate(action):
+            options.update({flag: action.option_strings for flag in action.option_strings})
+    return options
+
+
+def remove_options(argv: list[str], flags: list[str], switches: list[str] = ()) -> list[str]:
+    """
+    Removes the given single-value options ("--flag value" or "--flag=value") and the given
+    options without a value (switches) from a command line.
+    """
+    remaining = []
+    skip = False
+    for argument in argv:
+        if skip:
+            skip = False
+        elif argument in flags:
+            skip = True
+        elif argument.partition('=')[0] not in flags and argument not in switches:
+            remaining.append(argument)
+    return remaining
+
+
+def to_arguments(config: dict, repeatable: dict = None) -> list[str]:
+    """
+    Command line form of a configuration. None keeps the default, True gives the flag and
+    False omits it (the flag is removed from the base command line by the caller, see
+    remove_options). The values of a repeatable option are given one by one.
+    """
+    arguments = []
+    for option, value in config.items():
+        if option == 'tag' or value is None or value is False:
+            continue
+
+        flag = f'--{option.replace("_", "-")}'
+        if value is True:
+            arguments.append(flag)
+        elif isinstance(value, list) and flag in (repeatable or dict()):
+            for v in value:
+                arguments += [flag, str(v)]
+        elif isinstance(value, list):
+            arguments += [flag] + [str(v) for v in value]
+        else:
+            arguments += [flag, str(value)]
+    return arguments
+
+
+def config_tag(prefix: str, config: dict) -> str:
+    if 'tag' in config:
+        return str(config['tag'])
+
+    parts = [f'{option}={value}' for option, value in config.items()]
+    return re.sub(r'[^\w.=+-]', '_', '-'.join([prefix] + parts))
@@ -5,17 +5,28 @@
 # This file may not be copied, modified, or distributed except
 # according to those terms.
 
+import asyncio
+import json
+import os
+import signal
+import sys
+
 from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
 from os import cpu_count
 from pathlib import Path
 
 from redubear.utils import get_logger
 from redubear.utils import process_path
+from redubear.utils import Limits
+from redubear.utils import CommandRegistry
 from redubear.utils import ReducerRegistry
 from redubear.utils import ReportGenerator
-from redubear.benchmark import Tests, Benchmark
+from redubear.utils import SizeMetrics
+from redubear.utils.size_metrics import CACHE_DIR
+from redubear.benchmark import Tests, AdaptiveConcurrency, Benchmark, Coordinator, ProgressExporter
+from redubear.benchmark.sweep import append_options, config_tag, expand, load_spec, parse_axis, remove_options, switch_options, to_arguments
 
-def parse_args():
+def create_parser() -> ArgumentParser:
     parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
     parser.add_argument('-t', '--tag',
                         required=True,
@@ -35,15 +46,168 @@ def parse_args():
                         metavar=f'[0, {cpu_count()}]',
                         help='Number of workers to use to parallel reduce the tests')
 
+    parser.add_argument('--adaptive',
+                        default=False,
+                        action='store_true',
+                        help='Adapt the number of concurrent reductions (at most "--workers") to the CPU and memory pressure (PSI), the available memory and the run queue of the machine, and start a reduction only if the historical peak RSS of its test fits into the available memory. The decisions are logged into ReduBear-<tag>-concurrency.jsonl.')
+
     parser.add_argument('--valgrind',
                         default=False,
                         action='store_true',
-                        help='Measure peak memory usage of the reducer excluding the SUT')
+                        help='Measure peak memory usage of the reducer excluding the SUT (alias of "--memory-sampler valgrind")')
+
+    parser.add_argument('--memory-sampler',
+                        choices=['valgrind', 'proc'],
+                        default=None,
+                        help='Measure peak memory usage of the reducer excluding the SUT. "valgrind" runs the reducer under massif (slow), "proc" samples /proc/<pid>/status of the reducer process (negligible overhead, timing remains valid). Independently of this option, the peak RSS of the reducer is tracked at a low rate to split the peak RSS of the resource accounting between the reducer and the SUT.')
+
+    parser.add_argument('--memory-interval',
+                        type=float,
+                        default=0.1,
+                        metavar='SEC',
+                        help='Sampling interval of "--memory-sampler proc".')
+
+    parser.add_argument('--database',
+                        type=lambda p: process_path(parser, p),
+                        default=None,
+                        metavar='DB_FILE',
+                        help='Also store the report in an indexed SQLite result store (appended as a new run of the tag). Query it with "python -m redubear query".')
 
     parser.add_argument('--force',
                         default=False,
                         action='store_true',
-                        help='Force remeasuring experiments. If a previous experiment was carried out with the same tag, "--force" ignores it and runs the experiment again (overwrites the results).')
+                        help='Force remeasuring experiments. If an identical run was measured before (with any tag), "--force" ignores the cached result and runs the experiment again (overwrites the results).')
+
+    parser.add_argument('--result-cache',
+                        type=lambda p: process_path(parser, p),
+                        default=None,
+                        metavar='CACHE_DIR',
+                        help='Content-addressed cache of the results keyed by the fingerprint of the reducer command, the input and oracle files, the reducer version and the environment including the host and its CPU model (default: OUTPUT_DIR/.result-cache).')
+
+    parser.add_argument('--no-result-cache',
+                        default=False,
+                        action='store_true',
+                        help='Neither reuse nor store cached results.')
+
+    parser.add_argument('--resume',
+                        default=False,
+                        action='store_true',
+                        help='Resume an interrupted benchmark. Tests that have a successful entry in the result journal (ReduBear-<tag>.jsonl) of the same tag are not run again. Without "--resume", the journal is restarted.')
+
+    parser.add_argument('--grace-period',
+                        type=float,
+                        default=10.,
+                        metavar='SECONDS',
+                        help='On Ctrl-C or SIGTERM, the running reductions get SIGTERM and are killed after this time (a second signal kills them at once). Their best intermediate outputs are saved and marked "interrupted"; they are run again with "--resume".')
+
+    parser.add_argument('--checkpoint',
+                        default=False,
+                        action='store_true',
+                        help='Keep a copy of the smallest interesting candidate of every reduction (via an oracle wrapper), saved as the partial result if the benchmark is interrupted. Without it, only the intermediate outputs written by the reducers themselves (e.g., Perses) are saved.')
+
+    parser.add_argument('--trajectory',
+                        default=False,
+                        action='store_true',
+                        help='Record the size of the best interesting candidate over time (via an oracle wrapper). The report gets the (seconds, bytes, tokens) series of the improvements, the time to 50/90/95/99%% of the reduction and the normalized area under the size curve (the mean relative size over the runtime, lower is better).')
+
+    parser.add_argument('--schedule',
+                        choices=['longest-first', 'fifo'],
+                        default='longest-first',
+                        help='Order in which the tests are started. "longest-first" estimates the runtimes from previous experiments (or from the input sizes) and starts the longest ones first, "fifo" keeps the order of the benchmark suite.')
+
+    parser.add_argument('--trace-oracle',
+                        default=False,
+                        action='store_true',
+                        help='Record every oracle invocation (start, end, exit code, candidate size) into oracle-trace.jsonl and report the oracle latency histogram, the time spent inside and outside of the oracle and the parallel utilization.')
+
+    parser.add_argument('--calibrate',
+                        type=int,
+                        default=0,
+                        metavar='K',
+                        help='Run the oracle of every test K times on its original input (the tests in parallel) before the reductions. The report gets the mean and p95 latency of the oracle and its variance, the overhead of the reducer (runtime - tests_started * oracle cost / parallel jobs) and the predicted runtime. The oracle costs also refine the job order.')
+
+    parser.add_argument('--verdict-cache',
+                        type=lambda p: process_path(parser, p),
+                        default=None,
+                        metavar='DB_FILE',
+                        help='Persistent SQLite cache of oracle verdicts keyed by the oracle and the candidate content. It is shared across runs, tags and reducers. Every oracle call starts a Python interpreter; the report gets this overhead and the saved time (oracle latency of the hits minus the overhead), as the cache does not pay off for fast oracles.')
+
+    parser.add_argument('--verdict-cache-size',
+                        type=int,
+                        default=1000000,
+                        metavar='N',
+                        help='Maximum number of verdicts in "--verdict-cache". The least recently used ones are evicted.')
+
+    parser.add_argument('--pin-cpus',
+                        default=False,
+                        action='store_true',
+                        help='Treat the CPUs as a budget: a test is started only when as many CPUs are free as the parallel jobs of its reducer, and the reducer (with its oracle calls) is pinned to those CPUs.')
+
+    parser.add_argument('--in-process',
+                        default=False,
+                        action='store_true',
+                        help='Run Python reducers (picire, picireny) inside the worker processes instead of starting a new interpreter for every test. ReduBear restarts itself with -O (as the reducer subprocesses are run) if needed. Incompatible with "--valgrind" and the limit options.')
+
+    parser.add_argument('--engine',
+                        choices=['process', 'asyncio'],
+                        default='process',
+                        help='Run the reductions in a pool of worker processes (process), or as subprocesses of a single event loop (asyncio). The asyncio engine does not report the CPU and context switch counters of the process trees and is incompatible with "--in-process".')
+
+    parser.add_argument('--repeat',
+                        type=int,
+                        default=1,
+                        metavar='N',
+                        help='Number of measured runs of every test. The report contains the median, MAD, min and the bootstrap confidence interval of the runtime, the number of tests and the peak memory.')
+
+    parser.add_argument('--warmup',
+                        type=int,
+                        default=0,
+                        metavar='K',
+                        help='Number of unmeasured runs of every test before the measured ones.')
+
+    limits_parser = parser.add_argument_group('Limit Options')
+    limits_parser.add_argument('--timeout',
+                               type=float,
+                               default=None,
+                               metavar='SEC',
+                               help='Wall-clock limit of a reduction. The whole process tree of the reducer (including the SUT) is killed when exceeded.')
+
+    limits_parser.add_argument('--cpu-limit',
+                               type=int,
+                               default=None,
+                               metavar='SEC',
+                               help='CPU time limit of each process of a reduction (RLIMIT_CPU).')
+
+    limits_parser.add_argument('--memory-limit',
+                               type=int,
+                               default=None,
+                               metavar='MB',
+                               help='Address space limit of each process of a reduction (RLIMIT_AS). Note that JVMs reserve more virtual memory than their heap size.')
+
+    parser.add_argument('--size-cache',
+                        type=lambda p: process_path(parser, p),
+                        default=CACHE_DIR,
+                        metavar='DIR',
+                        help='Directory of the memoized size metrics (bytes, nws, lines, tokens) of the test cases, keyed by content hash, and of the generated lexers.')
+
+    parser.add_argument('--antlr',
+                        type=lambda p: process_path(parser, p, should_exist=True),
+                        default=None,
+                        metavar='JAR',
+                        help='ANTLR tool to generate the lexers of the token counts (default: the one of picireny). The token counts also require Java and the ANTLR Python runtime.')
+
+    sweep_parser = parser.add_argument_group('Sweep Options')
+    sweep_parser.add_argument('--sweep',
+                              type=lambda p: process_path(parser, p, should_exist=True),
+                              default=None,
+                              metavar='SPEC_FILE',
+                              help='Run a matrix of reducer configurations through the same workers. The YAML/TOML specification has "axes" ({option: [values]}, every combination) and/or "configs" ([{option: value}]) of reducer options. Every configuration has its own tag (UNIQUE_TAG-option=value-...) and report; identical configurations run only once.')
+
+    sweep_parser.add_argument('--set',
+                              action='append',
+                              default=[],
+                              metavar='OPTION=V1,V2,...',
+                              help='Sweep axis of a reducer option (e.g., "--set cache=config,config-tuple --set jobs=1,4"). Can be repeated and combined with "--sweep".')
 
     parser.add_argument('--temp',
                         type=lambda p: process_path(parser, p),
@@ -51,6 +215,54 @@ def parse_args():
                         metavar='TEMP_DIR',
                         help='Temporary directory where the reducers can save their intermediate files (will be deleted).')
 
+    parser.add_argument('--ram-workspace',
+                        default=False,
+                        action='store_true',
+                        help='Run every reduction in an isolated copy of its test directory under "--ram-root". Falls back to TEMP_DIR if it does not have enough capacity. Only the final artifacts are copied back.')
+
+    parser.add_argument('--ram-root',
+                        type=lambda p: process_path(parser, p),
+                        default=Path('/dev/shm/redubear'),
+                        metavar='RAM_DIR',
+                        help='RAM-backed (tmpfs) directory of the "--ram-workspace" workspaces.')
+
+    remote_parser = parser.add_argument_group('Distributed Options (python -m redubear serve ...)')
+    remote_parser.add_argument('--listen',
+                               default='127.0.0.1:8765',
+                               metavar='HOST:PORT',
+                               help='Address of the coordinator. In serve mode, the jobs are run by the agents ("python -m redubear agent http://HOST:PORT") instead of local workers. The coordinator has no authentication and the jobs are pickled: listen on other interfaces (e.g., 0.0.0.0) only in a trusted network.')
+
+    remote_parser.add_argument('--lease-timeout',
+                               type=float,
+                               default=60.,
+                               metavar='SEC',
+                               help='A job is reassigned to another agent if its agent sends no heartbeat for this long.')
+
+    remote_parser.add_argument('--remote-slots',
+                               type=int,
+                               default=256,
+                               metavar='N',
+                               help='Maximum number of jobs handed out to the agents at once.')
+
+    metrics_parser = parser.add_argument_group('Metrics Options')
+    metrics_parser.add_argument('--metrics-file',
+                                type=lambda p: process_path(parser, p),
+                                default=None,
+                                metavar='PROM_FILE',
+                                help='Periodically write the live progress (queued/running/finished runs, elapsed time per run, ETA, CPU and RSS per worker, oracle calls) in the Prometheus text format, e.g., into the directory of the node exporter textfile collector.')
+
+    metrics_parser.add_argument('--metrics-port',
+                                type=int,
+                                default=None,
+                                metavar='PORT',
+                                help='Serve the live progress metrics on http://127.0.0.1:PORT/metrics.')
+
+    metrics_parser.add_argument('--metrics-interval',
+                                type=float,
+                                default=5.,
+                                metavar='SEC',
+                                help='Update interval of "--metrics-file".')
+
     parser.add_argument('--log-level',
                         default='ERROR',
                         choices=['CRITICAL', 'FATAL', 'ERROR', 'WARN',
@@ -63,24 +275,158 @@ def parse_args():
     for reducer in ReducerRegistry.keys():
         ReducerRegistry.get(reducer).add_subparser(subparsers)
 
-    args = parser.parse_args()
+    return parser
+
+
+def parse_args(argv=None):
+    parser = create_parser()
+    args = parser.parse_args(argv)
+
+    if args.in_process and (args.valgrind or args.memory_sampler == 'valgrind' or args.timeout or args.cpu_limit or args.memory_limit):
+        parser.error('"--in-process" cannot be combined with Valgrind or with the limit options.')
+
+    if args.repeat < 1 or args.warmup < 0:
+        parser.error('"--repeat" must be at least 1 and "--warmup" must not be negative.')
+
+    if args.calibrate < 0:
+        parser.error('"--calibrate" must not be negative.')
+
+    if args.in_process and args.engine == 'asyncio':
+        parser.error('"--in-process" cannot be combined with the asyncio engine.')
+
     return args
 
 
+def run_subcommand(name, argv):
+    parser = ArgumentParser(prog=f'redubear {name}', formatter_class=ArgumentDefaultsHelpFormatter)
+    command = CommandRegistry.get(name)
+    command.add_arguments(parser)
+
+    args = parser.parse_args(argv)
+    return command.run(args)
+
+
+def configuration(args) -> dict:
+    return {key: value for key, value in vars(args).items()
+            if key not in ['tag', 'output', 'force', 'resume', 'database', 'log_level', 'sweep', 'set',
+                           'result_cache', 'no_result_cache', 'metrics_file', 'metrics_port', 'metrics_interval', 'size_cache',
+                           'listen', 'lease_timeout', 'remote_slots', 'grace_period', 'adaptive']}
+
+
+def sweep_variants(args, argv, logger) -> dict:
+    """
+    Expands the sweep into {tag: arguments}, the reducer options of a configuration are
+    appended to the command line. The values of the repeatable (append) options given on
+    the command line are replaced instead and the flags set to false are removed from it.
+    Identical configurations are kept once.
+    """
+    spec = load_spec(args.sweep) if args.sweep else dict()
+    if args.set:
+        spec.setdefault('axes', dict()).update(parse_axis(axis) for axis in args.set)
+
+    parser = create_parser()
+    repeatable = append_options(parser)
+    switches = switch_options(parser)
+    variants = dict()
+    seen = dict()
+    for config in expand(spec):
+        tag = config_tag(args.tag, config)
+        replaced = [flag for option in config for flag in repeatable.get(f'--{option.replace("_", "-")}', [])]
+        disabled = [flag for option, value in config.items() if value is False
+                    for flag in switches.get(f'--{option.replace("_", "-")}', [])]
+        variant_args = parse_args(remove_options(argv, replaced, disabled) + to_arguments(config, repeatable))
+        key = json.dumps(configuration(variant_args), sort_keys=True, default=str)
+        if key in seen:
+            logger.warning(f'{tag} is identical to {seen[key]}, skipped.')
+            continue
+        if tag in variants:
+            raise Exception(f'Duplicate sweep tag: {tag}')
+
+        seen[key] = tag
+        variants[tag] = variant_args
+
+    if not variants:
+        raise Exception('The sweep has no configurations.')
+    return variants
+
+
+async def consume(executor: Benchmark) -> dict:
+    async for _ in executor.events():
+        pass
+    return executor.reports()
+
+
 def main():
     """
     The CLI entry point of ReduBear.
     """
-    args = parse_args()
+    if len(sys.argv) > 1 and sys.argv[1] in CommandRegistry.keys():
+        sys.exit(run_subcommand(sys.argv[1], sys.argv[2:]))
+
+    argv = sys.argv[1:]
+    # "serve" hands out the jobs of the benchmark to remote agents.
+    serve = bool(argv) and argv[0] == 'serve'
+    if serve:
+        argv = argv[1:]
+    args = parse_args(argv)
+
+    if args.in_process and not sys.flags.optimize:
+        # The reducers run in the (forked) interpreter of ReduBear, which is restarted with the
+        # optimizations of the reducer subprocesses (see run_single): the assertions would make
+        # the runtimes of the two modes incomparable. The flag is passed on the command line as
+        # PYTHONOPTIMIZE is ignored by interpreters started with -E or -I.
+        os.execv(sys.executable, [sys.executable, '-O'] + sys.orig_argv[1:])
 
     logger = get_logger('ReduBear', log_level=args.log_level)
+    if serve and args.pin_cpus:
+        logger.warning('"--pin-cpus" is ignored in serve mode.')
+    if serve and args.adaptive:
+        logger.warning('"--adaptive" is ignored in serve mode.')
 
     benchmarks = Tests(args.benchmark, args.perses_root, args.jrts_root, args.custom_oracle, args.custom_input)
-    reducer = ReducerRegistry.get(args.reducer)(**vars(args))
+    variants = sweep_variants(args, argv, logger) if args.sweep or args.set else {args.tag: args}
+    reducers = {tag: ReducerRegistry.get(variant_args.reducer)(**vars(variant_args)) for tag, variant_args in variants.items()}
+
+    memory_sampler = 'valgrind' if args.valgrind else args.memory_sampler
+
+    executor = Benchmark(benchmarks, reducers.get(args.tag), args.tag, args.remote_slots if serve else args.workers,
+                         memory_sampler, args.output, args.temp, args.force,
+                         schedule=args.schedule, resume=args.resume,
+                         limits=Limits(args.timeout, args.cpu_limit, args.memory_limit),
+                         memory_interval=args.memory_interval,
+                         repeat=args.repeat, warmup=args.warmup,
+                         trace_oracle=args.trace_oracle,
+                         verdict_cache=args.verdict_cache, verdict_cache_size=args.verdict_cache_size,
+                         in_process=args.in_process, pin_cpus=args.pin_cpus and not serve,
+                         workspace_root=args.ram_root if args.ram_workspace else None,
+                         variants=reducers,
+                         result_cache=None if args.no_result_cache else args.result_cache or args.output / '.result-cache',
+                         exporter=ProgressExporter(args.metrics_file, args.metrics_port, args.metrics_interval)
+                         if args.metrics_file or args.metrics_port is not None else None,
+                         size_metrics=SizeMetrics(args.size_cache, args.antlr),
+                         executor=Coordinator(args.listen, args.lease_timeout) if serve else None,
+                         checkpoint=args.checkpoint, grace_period=args.grace_period,
+                         calibration_runs=args.calibrate, trajectory=args.trajectory,
+                         concurrency=AdaptiveConcurrency(args.workers, log=args.output / f'ReduBear-{args.tag}-concurrency.jsonl')
+                         if args.adaptive and not serve else None)
+
+    # The first signal stops the benchmark gracefully, the second one kills the reductions.
+    for signum in [signal.SIGINT, signal.SIGTERM]:
+        signal.signal(signum, lambda *_: executor.interrupt())
+
+    if args.engine == 'asyncio' and not serve:
+        reports = asyncio.run(consume(executor))
+    else:
+        reports = executor.run_all()
+
+    for tag, report in reports.items():
+        report_file = args.output / f'ReduBear-{tag}.json'
+        ReportGenerator.dump(report, report_file)
+        logger.info(f'Report: {str(report_file)}')
 
-    executor = Benchmark(benchmarks, reducer, args.tag, args.workers, args.valgrind, args.output, args.temp, args.force)
-    report = executor.run()
+        if args.database:
+            ReportGenerator.dump(report, args.database, tag=tag, reducer=variants[tag].reducer, configuration=configuration(variants[tag]))
+            logger.info(f'Result store: {str(args.database)}')
 
-    report_file = args.output / f'ReduBear-{args.tag}.json'
-    ReportGenerator.dump(report, report_file)
-    logger.info(f'Report: {str(report_file)}')
+    if executor.interrupted is not None:
+        sys.exit(1)
@@ -0,0 +1,70 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+from os import cpu_count
+from pathlib import Path
+
+from redubear.benchmark import Agent as AgentWorker
+from redubear.commands import Command
+from redubear.utils import CommandRegistry
+from redubear.utils import get_logger
+from redubear.utils import process_path
+
+
+@CommandRegistry.register('agent')
+class Agent(Command):
+
+    @staticmethod
+    def add_arguments(parser) -> None:
+        parser.add_argument('coordinator',
+                            metavar='URL',
+                            help='Address of the coordinator (e.g., http://host:8765), see "python -m redubear serve".')
+
+        parser.add_argument('-s', '--slots',
+                            type=int,
+                            default=max(int(cpu_count() / 2), 1),
+                            metavar='N',
+                            help='Number of jobs run in parallel by the agent.')
+
+        parser.add_argument('--work-dir',
+                            type=lambda p: process_path(parser, p),
+                            default=Path('/tmp/redubear-agent'),
+                            metavar='DIR',
+                            help='Local directory of the copied tests, the intermediate files and the artifacts (before the upload).')
+
+        parser.add_argument('--name',
+                            default=None,
+                            help='Name of the agent in the logs and the statistics (default: hostname-pid).')
+
+        parser.add_argument('--heartbeat',
+                            type=float,
+                            default=10.,
+                            metavar='SEC',
+                            help='Interval of the heartbeats of the running jobs. Must be well below the lease timeout of the coordinator.')
+
+        parser.add_argument('--verdict-cache',
+                            type=lambda p: process_path(parser, p),
+                            default=None,
+                            metavar='DB_FILE',
+                            help='Local oracle verdict cache of the agent.')
+
+        parser.add_argument('--result-cache',
+                            type=lambda p: process_path(parser, p),
+                            default=None,
+                            metavar='CACHE_DIR',
+                            help='Local result cache of the agent.')
+
+        parser.add_argument('--log-level',
+                            default='ERROR',
+                            choices=['CRITICAL', 'FATAL', 'ERROR', 'WARN',
+                                     'WARNING', 'INFO', 'DEBUG', 'NOTSET'],
+                            help='Verbosity level of diagnostic messages')
+
+    @staticmethod
+    def run(args) -> int:
+        get_logger('ReduBear', log_level=args.log_level)
+        return AgentWorker(args.coordinator, args.slots, args.work_dir, args.name, args.heartbeat,
+                           verdict_cache=args.verdict_cache, result_cache=args.result_cache).run()
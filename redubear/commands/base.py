@@ -0,0 +1,22 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+
+class Command:
+    """
+    Subcommand of ReduBear besides running a benchmark (e.g., "python -m redubear query").
+    """
+
+    @staticmethod
+    def add_arguments(parser) -> None:
+        pass
+
+    @staticmethod
+    def run(args) -> int:
+        """
+        Returns the exit code of the command.
+        """
+        raise NotImplementedError()
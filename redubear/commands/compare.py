@@ -0,0 +1,228 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import json
+import sys
+
+from math import comb, exp, log
+from pathlib import Path
+
+from redubear.benchmark.aggregate import permutation_test
+from redubear.commands import Command
+from redubear.utils import CommandRegistry
+from redubear.utils import ReportGenerator
+from redubear.utils import get_logger
+from redubear.utils import process_path
+from redubear.utils.database import suite_of
+
+METRICS = ['runtime', 'tests_started', 'peak_memory (MB)', 'bytes_output']
+
+
+def geomean(ratios: list[float]) -> float:
+    return exp(sum(log(r) for r in ratios) / len(ratios))
+
+
+def holm(p_values: list[float]) -> list[float]:
+    """
+    Holm-Bonferroni adjusted p-values (in the given order).
+    """
+    order = sorted(range(len(p_values)), key=lambda i: p_values[i])
+    adjusted = [1.] * len(p_values)
+    running = 0.
+    for rank, i in enumerate(order):
+        running = max(running, min((len(p_values) - rank) * p_values[i], 1.))
+        adjusted[i] = running
+    return adjusted
+
+
+@CommandRegistry.register('compare')
+class Compare(Command):
+
+    @staticmethod
+    def add_arguments(parser) -> None:
+        parser.add_argument('baseline',
+                            metavar='TAG_A',
+                            help='Tag (or JSON report) of the baseline.')
+
+        parser.add_argument('candidate',
+                            metavar='TAG_B',
+                            help='Tag (or JSON report) compared to the baseline.')
+
+        parser.add_argument('-o', '--output',
+                            type=lambda p: process_path(parser, p),
+                            default=(Path() / 'experiments').resolve(),
+                            metavar='OUTPUT_DIR',
+                            help='Output directory of the benchmarks containing the ReduBear-<tag>.json reports.')
+
+        parser.add_argument('-d', '--database',
+                            type=lambda p: process_path(parser, p),
+                            default=None,
+                            metavar='DB_FILE',
+                            help='Read the latest run of the tags from a SQLite result store instead of the JSON reports.')
+
+        parser.add_argument('--threshold',
+                            type=float,
+                            default=0.05,
+                            help='Relative slowdown tolerated by the gate (0.05 = 5%%). The exit code is 1 if the geometric mean of a gated metric grows by more, or a test with enough repeated samples (see "--min-samples") regresses significantly by more.')
+
+        parser.add_argument('--gate',
+                            nargs='+',
+                            choices=METRICS,
+                            default=['runtime'],
+                            help='Metrics checked by the gate.')
+
+        parser.add_argument('--alpha',
+                            type=float,
+                            default=0.05,
+                            help='Family-wise significance level of the permutation tests of the repeated samples (Holm-Bonferroni corrected across the tests).')
+
+        parser.add_argument('--min-samples',
+                            type=int,
+                            default=5,
+                            metavar='N',
+                            help='Minimum number of repeated samples in both reports for a test to be gated on its own. The exact permutation test of n and n samples cannot go below 1/C(2n, n) (e.g., 1/6 for n=2); with fewer samples, only the geometric means are gated.')
+
+        parser.add_argument('--format',
+                            choices=['table', 'json'],
+                            default='table',
+                            help='Output format.')
+
+    @staticmethod
+    def run(args) -> int:
+        baseline = Compare.load(args.baseline, args)
+        candidate = Compare.load(args.candidate, args)
+        comparison = Compare.compare(baseline, candidate, args.threshold, args.alpha, args.min_samples)
+
+        regressions = [f'{suite}: {metric} x{ratio:.3f}'
+                       for suite, ratios in comparison['geomean'].items()
+                       for metric, ratio in ratios.items()
+                       if metric in args.gate and ratio > 1. + args.threshold]
+        regressions += [f'{test}: {metric} x{stats["ratio"]:.3f} (corrected p={stats["p_adjusted"]:.4f})'
+                        for test, metrics in comparison['tests'].items()
+                        for metric, stats in metrics.items()
+                        if metric in args.gate and stats['regression']]
+        comparison['regressions'] = regressions
+
+        for metric in args.gate:
+            gated = [metrics[metric] for metrics in comparison['tests'].values() if 'p_adjusted' in metrics.get(metric, dict())]
+            if gated and all(stats['p_min'] * len(gated) > args.alpha for stats in gated):
+                get_logger('ReduBear').warning(f'No {metric} regression of a test can be significant with these samples '
+                                               f'({len(gated)} tests, alpha={args.alpha}), only the geometric means are gated.')
+
+        if args.format == 'json':
+            json.dump(comparison, sys.stdout, indent=4, sort_keys=True)
+            print()
+        else:
+            Compare.print(comparison)
+
+        if regressions:
+            get_logger('ReduBear').error(f'{args.candidate} regressed compared to {args.baseline}: {"; ".join(regressions)}')
+            return 1
+        return 0
+
+    @staticmethod
+    def load(tag: str, args) -> dict:
+        if args.database:
+            report = ReportGenerator.read(args.database, tag)
+        elif Path(tag).suffix == '.json':
+            report = ReportGenerator.read(Path(tag).resolve())
+        else:
+            report = ReportGenerator.read(args.output / f'ReduBear-{tag}.json')
+
+        if not report:
+            raise Exception(f'No results found for {tag}.')
+        return report
+
+    @staticmethod
+    def compare(baseline: dict, candidate: dict, threshold: float, alpha: float, min_samples: int = 5) -> dict:
+        """
+        Candidate/baseline ratios of the tests that succeeded in both reports, and their
+        geometric means per suite. A test regresses if both reports have at least
+        min_samples repeated samples, its ratio is above the threshold and the increase
+        is significant after the Holm-Bonferroni correction across the tests (per metric).
+        Otherwise, only the geometric means tell regressions.
+        """
+        tests = dict()
+        for test in sorted(set(baseline) & set(candidate)):
+            a, b = baseline[test], candidate[test]
+            if 'error' in a or 'error' in b:
+                continue
+
+            tests[test] = dict()
+            for metric in METRICS:
+                if not a.get(metric) or b.get(metric) is None:
+                    continue
+
+                ratio = b[metric] / a[metric]
+                samples_a = a.get('statistics', dict()).get(metric, dict()).get('samples', [])
+                samples_b = b.get('statistics', dict()).get(metric, dict()).get('samples', [])
+                p = permutation_test(samples_a, samples_b) if len(samples_a) > 1 and len(samples_b) > 1 else None
+
+                tests[test][metric] = {
+                    'baseline': a[metric],
+                    'candidate': b[metric],
+                    'ratio': ratio,
+                    'p': p,
+                    # The smallest p-value of the exact test.
+                    'p_min': 1. / comb(len(samples_a) + len(samples_b), len(samples_b)) if p is not None else None,
+                    'samples': min(len(samples_a), len(samples_b)),
+                }
+
+        for metric in METRICS:
+            gated = [stats[metric] for stats in tests.values()
+                     if metric in stats and stats[metric]['p'] is not None and stats[metric]['samples'] >= min_samples]
+            for stats, p_adjusted in zip(gated, holm([stats['p'] for stats in gated])):
+                stats['p_adjusted'] = p_adjusted
+            for stats in [stats[metric] for stats in tests.values() if metric in stats]:
+                stats['significant'] = stats.get('p_adjusted', 1.) <= alpha
+                stats['regression'] = stats['significant'] and stats['ratio'] > 1. + threshold
+
+        suites = dict()
+        for test, metrics in tests.items():
+            for suite in [suite_of(test), 'all']:
+                for metric, stats in metrics.items():
+                    if stats['ratio'] > 0:
+                        suites.setdefault(suite, dict()).setdefault(metric, []).append(stats['ratio'])
+
+        return {
+            'tests': tests,
+            'geomean': {suite: {metric: geomean(ratios) for metric, ratios in metrics.items()}
+                        for suite, metrics in suites.items()},
+            'missing': sorted(set(baseline) ^ set(candidate)),
+            'failed': sorted(test for test in set(baseline) & set(candidate)
+                             if 'error' in baseline[test] or 'error' in candidate[test]),
+        }
+
+    @staticmethod
+    def print(comparison: dict) -> None:
+        header = ['test'] + METRICS
+        rows = [header]
+        for test, metrics in comparison['tests'].items():
+            row = [test]
+            for metric in METRICS:
+                stats = metrics.get(metric)
+                if stats is None:
+                    row.append('-')
+                    continue
+                flags = ('*' if stats['significant'] else '') + ('!' if stats['regression'] else '')
+                row.append(f'x{stats["ratio"]:.3f}{flags}')
+            rows.append(row)
+
+        rows.append([''] * len(header))
+        for suite, ratios in sorted(comparison['geomean'].items()):
+            rows.append([f'geomean ({suite})'] + [f'x{ratios[m]:.3f}' if m in ratios else '-' for m in METRICS])
+
+        widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+        for row in rows:
+            print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+
+        if comparison['missing']:
+            print(f'Not in both reports: {", ".join(comparison["missing"])}')
+        print('*: significant change of the repeated samples (corrected), !: regression above the threshold')
+        if comparison['failed']:
+            print(f'Failed in a report: {", ".join(comparison["failed"])}')
+        for regression in comparison['regressions']:
+            print(f'Regression: {regression}')
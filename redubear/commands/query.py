@@ -0,0 +1,151 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import csv
+import json
+import re
+import sys
+
+from redubear.commands import Command
+from redubear.utils import CommandRegistry
+from redubear.utils import ReportGenerator
+from redubear.utils import process_path
+from redubear.utils.database import COLUMNS, ResultStore
+
+METRICS = list(COLUMNS.values())
+GROUPS = {
+    'tag': 'results.tag',
+    'test': 'results.test',
+    'reducer': 'results.reducer',
+    'suite': 'tests.suite',
+    'configuration': 'results.configuration_id',
+}
+
+
+@CommandRegistry.register('query')
+class Query(Command):
+
+    @staticmethod
+    def add_arguments(parser) -> None:
+        parser.add_argument('-d', '--database',
+                            type=lambda p: process_path(parser, p),
+                            required=True,
+                            metavar='DB_FILE',
+                            help='SQLite result store (see "--database" of the benchmark).')
+
+        parser.add_argument('--import',
+                            dest='reports',
+                            type=lambda p: process_path(parser, p),
+                            nargs='+',
+                            default=[],
+                            metavar='REPORT',
+                            help='Import JSON reports (ReduBear-<tag>.json) into the store before querying. The tag is taken from the file name.')
+
+        parser.add_argument('--tag',
+                            nargs='+',
+                            default=[],
+                            help='Only the results of these tags.')
+
+        parser.add_argument('--test',
+                            default=None,
+                            metavar='GLOB',
+                            help='Only the tests matching the pattern (e.g., "clang-*").')
+
+        parser.add_argument('--reducer',
+                            nargs='+',
+                            default=[],
+                            help='Only the results of these reducers.')
+
+        parser.add_argument('--suite',
+                            nargs='+',
+                            default=[],
+                            help='Only the tests of these suites (e.g., jerry, clang, gcc).')
+
+        parser.add_argument('--group-by',
+                            nargs='+',
+                            choices=list(GROUPS),
+                            default=['tag'],
+                            help='Columns to aggregate by.')
+
+        parser.add_argument('--metric',
+                            choices=METRICS,
+                            default='runtime',
+                            help='Aggregated metric.')
+
+        parser.add_argument('--all-runs',
+                            default=False,
+                            action='store_true',
+                            help='Aggregate every stored run of a tag, not only the latest one.')
+
+        parser.add_argument('--sql',
+                            default=None,
+                            metavar='QUERY',
+                            help='Execute a raw SQL query instead (tables: runs, tests, configurations, results, samples).')
+
+        parser.add_argument('--format',
+                            choices=['table', 'csv', 'json'],
+                            default='table',
+                            help='Output format.')
+
+    @staticmethod
+    def run(args) -> int:
+        if not args.reports and not args.database.exists():
+            raise Exception(f'No such result store: {args.database}')
+
+        for report in args.reports:
+            tag = re.sub(r'^ReduBear-', '', report.stem)
+            ReportGenerator.dump(ReportGenerator.read(report), args.database, tag=tag)
+
+        store = ResultStore(args.database)
+        try:
+            if args.sql:
+                columns, rows = store.execute(args.sql)
+            else:
+                columns, rows = store.execute(*Query.build(args))
+        finally:
+            store.close()
+
+        Query.print(columns, rows, args.format)
+        return 0
+
+    @staticmethod
+    def build(args):
+        groups = [GROUPS[group] for group in args.group_by]
+        metric = f'results.{args.metric}'
+
+        conditions, parameters = [], []
+        if not args.all_runs:
+            conditions.append('results.run_id IN (SELECT MAX(id) FROM runs GROUP BY tag)')
+        for column, values in [('results.tag', args.tag), ('results.reducer', args.reducer), ('tests.suite', args.suite)]:
+            if values:
+                conditions.append(f'{column} IN ({", ".join("?" * len(values))})')
+                parameters.extend(values)
+        if args.test:
+            conditions.append('results.test GLOB ?')
+            parameters.append(args.test)
+
+        query = (f'SELECT {", ".join(f"{group} AS {name}" for group, name in zip(groups, args.group_by))}, '
+                 f'COUNT(*) AS results, SUM(results.error IS NOT NULL) AS failed, '
+                 f'AVG({metric}) AS mean, MIN({metric}) AS min, MAX({metric}) AS max, SUM({metric}) AS total '
+                 f'FROM results JOIN tests ON tests.name = results.test '
+                 f'{"WHERE " + " AND ".join(conditions) if conditions else ""} '
+                 f'GROUP BY {", ".join(groups)} ORDER BY {", ".join(groups)}')
+        return query, parameters
+
+    @staticmethod
+    def print(columns, rows, output_format) -> None:
+        if output_format == 'json':
+            json.dump([dict(zip(columns, row)) for row in rows], sys.stdout, indent=4)
+            print()
+        elif output_format == 'csv':
+            writer = csv.writer(sys.stdout)
+            writer.writerow(columns)
+            writer.writerows(rows)
+        else:
+            cells = [columns] + [[f'{value:.3f}' if isinstance(value, float) else str(value) for value in row] for row in rows]
+            widths = [max(len(row[i]) for row in cells) for i in range(len(columns))]
+            for row in cells:
+                print('  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
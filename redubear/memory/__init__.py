@@ -5,3 +5,4 @@
 # This file may not be copied, modified, or distributed except
 # according to those terms.
 from .peak_memory import PeakMemory
+from .proc_sampler import ProcSampler
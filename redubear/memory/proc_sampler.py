@@ -0,0 +1,105 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import time
+
+from threading import Event, Thread
+
+from redubear.utils import get_logger
+
+
+class ProcSampler:
+    """
+    Samples the memory usage of the reducer process from /proc at a fixed interval.
+    Only the reducer process itself is sampled (like "valgrind --trace-children=no"),
+    its children, e.g., the SUT, are excluded. With peak_only, only the peak RSS
+    (VmHWM) is tracked, e.g., for the resource accounting. It is a high-water mark,
+    hence only its growth in the last interval before the exit may be missed.
+    """
+
+    MAX_SAMPLES = 1000
+
+    def __init__(self, interval: float = 0.1, peak_only: bool = False) -> None:
+        self.interval = interval
+        self.peak_only = peak_only
+        self.logger = get_logger('ReduBear')
+
+        self.peak_hwm = 0   # kB
+        self.peak_pss = 0   # kB
+        self.samples = []   # [elapsed (s), RSS (MB)]
+        self.stride = 1
+
+        self.stopped = Event()
+        self.thread = None
+
+    def start(self, process) -> None:
+        self.thread = Thread(target=self._sample, args=(process.pid,), daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+
+    def _sample(self, pid: int) -> None:
+        start_time = time.time()
+        count = 0
+        while not self.stopped.is_set():
+            status = self._read_fields(f'/proc/{pid}/status', ['VmHWM', 'VmRSS'])
+            if status is None:
+                # The process is already exited (or it is a zombie).
+                if not self._alive(pid):
+                    break
+            else:
+                self.peak_hwm = max(self.peak_hwm, status.get('VmHWM', 0))
+                if self.peak_only:
+                    self.stopped.wait(self.interval)
+                    continue
+
+                rollup = self._read_fields(f'/proc/{pid}/smaps_rollup', ['Pss'])
+                if rollup:
+                    self.peak_pss = max(self.peak_pss, rollup.get('Pss', 0))
+
+                if count % self.stride == 0:
+                    self.samples.append([round(time.time() - start_time, 3), round(status.get('VmRSS', 0) / 1024., 2)])
+                    # Keep the time series compact by halving its resolution.
+                    if len(self.samples) >= self.MAX_SAMPLES:
+                        self.samples = self.samples[::2]
+                        self.stride *= 2
+                count += 1
+
+            self.stopped.wait(self.interval)
+
+    @staticmethod
+    def _read_fields(path: str, fields: list[str]):
+        values = dict()
+        try:
+            with open(path) as file:
+                for line in file:
+                    key, _, value = line.partition(':')
+                    if key in fields:
+                        values[key] = int(value.split()[0])
+        except (OSError, ValueError, IndexError):
+            return None
+
+        return values or None
+
+    @staticmethod
+    def _alive(pid: int) -> bool:
+        try:
+            with open(f'/proc/{pid}/stat') as file:
+                return file.read().rpartition(')')[2].split()[0] != 'Z'
+        except OSError:
+            return False
+
+    def get(self) -> float:
+        """
+        Returns the peak resident set size (VmHWM) in MB.
+        """
+        return round(self.peak_hwm / 1024., 2)
+
+    def get_pss(self) -> float:
+        return round(self.peak_pss / 1024., 2)
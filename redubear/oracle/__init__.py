@@ -0,0 +1,9 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+from .cache import OracleCache, VerdictStore
+from .tracer import OracleTracer
+from .checkpoint import OracleCheckpoint
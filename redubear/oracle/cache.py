@@ -0,0 +1,185 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import hashlib
+import shlex
+import sqlite3
+import sys
+import time
+
+from pathlib import Path
+from subprocess import call
+
+# The shim forwards every oracle call to this module (see main). The module is
+# executed as a script (without the site packages) to avoid importing the whole
+# package at every call. The start time of the shim (ns) measures the interpreter
+# startup too.
+SHIM = """#!/bin/sh
+exec {python} -S {script} "$(date +%s%N)" {database} {max_entries} {oracle} {identity} {oracle_hash} {input_name} {counters} "$@"
+"""
+
+
+class VerdictStore:
+    """
+    SQLite-backed persistent store of oracle verdicts (exit codes, with the latency of
+    the oracle) keyed by the hash of the oracle identity and the candidate content. The database is in WAL mode, so it can
+    be shared by concurrent workers. The least recently used entries are evicted above
+    the given size. The number of entries is maintained by triggers in the meta table,
+    so the size is checked without scanning the verdicts.
+    """
+
+    def __init__(self, path: Path, max_entries: int = 1000000) -> None:
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(str(path), timeout=60, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        if self.connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'verdicts_delete'").fetchone() is None:
+            self.create()
+
+    def create(self) -> None:
+        self.connection.execute('BEGIN IMMEDIATE')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS verdicts '
+                                '(key TEXT PRIMARY KEY, verdict INTEGER NOT NULL, last_used REAL NOT NULL, latency REAL)')
+        if 'latency' not in [column[1] for column in self.connection.execute('PRAGMA table_info(verdicts)')]:
+            self.connection.execute('ALTER TABLE verdicts ADD COLUMN latency REAL')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS verdicts_lru ON verdicts (last_used)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        # Stores created before the counter are counted once.
+        self.connection.execute("INSERT OR IGNORE INTO meta VALUES ('entries', (SELECT COUNT(*) FROM verdicts))")
+        self.connection.execute('CREATE TRIGGER IF NOT EXISTS verdicts_insert AFTER INSERT ON verdicts BEGIN '
+                                "UPDATE meta SET value = value + 1 WHERE name = 'entries'; END")
+        self.connection.execute('CREATE TRIGGER IF NOT EXISTS verdicts_delete AFTER DELETE ON verdicts BEGIN '
+                                "UPDATE meta SET value = value - 1 WHERE name = 'entries'; END")
+        self.connection.execute('COMMIT')
+
+    def get(self, key: str):
+        """
+        Returns the verdict and the latency (None if unknown) of a key, or None if it is not stored.
+        """
+        row = self.connection.execute('SELECT verdict, latency FROM verdicts WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+
+        self.connection.execute('UPDATE verdicts SET last_used = ? WHERE key = ?', (time.time(), key))
+        return row
+
+    def put(self, key: str, verdict: int, latency: float = None) -> None:
+        # An upsert, as the delete trigger does not fire on REPLACE.
+        self.connection.execute('INSERT INTO verdicts VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE '
+                                'SET verdict = excluded.verdict, last_used = excluded.last_used, latency = excluded.latency',
+                                (key, verdict, time.time(), latency))
+
+        count = self.size()
+        if count > self.max_entries:
+            self.connection.execute('DELETE FROM verdicts WHERE key IN '
+                                    '(SELECT key FROM verdicts ORDER BY last_used LIMIT ?)', (count - self.max_entries,))
+
+    def size(self) -> int:
+        return self.connection.execute("SELECT value FROM meta WHERE name = 'entries'").fetchone()[0]
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class OracleCache:
+    """
+    Wraps an oracle into a shim that looks up the verdict of the candidate in a
+    VerdictStore before running the oracle. The hits and misses of a test are
+    counted in a separate file with the overhead of the shim (interpreter startup
+    and lookup) and the latency of the oracle: measured on the misses, saved on the hits.
+    """
+
+    def __init__(self, temp_dir: Path, database: Path, max_entries: int) -> None:
+        self.database = database
+        self.max_entries = max_entries
+        self.counters = temp_dir / 'verdict-cache.counters'
+        self.shim = temp_dir / 'oracle-cache.sh'
+
+    def wrap(self, oracle: Path, input_file: Path, identity: Path = None) -> Path:
+        """
+        The identity is the path of the oracle in the cache keys. It defaults to the
+        oracle, but an oracle copied to a workspace keeps the identity of the original.
+        """
+        # Initialize the database before the parallel oracle calls.
+        VerdictStore(self.database, self.max_entries).close()
+
+        oracle_hash = hashlib.sha256(oracle.read_bytes()).hexdigest()
+        self.shim.write_text(SHIM.format(python=shlex.quote(sys.executable),
+                                         script=shlex.quote(str(Path(__file__).resolve())),
+                                         database=shlex.quote(str(self.database)),
+                                         max_entries=self.max_entries,
+                                         oracle=shlex.quote(str(oracle)),
+                                         identity=shlex.quote(str(identity or oracle)),
+                                         oracle_hash=oracle_hash,
+                                         input_name=shlex.quote(input_file.name),
+                                         counters=shlex.quote(str(self.counters))))
+        self.shim.chmod(0o755)
+        self.counters.touch()
+        return self.shim
+
+    def get(self) -> dict:
+        """
+        The hit rate, the overhead of the cache and the saved time (the oracle latency of
+        the hits minus the overhead).
+        """
+        hits, misses, overhead, latency, saved = 0, 0, 0., 0., 0.
+        for line in self.counters.read_text().splitlines():
+            try:
+                kind, call_overhead, call_latency = line.split()
+                call_overhead, call_latency = float(call_overhead), float(call_latency)
+            except ValueError:
+                continue
+            hits += kind == 'h'
+            misses += kind == 'm'
+            overhead += call_overhead
+            if kind == 'h':
+                saved += call_latency
+            else:
+                latency += call_latency
+
+        calls = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / calls, 4) if calls else None,
+            'overhead (s)': round(overhead, 3),
+            'overhead_per_call (s)': round(overhead / calls, 4) if calls else None,
+            'oracle_latency (s)': round(latency / misses, 4) if misses else None,
+            'saved (s)': round(saved - overhead, 3),
+        }
+
+
+def main(argv: list[str]) -> int:
+    shim_start, database, max_entries, oracle, identity, oracle_hash, input_name, counters, *args = argv
+
+    candidate = Path(args[0]) if args and Path(args[0]).is_file() else Path(input_name)
+    key = hashlib.sha256()
+    key.update(f'{identity}\0{oracle_hash}\0{input_name}\0'.encode())
+    key.update(candidate.read_bytes())
+    key = key.hexdigest()
+
+    store = VerdictStore(Path(database), int(max_entries))
+    cached = store.get(key)
+    hit = cached is not None
+    if hit:
+        verdict, latency = cached[0], cached[1] or 0.
+    else:
+        oracle_start = time.perf_counter()
+        verdict = call([oracle] + args)
+        latency = time.perf_counter() - oracle_start
+        store.put(key, verdict, latency)
+
+    store.close()
+
+    overhead = max(time.time_ns() - int(shim_start), 0) / 1e9 - (0. if hit else latency)
+    with open(counters, 'a') as file:
+        file.write(f'{"h" if hit else "m"} {overhead:.6f} {latency:.6f}\n')
+
+    return verdict
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,144 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import json
+import shlex
+
+from pathlib import Path
+
+# An interesting candidate (exit code 0) replaces the checkpoint if it is smaller. The
+# comparison and the replacement are serialized by a lock, hence a larger candidate of a
+# parallel oracle call never replaces a smaller one. The copy is renamed into place, the
+# checkpoint is never partial. With a trajectory, the time (ns) and the size of the
+# improvement are recorded too.
+SHIM = """#!/bin/sh
+if [ -f "$1" ]; then candidate="$1"; else candidate={input_name}; fi
+{oracle} "$@"
+code=$?
+if [ $code -eq 0 ]; then
+  size=$(wc -c < "$candidate" 2>/dev/null || echo -1)
+  (
+    flock 9
+    best=$(cat {best_size} 2>/dev/null || echo {input_size})
+    if [ "$size" -ge 0 ] && [ "$size" -lt "$best" ] && cp "$candidate" {best}.$$; then
+      now=$(date +%s%N)
+      {keep_candidate}
+      mv -f {best}.$$ {best}
+      echo "$size" > {best_size}.$$ && mv -f {best_size}.$$ {best_size}
+      {record}
+    fi
+  ) 9> {lock}
+fi
+exit $code
+"""
+
+# Maximum number of points of a stored trajectory.
+MAX_POINTS = 200
+
+
+class OracleCheckpoint:
+    """
+    Wraps an oracle into a shim that keeps a copy of the smallest interesting candidate
+    of the reduction, the best intermediate output if the reduction is interrupted.
+    Optionally, it records the trajectory of the reduction: the time and the size of
+    every improvement (and a copy of the candidate to count its tokens later).
+    """
+
+    def __init__(self, temp_dir: Path, trajectory: bool = False, keep_candidates: bool = False) -> None:
+        self.shim = temp_dir / 'oracle-checkpoint.sh'
+        self.best = temp_dir / 'checkpoint'
+        self.best_size = temp_dir / 'checkpoint.size'
+        self.lock = temp_dir / 'checkpoint.lock'
+        self.trajectory = temp_dir / 'trajectory.jsonl' if trajectory else None
+        self.candidates = temp_dir / 'trajectory' if trajectory and keep_candidates else None
+
+    def wrap(self, oracle: Path, input_file: Path) -> Path:
+        keep_candidate, record = '', ''
+        if self.trajectory:
+            record = f'echo "{{\\"time\\": $now, \\"bytes\\": $size}}" >> {shlex.quote(str(self.trajectory))}'
+            self.trajectory.touch()
+        if self.candidates:
+            self.candidates.mkdir(exist_ok=True)
+            # The extension of the input selects the lexer of the token counts.
+            keep_candidate = f'cp {shlex.quote(str(self.best))}.$$ {shlex.quote(str(self.candidates))}/$now{shlex.quote(input_file.suffix)}'
+
+        self.shim.write_text(SHIM.format(oracle=shlex.quote(str(oracle)),
+                                         input_name=shlex.quote(input_file.name),
+                                         input_size=input_file.stat().st_size,
+                                         best=shlex.quote(str(self.best)),
+                                         best_size=shlex.quote(str(self.best_size)),
+                                         lock=shlex.quote(str(self.lock)),
+                                         keep_candidate=keep_candidate,
+                                         record=record))
+        self.shim.chmod(0o755)
+        return self.shim
+
+    def get(self) -> Path:
+        """
+        Returns the smallest interesting candidate so far (None if there is none).
+        """
+        return self.best if self.best.exists() else None
+
+    def get_trajectory(self, start: float, runtime: float, input_file: Path, output_file: Path, size_metrics=None) -> dict:
+        """
+        Summarizes the recorded improvements of a reduction started at start (epoch
+        seconds) and run for runtime seconds. The series is [[seconds, bytes, tokens], ...]
+        from the input to the output, at most MAX_POINTS long. The tokens are only
+        counted if the candidates were kept.
+        """
+        points = []
+        with open(self.trajectory) as trajectory:
+            for line in trajectory:
+                try:
+                    point = json.loads(line)
+                except ValueError:
+                    continue
+                candidate = self.candidates / f'{point["time"]}{input_file.suffix}' if self.candidates else None
+                points.append((min(max(point['time'] / 1e9 - start, 0.), runtime), point['bytes'], candidate))
+
+        # Parallel oracle calls may record their improvements out of order.
+        series = [(0., input_file.stat().st_size, input_file)]
+        for point in sorted(points, key=lambda point: point[0]):
+            if point[1] < series[-1][1]:
+                series.append(point)
+        # The output may differ from the last candidate (e.g., it is formatted by the reducer).
+        if output_file.stat().st_size != series[-1][1] or len(series) == 1:
+            series.append((runtime, output_file.stat().st_size, output_file))
+
+        if len(series) > MAX_POINTS:
+            step = (len(series) - 1) / (MAX_POINTS - 1)
+            series = [series[round(i * step)] for i in range(MAX_POINTS)]
+
+        compact = []
+        for seconds, size, path in series:
+            point = [round(seconds, 3), size]
+            if self.candidates:
+                point.append(size_metrics.measure(path).get('tokens') if size_metrics and path.exists() else None)
+            compact.append(point)
+
+        return dict(trajectory_metrics([(point[0], point[1]) for point in compact], runtime), series=compact)
+
+
+def trajectory_metrics(series: list, runtime: float) -> dict:
+    """
+    Time to X% of the total reduction and the normalized area under the size curve (the
+    mean of size/input size over the runtime, lower is better) of a [(seconds, bytes)]
+    step series.
+    """
+    initial, final = series[0][1], series[-1][1]
+    reduction = initial - final
+
+    metrics = dict()
+    for percent in [50, 90, 95, 99]:
+        target = initial - reduction * percent / 100.
+        metrics[f'time_to_{percent}% (s)'] = next((seconds for seconds, size in series if size <= target), round(runtime, 3))
+
+    area = 0.
+    for (seconds, size), (next_seconds, _) in zip(series, series[1:] + [(runtime, None)]):
+        area += size * max(next_seconds - seconds, 0.)
+    metrics['auc'] = round(area / (initial * runtime), 4) if initial and runtime else None
+
+    return metrics
@@ -0,0 +1,115 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import json
+import math
+import shlex
+
+from pathlib import Path
+from shutil import copy2
+from statistics import median
+
+from redubear.utils import get_logger
+
+# The shim is a POSIX shell script to keep the overhead of an oracle call low.
+# Picire passes the candidate as an argument, Perses runs the oracle in the
+# directory of the candidate.
+SHIM = """#!/bin/sh
+if [ -f "$1" ]; then candidate="$1"; else candidate={input_name}; fi
+size=$(wc -c < "$candidate" 2>/dev/null || echo -1)
+start=$(date +%s%N)
+{oracle} "$@"
+code=$?
+end=$(date +%s%N)
+echo "{{\\"start\\": $start, \\"end\\": $end, \\"exit\\": $code, \\"size\\": $size}}" >> {trace}
+exit $code
+"""
+
+
+class OracleTracer:
+    """
+    Wraps an oracle into a shim that records the start and end time (ns), the exit code
+    and the candidate size of every oracle invocation into a JSON Lines trace.
+    """
+
+    TRACE = 'oracle-trace.jsonl'
+
+    def __init__(self, temp_dir: Path) -> None:
+        self.trace_file = temp_dir / self.TRACE
+        self.shim = temp_dir / 'oracle-tracer.sh'
+        self.logger = get_logger('ReduBear')
+
+    def wrap(self, oracle: Path, input_file: Path) -> Path:
+        self.shim.write_text(SHIM.format(oracle=shlex.quote(str(oracle)),
+                                         input_name=shlex.quote(input_file.name),
+                                         trace=shlex.quote(str(self.trace_file))))
+        self.shim.chmod(0o755)
+        self.trace_file.touch()
+        return self.shim
+
+    def read(self) -> list[dict]:
+        calls = []
+        with open(self.trace_file) as trace:
+            for line in trace:
+                try:
+                    calls.append(json.loads(line))
+                except ValueError:
+                    self.logger.warning(f'Malformed oracle trace line: {line.strip()}')
+
+        return calls
+
+    def save(self, out_dir: Path) -> None:
+        copy2(self.trace_file, out_dir / self.TRACE)
+
+    def get(self, runtime: float, jobs: int) -> dict:
+        """
+        Summarizes the trace: latency histogram, time spent inside and outside of the
+        oracle, and the parallel utilization of the oracle slots.
+        """
+        calls = self.read()
+        if not calls:
+            return {'calls': 0}
+
+        latencies = [(call['end'] - call['start']) / 1e9 for call in calls]
+
+        # Union of the (possibly overlapping) intervals of the parallel calls.
+        inside = 0
+        current_start, current_end = None, None
+        for start, end in sorted((call['start'], call['end']) for call in calls):
+            if current_end is None or start > current_end:
+                if current_end is not None:
+                    inside += current_end - current_start
+                current_start, current_end = start, end
+            else:
+                current_end = max(current_end, end)
+        inside = (inside + current_end - current_start) / 1e9
+
+        total = sum(latencies)
+        # Nearest rank (as in the calibration), the p95 of a few calls is their maximum.
+        ordered = sorted(latencies)
+        return {
+            'calls': len(calls),
+            'latency_mean (s)': round(total / len(calls), 4),
+            'latency_median (s)': round(median(latencies), 4),
+            'latency_p95 (s)': round(ordered[math.ceil(0.95 * len(ordered)) - 1], 4),
+            'latency_histogram (ms)': histogram(latencies),
+            'time_in_oracle (s)': round(total, 2),
+            'time_oracle_busy (s)': round(inside, 2),
+            'time_outside_oracle (s)': round(max(runtime - inside, 0.), 2),
+            'utilization': round(total / (runtime * jobs), 4) if runtime else None,
+        }
+
+
+def histogram(latencies: list[float]) -> dict:
+    """
+    Log2-scaled histogram of the latencies. The keys are the [low, high) bucket bounds in ms.
+    """
+    buckets = dict()
+    for latency in latencies:
+        exponent = max(math.floor(math.log2(max(latency * 1000., 1.))), 0)
+        buckets[exponent] = buckets.get(exponent, 0) + 1
+
+    return {f'{0 if e == 0 else 2 ** e}-{2 ** (e + 1)}': buckets[e] for e in sorted(buckets)}
@@ -17,8 +17,46 @@ class Reducer:
         """
         pass
 
+    def prepare(self, tests, work_dir) -> None:
+        """
+        Called once per benchmark before the reductions are started (in the main process)
+        with the (name, oracle, input_file) tests to be reduced. The prepared state is
+        shared with the workers.
+        """
+        pass
+
     def generate_command(self, oracle, input_file, temp, stats) -> list[str]:
         raise NotImplementedError('Generate Command function is not implemented.')
 
+    def execute(self, command) -> None:
+        """
+        Executes the generated command in the current process (see --in-process). Only
+        reducers implemented in Python can support it.
+        """
+        raise NotImplementedError('In-process execution is not supported by this reducer.')
+
+    def describe_version(self) -> str:
+        """
+        Version of the reducer, part of the fingerprint of the cached results.
+        """
+        return None
+
+    def artifacts(self, input_file) -> list[str]:
+        """
+        Glob patterns of the (transient) files that the reducer writes next to the input.
+        They are not part of the test, e.g., of the fingerprint of the cached results.
+        """
+        return []
+
+    def supports_in_process(self) -> bool:
+        return type(self).execute is not Reducer.execute
+
     def post_process(self, stat_file, input_file, out_dir, temp_dir) -> dict:
         raise NotImplementedError('Post Process function is not implemented.')
+
+    def partial_output(self, input_file, temp_dir):
+        """
+        Called when a reduction is interrupted. Removes the leftovers of the reducer and
+        returns the best intermediate output it has written so far (None if there is none).
+        """
+        return None
@@ -0,0 +1,160 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+
+# Launcher of picireny that caches the parsers generated by ANTLR. Usage:
+#   python build_cache.py CACHE_DIR REPORT_FILE <picireny arguments>
+#
+# Picireny builds the (action injected) grammars with the ANTLR tool at every run.
+# The generated sources are stored in CACHE_DIR keyed by the hash of the grammar
+# files and the ANTLR jar, so a grammar is compiled only once per machine.
+# The module is executed as a script (or imported by the in-process execution mode),
+# it must not depend on the redubear package.
+import fcntl
+import hashlib
+import json
+import shutil
+import subprocess
+import sys
+import time
+
+from os import listdir
+from pathlib import Path
+
+REPORT = 'grammar-cache.json'
+
+_jar_hashes = dict()
+_report = dict()
+_cache_dir = None
+
+
+def cache_key(grammars, antlr, lang) -> str:
+    if antlr not in _jar_hashes:
+        _jar_hashes[antlr] = hashlib.sha256(Path(antlr).read_bytes()).hexdigest()
+
+    key = hashlib.sha256(f'{_jar_hashes[antlr]}\0{lang}\0'.encode())
+    for grammar in grammars:
+        key.update(f'{Path(grammar).name}\0'.encode())
+        key.update(Path(grammar).read_bytes())
+
+    return key.hexdigest()
+
+
+def install(cache_dir: Path) -> None:
+    """
+    Wraps the grammar builder of picireny (once per process).
+    """
+    global _cache_dir
+    if _cache_dir is not None:
+        _cache_dir = cache_dir
+        return
+    _cache_dir = cache_dir
+
+    from picireny.antlr4 import hdd_tree_builder, parser_builder
+
+    build_grammars = parser_builder.build_grammars
+    run = parser_builder.run
+
+    def cached_build_grammars(grammars, out, antlr, lang='python'):
+        start_time = time.time()
+        cache_dir = _cache_dir
+        report = _report
+        entry = cache_dir / cache_key(grammars, antlr, lang)
+
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(cache_dir / f'{entry.name}.lock', 'w') as lock:
+            # Concurrent workers wait for the first build instead of building the same grammar.
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            if entry.is_dir():
+                for generated in entry.iterdir():
+                    if generated.name != 'meta.json':
+                        shutil.copy2(generated, out)
+
+                # The sources are in place, only the loading of the classes is left to picireny.
+                parser_builder.run = lambda *args, **kwargs: None
+                try:
+                    result = build_grammars(grammars, out, antlr, lang)
+                finally:
+                    parser_builder.run = run
+
+                meta = json.loads((entry / 'meta.json').read_text())
+                elapsed = time.time() - start_time
+                report.update({'grammar_cache': 'hit',
+                               'grammar_build (s)': round(elapsed, 3),
+                               'grammar_build_saved (s)': round(max(meta['build_time'] - elapsed, 0.), 3)})
+                return result
+
+            before = set(listdir(out))
+            result = build_grammars(grammars, out, antlr, lang)
+            elapsed = time.time() - start_time
+
+            staging = cache_dir / f'{entry.name}.tmp'
+            shutil.rmtree(staging, ignore_errors=True)
+            staging.mkdir()
+            for generated in set(listdir(out)) - before:
+                if (Path(out) / generated).is_file():
+                    shutil.copy2(Path(out) / generated, staging)
+            (staging / 'meta.json').write_text(json.dumps({'build_time': elapsed}))
+            staging.rename(entry)
+
+        report.update({'grammar_cache': 'miss',
+                       'grammar_build (s)': round(elapsed, 3),
+                       'grammar_build_saved (s)': 0.})
+        return result
+
+    parser_builder.build_grammars = cached_build_grammars
+    # Imported by name into the tree builder.
+    hdd_tree_builder.build_grammars = cached_build_grammars
+
+
+def build_lexer(grammars, antlr, cache_dir: Path) -> Path:
+    """
+    Generates the Python lexers of the grammars with the ANTLR tool (once per machine)
+    for measuring token counts. Returns the directory of the generated modules.
+    """
+    entry = cache_dir / cache_key(grammars, antlr, 'python-lexer')
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    with open(cache_dir / f'{entry.name}.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if entry.is_dir():
+            return entry
+
+        staging = cache_dir / f'{entry.name}.tmp'
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir()
+        for grammar in grammars:
+            if Path(grammar).suffix == '.py':
+                # Base classes of the generated lexers.
+                shutil.copy2(grammar, staging)
+        subprocess.run(['java', '-jar', str(antlr), '-Dlanguage=Python3', '-o', str(staging), '-Xexact-output-dir']
+                       + [str(g) for g in grammars if Path(g).suffix == '.g4' and 'parser grammar' not in Path(g).read_text()],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        staging.rename(entry)
+
+    return entry
+
+
+def launch(argv: list[str]) -> None:
+    """
+    Runs picireny with the arguments: CACHE_DIR REPORT_FILE <picireny arguments>.
+    """
+    cache_dir, report_file = Path(argv[0]), Path(argv[1])
+    install(cache_dir)
+    _report.clear()
+
+    from picireny.cli import execute
+    sys.argv = ['picireny'] + argv[2:]
+    try:
+        execute()
+    finally:
+        report_file.write_text(json.dumps(_report))
+
+
+if __name__ == '__main__':
+    # The directory of this script contains the grammar resources, they must not shadow the generated modules.
+    del sys.path[0]
+    launch(sys.argv[1:])
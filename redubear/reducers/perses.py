@@ -4,15 +4,27 @@
 # <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
 # This file may not be copied, modified, or distributed except
 # according to those terms.
+import hashlib
+import time
+
 from pathlib import Path
 from shutil import copy2
+from statistics import median
 
 from redubear.reducers import Reducer
+from redubear.utils import get_logger
 from redubear.utils import process_path
 from redubear.utils import ReducerRegistry
 from redubear.utils import run_command
 
 
+# Small inputs for the AppCDS training reduction.
+TRAINING_INPUTS = {
+    '.c': 'int f(int a) { return a + 1; }\nint main(void) { int x = f(1); return x; }\n',
+    '.js': 'function f(a) { return a + 1; }\nvar x = f(1);\n',
+}
+
+
 @ReducerRegistry.register('perses')
 class Perses(Reducer):
 
@@ -44,22 +56,115 @@ class Perses(Reducer):
                             default='COMPACT_QUERY_CACHE',
                             help='cache strategy (%(choices)s; default: %(default)s)')
 
+        parser.add_argument('--cds',
+                            default=False,
+                            action='store_true',
+                            help='build an AppCDS archive of Perses with a training reduction once per session and start every reduction from it')
+
     def __init__(self,
                  jar: Path,
                  object_explorer: Path,
                  cache: str,
                  jobs: int,
+                 cds: bool = False,
                  **kwargs) -> None:
         self.jar = jar
         self.object_explorer = object_explorer
         self.cache = cache
         self.jobs = jobs
+        self.cds = cds
 
-    def generate_command(self, oracle: Path, input_file: Path, temp: Path, stats: Path) -> list[str]:
-        command = [
-            'java',
+        self.version = None
+        self.archive = None
+        self.startup_saved = None
+
+    def _java(self, archive: Path = None, dump: bool = False) -> list[str]:
+        command = ['java']
+        if archive:
+            command += [f'-XX:{"ArchiveClassesAtExit" if dump else "SharedArchiveFile"}={archive}']
+
+        command += [
             f'-javaagent:{self.object_explorer}',
             '-jar', str(self.jar),
+        ]
+        return command
+
+    def _probe_version(self, cwd: Path) -> str:
+        exit_code, stdout = run_command(['java', '-jar', str(self.jar), '--version'], cwd)
+
+        if exit_code != 0:
+            return 'perses-unknown'
+
+        version = 'perses'
+        for line in stdout.splitlines():
+            if 'perses version' in line:
+                version = f'{version}-{line.split()[-1]}'
+            if 'Git Version' in line:
+                version = f'{version}-{line.split()[-1][:7]}'
+
+        return version
+
+    def prepare(self, tests, work_dir: Path) -> None:
+        work_dir.mkdir(parents=True, exist_ok=True)
+        self.version = self._probe_version(work_dir)
+
+        if self.cds:
+            self.archive = self._build_archive(tests, work_dir)
+
+    def _build_archive(self, tests, work_dir: Path):
+        """
+        Dumps the classes loaded by a training reduction into a dynamic AppCDS archive.
+        The training reduces a small input of the benchmark's input type with an
+        always interesting oracle, so the parser and the reducer classes are loaded too.
+        """
+        logger = get_logger('ReduBear')
+
+        jar_hash = hashlib.sha256(self.jar.read_bytes()).hexdigest()[:16]
+        archive = work_dir / f'perses-{jar_hash}.jsa'
+        training_dir = work_dir / f'perses-{jar_hash}-training'
+        training_dir.mkdir(parents=True, exist_ok=True)
+
+        if not archive.exists():
+            oracle = training_dir / 'interesting.sh'
+            oracle.write_text('#!/bin/sh\nexit 0\n')
+            oracle.chmod(0o755)
+
+            _, _, input_file = tests[0]
+            training_input = training_dir / input_file.name
+            training_input.write_text(TRAINING_INPUTS.get(input_file.suffix, input_file.read_text()))
+
+            command = self._java(archive, dump=True) + [
+                '--test-script', str(oracle),
+                '--input-file', str(training_input),
+                '--output-dir', str(training_dir / 'out'),
+            ]
+            exit_code, stdout = run_command(command, training_dir)
+
+            if exit_code != 0 or not archive.exists():
+                logger.error(f'Building the AppCDS archive failed, Perses is started without it.\n{stdout}')
+                return None
+
+        # Measure the startup time of a JVM (with the agent) with and without the archive.
+        def startup(archive=None):
+            elapsed = []
+            for _ in range(3):
+                start_time = time.time()
+                run_command(self._java(archive) + ['--version'], training_dir)
+                elapsed.append(time.time() - start_time)
+            return median(elapsed)
+
+        self.startup_saved = round(startup() - startup(archive), 3)
+        logger.info(f'Perses AppCDS archive: {archive} (startup saved: {self.startup_saved}s)')
+
+        return archive
+
+    def describe_version(self) -> str:
+        # A rebuilt jar may report the same version.
+        jar = self.jar.stat()
+        return f'{self.version} {jar.st_size} {jar.st_mtime_ns}'
+
+    def generate_command(self, oracle: Path, input_file: Path, temp: Path, stats: Path) -> list[str]:
+        command = self._java(self.archive) + [
             '--verbosity', 'CONFIG',  # SEVERE, WARNING, INFO, CONFIG, FINE, FINER, FINEST
             '--query-caching', 'TRUE',  # TRUE, FALSE, AUTO
             '--code-format', 'ORIG_FORMAT',
@@ -128,33 +233,30 @@ class Perses(Reducer):
         copy2(reduced_file, destination)
         stats['path_output'] = str(destination)
 
-        def measure_file(path):
-            with open(path) as file:
-                return sum(len(word) for line in file.readlines() for word in line.split())
+        # The sizes (bytes, nws, lines, tokens) are measured uniformly by the benchmark.
 
-        stats['bytes_input'] = input_file.stat().st_size
-        stats['bytes_output'] = destination.stat().st_size
+        # The version is resolved once per benchmark in prepare.
+        stats['reducer'] = self.version or self._probe_version(temp_dir.parent)
 
-        stats['nws_input'] = measure_file(input_file)
-        stats['nws_output'] = measure_file(destination)
+        if self.archive:
+            stats['jvm_startup_saved (s)'] = self.startup_saved
+
+        # Perses generates files as "input_file.timestamp.orig". Delete them.
+        self._remove_artifacts(input_file)
 
-        exit_code, stdout = run_command(
-            ['java', '-jar', str(self.jar), '--version'],
-            temp_dir.parent,
-        )
+        return stats
 
-        stats['reducer'] = 'perses-unknown'
-        if exit_code == 0:
-            version = 'perses'
-            for line in stdout.splitlines():
-                if 'perses version' in line:
-                    version = f'{version}-{line.split()[-1]}'
-                if 'Git Version' in line:
-                    version = f'{version}-{line.split()[-1][:7]}'
+    def artifacts(self, input_file) -> list[str]:
+        return [f'{input_file.stem}.*.orig']
 
-            stats['reducer'] = version
+    def _remove_artifacts(self, input_file) -> None:
+        for pattern in self.artifacts(input_file):
+            for path in input_file.parent.glob(pattern):
+                path.unlink(missing_ok=True)
 
-        # Perses generates files as "input_file.timestamp.orig". Delete them.
-        [p.unlink() for p in input_file.parent.glob(f'{input_file.stem}.*.orig')]
+    def partial_output(self, input_file, temp_dir):
+        self._remove_artifacts(input_file)
 
-        return stats
+        # The best program found so far is kept in the output directory.
+        reduced_file = temp_dir / input_file.name
+        return reduced_file if reduced_file.exists() else None
@@ -4,7 +4,10 @@
 # <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
 # This file may not be copied, modified, or distributed except
 # according to those terms.
+import sys
+
 from argparse import ArgumentDefaultsHelpFormatter
+from importlib.metadata import version, PackageNotFoundError
 from pathlib import Path
 from shutil import copy2
 
@@ -128,6 +131,16 @@ class Picire(Reducer):
 
         return command
 
+    def execute(self, command) -> None:
+        # Imported once per worker, the following reductions reuse the loaded modules.
+        from picire.cli import execute
+
+        sys.argv = command
+        execute()
+
+    def describe_version(self) -> str:
+        return _package_versions(['picire'])
+
     def post_process(self, stat_file, input_file, out_dir, *args) -> dict:
         stats = ReportGenerator.read(stat_file)
 
@@ -135,3 +148,13 @@ class Picire(Reducer):
         stats['path_output'] = str(out_dir / input_file.name)
 
         return stats
+
+
+def _package_versions(packages: list[str]) -> str:
+    versions = []
+    for package in packages:
+        try:
+            versions.append(f'{package}-{version(package)}')
+        except PackageNotFoundError:
+            versions.append(f'{package}-unknown')
+    return ' '.join(versions)
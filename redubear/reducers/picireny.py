@@ -4,12 +4,17 @@
 # <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
 # This file may not be copied, modified, or distributed except
 # according to those terms.
+import sys
+
 from pathlib import Path
 from argparse import SUPPRESS
 
 from redubear.reducers import Picire
-from redubear.reducers.grammars import get_grammar
+from redubear.reducers.grammars import build_cache, get_grammar
+from redubear.reducers.picire import _package_versions
+from redubear.utils import process_path
 from redubear.utils import ReducerRegistry
+from redubear.utils import ReportGenerator
 
 
 @ReducerRegistry.register('picireny')
@@ -38,6 +43,18 @@ class Picireny(Picire):
                                 help='parametrization of the HDD variant to run (%(choices)s; default: prune) '
                                      '(may be specified multiple times to run different parametrization in sequence)')
 
+        grammar_parser = parser.add_argument_group('Grammar Options')
+        grammar_parser.add_argument('--grammar-cache',
+                                    type=lambda p: process_path(parser, p),
+                                    default=Path.home() / '.cache' / 'redubear' / 'grammars',
+                                    metavar='DIR',
+                                    help='directory of the parsers generated by ANTLR, shared by every run on the machine (default: %(default)s)')
+        grammar_parser.add_argument('--no-grammar-cache',
+                                    dest='grammar_cache',
+                                    action='store_const',
+                                    const=None,
+                                    help='build the grammars with ANTLR in every reduction')
+
     def __init__(self,
                  dd_star: bool,
                  greeddy: bool,
@@ -48,16 +65,22 @@ class Picireny(Picire):
                  hdd: str,
                  phase: list,
                  measure_memory: bool,
+                 grammar_cache: Path = None,
                  **kwargs) -> None:
         super().__init__(None, dd_star, greeddy, cache, cache_fail, evict_after_fail, jobs, measure_memory)
         self.hdd = hdd
         self.phases = phase
+        self.grammar_cache = grammar_cache
 
     def generate_command(self, oracle: Path, input_file: Path, temp: Path, stats: Path) -> list[str]:
         grammar, start_rule = get_grammar(input_file.suffix[1:])
 
-        command = [
-           'picireny',
+        command = ['picireny']
+        if self.grammar_cache:
+            # The launcher runs picireny with cached ANTLR parsers.
+            command = [sys.executable, build_cache.__file__, str(self.grammar_cache), str(temp / build_cache.REPORT)]
+
+        command += [
             '--sys-recursion-limit', '10000',
             '--flatten-recursion',
             '--start', start_rule,
@@ -72,3 +95,26 @@ class Picireny(Picire):
         command += self._common_parts(oracle, input_file, temp, stats)
 
         return command
+
+    def execute(self, command) -> None:
+        if self.grammar_cache:
+            # Skip the interpreter and the launcher script: [python, build_cache.py, <launcher args>].
+            build_cache.launch(command[2:])
+            return
+
+        from picireny.cli import execute
+
+        sys.argv = command
+        execute()
+
+    def describe_version(self) -> str:
+        return _package_versions(['picire', 'picireny', 'antlr4-python3-runtime'])
+
+    def post_process(self, stat_file, input_file, out_dir, temp_dir) -> dict:
+        stats = super().post_process(stat_file, input_file, out_dir, temp_dir)
+
+        grammar_report = temp_dir / build_cache.REPORT
+        if self.grammar_cache and grammar_report.exists():
+            stats.update(ReportGenerator.read(grammar_report))
+
+        return stats
@@ -8,6 +8,10 @@
 from .logging import get_logger
 
 from .arguments import process_path
-from .registry import ReducerRegistry
+from .journal import Journal
+from .registry import CommandRegistry, ReducerRegistry
 from .report import ReportGenerator
-from .runner import run_command
+from .rusage import ResourceUsage
+from .runner import handle_termination, run_command, run_command_async, run_in_process, terminate_commands, Limits, LimitExceeded
+from .size_metrics import SizeMetrics
+from .workspace import Workspace
@@ -0,0 +1,135 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import json
+import re
+import sqlite3
+import time
+
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    tag TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tests (
+    name TEXT PRIMARY KEY,
+    suite TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS configurations (
+    id INTEGER PRIMARY KEY,
+    reducer TEXT NOT NULL,
+    options TEXT NOT NULL,
+    UNIQUE (reducer, options)
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    configuration_id INTEGER NOT NULL REFERENCES configurations (id),
+    tag TEXT NOT NULL,
+    test TEXT NOT NULL REFERENCES tests (name),
+    reducer TEXT NOT NULL,
+    error TEXT,
+    runtime REAL,
+    tests_started INTEGER,
+    bytes_input INTEGER,
+    bytes_output INTEGER,
+    peak_memory REAL,
+    stats TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_tag_test_reducer ON results (tag, test, reducer);
+CREATE INDEX IF NOT EXISTS results_test_reducer ON results (test, reducer);
+CREATE TABLE IF NOT EXISTS samples (
+    result_id INTEGER NOT NULL REFERENCES results (id),
+    metric TEXT NOT NULL,
+    repetition INTEGER NOT NULL,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS samples_result_metric ON samples (result_id, metric);
+"""
+
+# Stats keys stored in dedicated (queryable) columns.
+COLUMNS = {
+    'runtime': 'runtime',
+    'tests_started': 'tests_started',
+    'bytes_input': 'bytes_input',
+    'bytes_output': 'bytes_output',
+    'peak_memory (MB)': 'peak_memory',
+}
+
+
+def suite_of(test: str) -> str:
+    return re.split('[-_]', test)[0]
+
+
+class ResultStore:
+    """
+    Indexed SQLite store of benchmark reports. Every dumped report is a run (of a tag)
+    with one result row per test; the measured samples of the repeated runs are stored
+    in a separate table.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.connection = sqlite3.connect(str(path), timeout=60)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def add(self, report: dict, tag: str, reducer: str = None, configuration: dict = None) -> int:
+        with self.connection:
+            run_id = self.connection.execute('INSERT INTO runs (tag, created) VALUES (?, ?)',
+                                             (tag, time.time())).lastrowid
+
+            options = json.dumps(configuration or dict(), sort_keys=True, default=str)
+            configurations = dict()
+
+            for test, stats in report.items():
+                test_reducer = reducer or str(stats.get('reducer', 'unknown'))
+                if test_reducer not in configurations:
+                    self.connection.execute('INSERT OR IGNORE INTO configurations (reducer, options) VALUES (?, ?)',
+                                            (test_reducer, options))
+                    configurations[test_reducer] = self.connection.execute(
+                        'SELECT id FROM configurations WHERE reducer = ? AND options = ?', (test_reducer, options)).fetchone()[0]
+
+                self.connection.execute('INSERT OR IGNORE INTO tests (name, suite) VALUES (?, ?)', (test, suite_of(test)))
+
+                error = stats.get('error')
+                values = [stats.get(key) for key in COLUMNS]
+                result_id = self.connection.execute(
+                    f'INSERT INTO results (run_id, configuration_id, tag, test, reducer, error, {", ".join(COLUMNS.values())}, stats) '
+                    f'VALUES (?, ?, ?, ?, ?, ?, {", ".join("?" * len(COLUMNS))}, ?)',
+                    [run_id, configurations[test_reducer], tag, test, test_reducer,
+                     None if error is None else str(error)] + values + [json.dumps(stats, sort_keys=True)]).lastrowid
+
+                samples = [(result_id, metric, i, value)
+                           for metric, summary in stats.get('statistics', dict()).items()
+                           for i, value in enumerate(summary.get('samples', []))]
+                if not samples:
+                    samples = [(result_id, metric, 0, stats[metric]) for metric in COLUMNS if metric in stats]
+                self.connection.executemany('INSERT INTO samples VALUES (?, ?, ?, ?)', samples)
+
+        return run_id
+
+    def report(self, tag: str = None) -> dict:
+        """
+        Returns the report of the latest run (of the given tag).
+        """
+        query = 'SELECT id FROM runs' + (' WHERE tag = ?' if tag else '') + ' ORDER BY id DESC LIMIT 1'
+        run = self.connection.execute(query, (tag,) if tag else ()).fetchone()
+        if run is None:
+            return dict()
+
+        rows = self.connection.execute('SELECT test, stats FROM results WHERE run_id = ?', run)
+        return {test: json.loads(stats) for test, stats in rows}
+
+    def execute(self, query: str, parameters=()) -> tuple[list[str], list[tuple]]:
+        cursor = self.connection.execute(query, parameters)
+        columns = [column[0] for column in cursor.description or []]
+        return columns, cursor.fetchall()
@@ -0,0 +1,94 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import json
+
+from os import fsync, SEEK_END
+from pathlib import Path
+
+
+class Journal:
+    """
+    Append-only JSON Lines file of the finished tests. Every result is flushed to
+    the disk as soon as it arrives, hence a crashed or interrupted benchmark can be
+    resumed from it.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def reset(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text('')
+
+    def append(self, name: str, stats: dict, run: str = None) -> None:
+        """
+        Appends the statistics of a test. The single runs of repeated measurements
+        are identified by their run id.
+        """
+        entry = {'test': name, 'stats': stats}
+        if run is not None:
+            entry['run'] = run
+
+        self._write(entry)
+
+    def append_summary(self, summary: dict) -> None:
+        """
+        Appends the statistics of the whole benchmark (e.g., the predicted and the actual
+        makespan).
+        """
+        self._write({'benchmark': summary})
+
+    def _write(self, entry: dict) -> None:
+        line = json.dumps(entry, sort_keys=True) + '\n'
+        with open(self.path, 'ab+') as journal:
+            # A crashed run may have left a partial last line, the entry must not be glued to it.
+            if journal.seek(0, SEEK_END):
+                journal.seek(-1, SEEK_END)
+                if journal.read(1) != b'\n':
+                    line = '\n' + line
+            journal.write(line.encode())
+            journal.flush()
+            fsync(journal.fileno())
+
+    def entries(self):
+        if not self.path.exists():
+            return
+
+        with open(self.path) as journal:
+            for line in journal:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Partially written line of a crashed run.
+                    continue
+
+    def read(self) -> dict:
+        """
+        Returns the report built from the journal. If a test has multiple entries,
+        the latest one wins.
+        """
+        return {entry['test']: entry['stats'] for entry in self.entries() if 'test' in entry and 'run' not in entry}
+
+    def runs(self) -> dict:
+        """
+        Returns the statistics of the single runs of repeated measurements ({test: {run: stats}}).
+        """
+        runs = dict()
+        for entry in self.entries():
+            if 'run' in entry:
+                runs.setdefault(entry['test'], dict())[entry['run']] = entry['stats']
+
+        return runs
+
+    def summaries(self) -> list:
+        """
+        Returns the statistics of the benchmarks journaled so far (one per resumed session).
+        """
+        return [entry['benchmark'] for entry in self.entries() if 'benchmark' in entry]
+
+    def finished(self) -> dict:
+        return {name: stats for name, stats in self.read().items() if 'error' not in stats}
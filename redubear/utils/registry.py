@@ -35,3 +35,5 @@ class Registry(object):
 class ReducerRegistry(Registry):
     pass
 
+class CommandRegistry(Registry):
+    pass
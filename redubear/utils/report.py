@@ -8,23 +8,50 @@ import json
 
 from pathlib import Path
 
+from redubear.utils.database import ResultStore
+
+SQLITE_EXTENSIONS = ['.sqlite', '.sqlite3', '.db']
+
+
 class ReportGenerator:
     @staticmethod
-    def read(path: Path) -> dict:
+    def read(path: Path, tag: str = None) -> dict:
         extension = path.suffix
 
+        if extension in SQLITE_EXTENSIONS:
+            # Connecting would create an empty database.
+            if not path.exists():
+                raise FileNotFoundError(f'No such result store: {path}')
+
+            store = ResultStore(path)
+            try:
+                return store.report(tag)
+            finally:
+                store.close()
+
         with open(path, 'r') as stat:
             if extension == '.json':
                 return json.load(stat)
             else:
-                raise NotImplementedError('Currently only JSON format is supported.')
+                raise NotImplementedError('Currently only JSON and SQLite formats are supported.')
 
     @staticmethod
-    def dump(report: dict, path: Path) -> None:
+    def dump(report: dict, path: Path, tag: str = None, reducer: str = None, configuration: dict = None) -> None:
+        """
+        The SQLite format appends the report as a new run of the tag to the database.
+        """
         extension = path.suffix
 
+        if extension in SQLITE_EXTENSIONS:
+            store = ResultStore(path)
+            try:
+                store.add(report, tag or path.stem, reducer, configuration)
+            finally:
+                store.close()
+            return
+
         with open(path, 'w') as stat:
             if extension == '.json':
                  json.dump(report, stat, indent=4, sort_keys=True)
             else:
-                raise NotImplementedError('Currently only JSON format is supported.')
+                raise NotImplementedError('Currently only JSON and SQLite formats are supported.')
@@ -5,23 +5,353 @@
 # This file may not be copied, modified, or distributed except
 # according to those terms.
 
-from os import environ
+import asyncio
+import io
+import resource
+import signal
+import time
+import traceback
+
+from contextlib import redirect_stderr, redirect_stdout
+from os import chdir, environ, getcwd, getpid, killpg, sched_setaffinity
+from os import waitid, wait4, waitstatus_to_exitcode, P_PID, WEXITED, WNOWAIT
+from threading import Event, Thread, Timer
+from types import SimpleNamespace
 
 from redubear.utils import get_logger
+from redubear.utils.rusage import ResourceUsage
 from subprocess import Popen, PIPE
 
+# Messages of the common runtimes (Python, JVM, C++, libc) when an allocation fails.
+OOM_MARKERS = ['MemoryError', 'OutOfMemoryError', 'std::bad_alloc', 'Cannot allocate memory',
+               'Could not reserve enough space', 'insufficient memory']
+
+
+class Limits:
+    """
+    Per-command resource limits. The CPU time and address space limits are set with
+    setrlimit, hence they are inherited by (and applied separately to) every process
+    of the tree. The wall time limit covers the whole command.
+    """
+
+    def __init__(self, wall_time: float = None, cpu_time: int = None, memory: int = None) -> None:
+        self.wall_time = wall_time  # seconds
+        self.cpu_time = cpu_time    # seconds
+        self.memory = memory        # MB
+
+    def __bool__(self) -> bool:
+        return any(limit is not None for limit in [self.wall_time, self.cpu_time, self.memory])
+
+    def apply(self) -> None:
+        if self.cpu_time is not None:
+            resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_time, self.cpu_time + 5))
+
+        if self.memory is not None:
+            limit = self.memory * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    def classify(self, exit_code: int, output: str, cpu_time: float = None):
+        """
+        Returns "timeout" or "oom" if the exit status of a command is the result of
+        a limit, None otherwise. SIGKILL is the result of the hard CPU limit only if
+        the CPU time of the command (seconds, if known) reached the limit; otherwise,
+        it is, e.g., the OOM killer or an external kill.
+        """
+        if self.cpu_time is not None:
+            if exit_code == -signal.SIGXCPU:
+                return 'timeout'
+            if exit_code == -signal.SIGKILL and cpu_time is not None and cpu_time >= self.cpu_time:
+                return 'timeout'
+
+        if self.memory is not None and exit_code != 0 and any(marker in output for marker in OOM_MARKERS):
+            return 'oom'
+
+        return None
+
+
+class LimitExceeded(Exception):
+    def __init__(self, reason: str, elapsed: float, output: str) -> None:
+        super().__init__(f'{reason} after {elapsed:.2f}s')
+        self.reason = reason
+        self.elapsed = elapsed
+        self.output = output
+
+
+def kill_group(process: Popen) -> None:
+    try:
+        killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+# The process groups of the running commands of the current process, and the ones that
+# were asked to terminate by terminate_commands.
+_running = set()
+_interrupted = set()
+_in_process = Event()
 
-def run_command(command, cwd, env=environ):
+
+def terminate_commands(grace_period: float = 10.) -> None:
+    """
+    Forwards termination to the running commands of the current process: their process
+    groups get SIGTERM, then SIGKILL after the grace period. The interrupted commands
+    raise LimitExceeded('interrupted').
+    """
+    groups = set(_running)
+    _interrupted.update(groups)
+    for group in groups:
+        try:
+            killpg(group, signal.SIGTERM if grace_period else signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    if grace_period and groups:
+        timer = Timer(grace_period, lambda: [kill_group(SimpleNamespace(pid=group)) for group in groups if group in _running])
+        timer.daemon = True
+        timer.start()
+
+    if _in_process.is_set():
+        # Called by the signal handler of a worker, whose main thread runs the reducer (see run_in_process).
+        raise KeyboardInterrupt()
+
+
+def handle_termination(grace_period: float = 10.) -> None:
+    """
+    Initializer of the worker processes. Ctrl-C (SIGINT of the whole foreground process
+    group) is handled by the main process, which terminates the workers with SIGTERM;
+    a worker forwards it to its running commands. A repeated SIGTERM kills them at once.
+    """
+    signals = []
+
+    def handler(signum, frame):
+        signals.append(signum)
+        terminate_commands(grace_period if len(signals) == 1 else 0.)
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, handler)
+
+
+class _Drain(Thread):
+    """
+    Reads a pipe of a process until EOF.
+    """
+
+    def __init__(self, pipe) -> None:
+        super().__init__(daemon=True)
+        self.pipe = pipe
+        self.data = b''
+        self.start()
+
+    def run(self) -> None:
+        self.data = self.pipe.read()
+        self.pipe.close()
+
+    def result(self) -> bytes:
+        self.join()
+        return self.data
+
+
+def run_command(command, cwd, env=environ, limits: Limits = None, on_start=None, cpus: list[int] = None,
+                usage: ResourceUsage = None):
     logger = get_logger('ReduBear')
     logger.debug(f'Running: {" ".join(command)}')
 
+    def preexec():
+        # Note: runs in the child process between fork and exec, the settings are inherited
+        # by the whole process tree.
+        if cpus:
+            sched_setaffinity(0, cpus)
+        if limits:
+            limits.apply()
+
+    start_time = time.time()
+    # The command gets its own session (and process group), so that the whole tree
+    # (including the grandchildren of the SUT) can be killed at once on a limit or an
+    # interruption.
     process = Popen(command,
                     cwd=cwd.resolve(),
                     env=env,
                     stdout=PIPE,
-                    stderr=PIPE)
-    out, err = process.communicate()
+                    stderr=PIPE,
+                    start_new_session=True,
+                    preexec_fn=preexec if limits or cpus else None)
+    _running.add(process.pid)
+    if on_start:
+        on_start(process)
+
+    # The pipes are drained by threads, so the process can be waited for without reaping it.
+    stdout, stderr = _Drain(process.stdout), _Drain(process.stderr)
+
+    timed_out = Event()
+    timer = None
+    if limits and limits.wall_time is not None:
+        def expire():
+            timed_out.set()
+            kill_group(process)
+
+        timer = Timer(limits.wall_time, expire)
+        timer.start()
+
+    if usage is None and limits and limits.cpu_time is not None:
+        # The CPU time of the reducer tells the kills of the CPU limit apart.
+        usage = ResourceUsage()
+
+    if usage is not None:
+        # The exited but not yet reaped (zombie) reducer still has its own statistics in /proc.
+        waitid(P_PID, process.pid, WEXITED | WNOWAIT)
+        usage.collect_reducer(process.pid)
+
+        _, status, rusage = wait4(process.pid, 0)
+        usage.collect_tree(rusage)
+        process.returncode = waitstatus_to_exitcode(status)
+    else:
+        process.wait()
+
+    if timer:
+        timer.cancel()
+
+    _running.discard(process.pid)
+    if limits or process.pid in _interrupted:
+        # Leftover processes of the group (e.g., a hanging SUT detached from the reducer).
+        kill_group(process)
+
+    output = _decode(stdout.result(), stderr.result())
+    if process.pid in _interrupted:
+        _interrupted.discard(process.pid)
+        raise LimitExceeded('interrupted', time.time() - start_time, output)
+
+    if limits:
+        if timed_out.is_set() and process.returncode != 0:
+            raise LimitExceeded('timeout', time.time() - start_time, output)
+
+        reason = limits.classify(process.returncode, output, usage.cpu_reducer() if usage else None)
+        if reason:
+            raise LimitExceeded(reason, time.time() - start_time, output)
+
+    return process.returncode, output
+
+
+async def run_command_async(command, cwd, env=environ, limits: Limits = None, on_start=None, cpus: list[int] = None,
+                            usage: ResourceUsage = None):
+    """
+    Coroutine counterpart of run_command for the asyncio engine. The command always gets
+    its own session, so that a cancelled run can kill its whole process tree. The resource
+    usage of the tree is not collected (usage is ignored), as the processes are reaped by
+    the event loop; hence, a SIGKILL is never classified as a CPU timeout.
+    """
+    logger = get_logger('ReduBear')
+    logger.debug(f'Running: {" ".join(command)}')
+
+    def preexec():
+        if cpus:
+            sched_setaffinity(0, cpus)
+        if limits:
+            limits.apply()
+
+    start_time = time.time()
+    process = await asyncio.create_subprocess_exec(*command,
+                                                   cwd=cwd.resolve(),
+                                                   env=env,
+                                                   stdout=PIPE,
+                                                   stderr=PIPE,
+                                                   start_new_session=True,
+                                                   preexec_fn=preexec if limits or cpus else None)
+    _running.add(process.pid)
+    if on_start:
+        on_start(process)
+
+    # The pipes are read concurrently, the process is waited for without waiting for EOF.
+    pipes = [asyncio.ensure_future(process.stdout.read()), asyncio.ensure_future(process.stderr.read())]
+    timed_out = False
+    try:
+        await asyncio.wait_for(process.wait(), limits.wall_time if limits else None)
+    except asyncio.TimeoutError:
+        timed_out = True
+        kill_group(process)
+        await process.wait()
+    except asyncio.CancelledError:
+        kill_group(process)
+        _running.discard(process.pid)
+        await asyncio.shield(process.wait())
+        # The pipes are closed by the killed group (unless a detached process keeps them open).
+        await asyncio.wait(pipes, timeout=1)
+        for pipe in pipes:
+            pipe.cancel()
+        raise
+
+    # Leftover processes of the group (e.g., a hanging SUT detached from the reducer).
+    _running.discard(process.pid)
+    kill_group(process)
+
+    output = _decode(*await asyncio.gather(*pipes))
+    if process.pid in _interrupted:
+        _interrupted.discard(process.pid)
+        raise LimitExceeded('interrupted', time.time() - start_time, output)
+
+    if timed_out:
+        raise LimitExceeded('timeout', time.time() - start_time, output)
+
+    if limits:
+        reason = limits.classify(process.returncode, output)
+        if reason:
+            raise LimitExceeded(reason, time.time() - start_time, output)
+
+    return process.returncode, output
+
+
+def run_in_process(function, cwd, on_start=None, cpus: list[int] = None, usage: ResourceUsage = None):
+    """
+    Runs a CLI entry point in the current process as if it was a command executed by
+    run_command. The exit code is taken from SystemExit, uncaught exceptions result in 1.
+    """
+    logger = get_logger('ReduBear')
+    logger.debug(f'Running in process: {function}')
+
+    if cpus:
+        # The worker process is dedicated to the current run.
+        sched_setaffinity(0, cpus)
+
+    if on_start or usage is not None:
+        # Reset the peak RSS (VmHWM) of the process that was measuring the previous runs.
+        try:
+            with open('/proc/self/clear_refs', 'w') as clear_refs:
+                clear_refs.write('5')
+        except OSError:
+            pass
+    if on_start:
+        on_start(SimpleNamespace(pid=getpid()))
+
+    output = io.StringIO()
+    previous_cwd = getcwd()
+    chdir(cwd.resolve())
+    self_before = resource.getrusage(resource.RUSAGE_SELF)
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start_time = time.time()
+    _in_process.set()
+    try:
+        with redirect_stdout(output), redirect_stderr(output):
+            function()
+        exit_code = 0
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except KeyboardInterrupt:
+        # Raised by terminate_commands (the worker ignores SIGINT otherwise).
+        raise LimitExceeded('interrupted', time.time() - start_time, output.getvalue())
+    except Exception:
+        output.write(traceback.format_exc())
+        exit_code = 1
+    finally:
+        _in_process.clear()
+        chdir(previous_cwd)
+
+    if usage is not None:
+        usage.collect_in_process(self_before, resource.getrusage(resource.RUSAGE_SELF),
+                                 children_before, resource.getrusage(resource.RUSAGE_CHILDREN))
+
+    return exit_code, output.getvalue()
+
 
-    stdout = str(out, encoding='utf-8')
-    stderr = str(err, encoding='utf-8')
-    return process.returncode, f'{stdout} {stderr}'
+def _decode(out: bytes, err: bytes) -> str:
+    stdout = str(out, encoding='utf-8', errors='replace')
+    stderr = str(err, encoding='utf-8', errors='replace')
+    return f'{stdout} {stderr}'
@@ -0,0 +1,130 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+from os import sysconf
+
+CLK_TCK = sysconf('SC_CLK_TCK')
+
+COUNTERS = ['user', 'sys', 'majflt', 'nvcsw', 'nivcsw']
+
+
+class ResourceUsage:
+    """
+    Resource accounting of a reduction, split between the reducer process and the
+    subtree of the oracle (SUT) processes.
+
+    The usage of the whole tree comes from wait4 (the reducer including every child it
+    waited for). The usage of the reducer process alone is read from /proc while the
+    reducer is a zombie (i.e., exited but not reaped yet). The SUT usage is the
+    difference of the two.
+
+    The context switches in /proc are counted per thread, and the exited threads are
+    gone by then. Hence, the context switches of multithreaded reducers (e.g., the JVM)
+    are not split, only the tree totals are reported.
+    """
+
+    def __init__(self) -> None:
+        self.tree = None
+        self.reducer = None
+        self.maxrss_tree = None     # kB
+        self.maxrss_reducer = None  # kB
+
+    def collect_reducer(self, pid: int) -> None:
+        try:
+            # The whole process (including the exited threads) and the main thread alone.
+            with open(f'/proc/{pid}/stat') as stat:
+                fields = stat.read().rpartition(')')[2].split()
+            with open(f'/proc/{pid}/task/{pid}/stat') as stat:
+                main_thread = stat.read().rpartition(')')[2].split()
+            with open(f'/proc/{pid}/status') as status:
+                switches = dict(line.split(':') for line in status if 'ctxt_switches' in line)
+        except (OSError, ValueError):
+            return
+
+        # Other threads used CPU time: their context switches are unknown.
+        multithreaded = int(fields[11]) + int(fields[12]) > int(main_thread[11]) + int(main_thread[12])
+        self.reducer = {
+            'user': int(fields[11]) / CLK_TCK,
+            'sys': int(fields[12]) / CLK_TCK,
+            'majflt': int(fields[9]),
+            'nvcsw': None if multithreaded else int(switches['voluntary_ctxt_switches']),
+            'nivcsw': None if multithreaded else int(switches['nonvoluntary_ctxt_switches']),
+        }
+
+    def collect_tree(self, usage) -> None:
+        self.tree = {
+            'user': usage.ru_utime,
+            'sys': usage.ru_stime,
+            'majflt': usage.ru_majflt,
+            'nvcsw': usage.ru_nvcsw,
+            'nivcsw': usage.ru_nivcsw,
+        }
+        self.maxrss_tree = usage.ru_maxrss
+
+    def collect_in_process(self, self_before, self_after, children_before, children_after) -> None:
+        """
+        In-process runs: the worker is the reducer and its waited children are the SUT.
+        """
+        def delta(before, after):
+            return {
+                'user': after.ru_utime - before.ru_utime,
+                'sys': after.ru_stime - before.ru_stime,
+                'majflt': after.ru_majflt - before.ru_majflt,
+                'nvcsw': after.ru_nvcsw - before.ru_nvcsw,
+                'nivcsw': after.ru_nivcsw - before.ru_nivcsw,
+            }
+
+        self.reducer = delta(self_before, self_after)
+        sut = delta(children_before, children_after)
+        self.tree = {counter: self.reducer[counter] + sut[counter] for counter in COUNTERS}
+        # ru_maxrss is the peak over the lifetime of the worker (and of all its children),
+        # not of this run. The peak of the reducer is VmHWM, reset at the start of the run.
+        self.maxrss_tree = None
+        try:
+            with open('/proc/self/status') as status:
+                self.maxrss_reducer = next(int(line.split()[1]) for line in status if line.startswith('VmHWM:'))
+        except (OSError, ValueError, StopIteration):
+            self.maxrss_reducer = None
+
+    def cpu_reducer(self) -> float:
+        """
+        CPU time (s) of the reducer process alone (None if unknown).
+        """
+        return self.reducer['user'] + self.reducer['sys'] if self.reducer else None
+
+    def get(self) -> dict:
+        if self.tree is None:
+            return dict()
+
+        stats = {
+            'cpu_user_s': round(self.tree['user'], 3),
+            'cpu_sys_s': round(self.tree['sys'], 3),
+            'majflt': self.tree['majflt'],
+            'nvcsw': self.tree['nvcsw'],
+            'nivcsw': self.tree['nivcsw'],
+        }
+
+        if self.reducer:
+            for counter, key in [('user', 'cpu_user'), ('sys', 'cpu_sys')]:
+                stats[f'{key}_reducer_s'] = round(self.reducer[counter], 3)
+                stats[f'{key}_sut_s'] = round(max(self.tree[counter] - self.reducer[counter], 0), 3)
+
+            for counter in ['majflt', 'nvcsw', 'nivcsw']:
+                if self.reducer[counter] is None:
+                    continue
+                stats[f'{counter}_reducer'] = self.reducer[counter]
+                stats[f'{counter}_sut'] = max(self.tree[counter] - self.reducer[counter], 0)
+
+        # wait4 only reports the maximum over the tree: it belongs to the SUT if it is larger
+        # than the peak of the reducer, otherwise the peak of the SUT is unknown (but not larger).
+        if self.maxrss_reducer is not None:
+            stats['maxrss_reducer'] = round(self.maxrss_reducer / 1024., 2)
+            stats['maxrss_sut'] = round(self.maxrss_tree / 1024., 2) \
+                if self.maxrss_tree is not None and self.maxrss_tree > self.maxrss_reducer else None
+        elif self.maxrss_tree is not None:
+            stats['maxrss_tree'] = round(self.maxrss_tree / 1024., 2)
+
+        return stats
@@ -0,0 +1,158 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import codecs
+import hashlib
+import importlib
+import json
+import re
+import sys
+
+from importlib.util import find_spec
+from os import getpid, replace
+from pathlib import Path
+from shutil import which
+from subprocess import CalledProcessError
+
+from redubear.utils import get_logger
+
+CHUNK_SIZE = 1 << 20
+CACHE_DIR = Path.home() / '.cache' / 'redubear'
+# Bumped when the definition of a metric changes, the memoized results become stale.
+VERSION = 1
+
+
+def find_antlr() -> Path:
+    """
+    The ANTLR tool shipped with picireny (if it is installed).
+    """
+    spec = find_spec('picireny')
+    if spec is None or not spec.submodule_search_locations:
+        return None
+
+    jars = sorted(Path(spec.submodule_search_locations[0]).rglob('*.jar'))
+    return jars[0] if jars else None
+
+
+class SizeMetrics:
+    """
+    Size of test cases measured the same way for every reducer: bytes, non-whitespace
+    characters, lines and (if the grammar of the file type, ANTLR and its Python runtime
+    are available) tokens on the default channel. Files are streamed in chunks, and the
+    results are memoized on the disk by content hash, hence the same input is measured
+    only once across tests, tags and reducers.
+    """
+
+    def __init__(self, cache_dir: Path = None, antlr: Path = None) -> None:
+        self.cache_dir = cache_dir or CACHE_DIR
+        self.antlr = antlr or find_antlr()
+        self.lexers = dict()
+        self.logger = get_logger('ReduBear')
+
+    def __getstate__(self) -> dict:
+        # The generated lexers are loaded separately by every worker.
+        return dict(self.__dict__, lexers=dict())
+
+    def measure(self, path: Path) -> dict:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+
+        extension = path.suffix[1:]
+        entry = self.cache_dir / 'sizes' / f'{digest.hexdigest()}.json'
+        try:
+            metrics = json.loads(entry.read_text())
+            if metrics.pop('version') == VERSION and ('tokens' in metrics or not self._lexer(extension)):
+                return metrics
+        except (OSError, ValueError, KeyError):
+            pass
+
+        metrics = self._measure_stream(path)
+        tokens = self._tokens(path, extension)
+        if tokens is not None:
+            metrics['tokens'] = tokens
+
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        staging = entry.with_name(f'{entry.name}.{getpid()}.tmp')
+        staging.write_text(json.dumps(dict(metrics, version=VERSION)))
+        replace(staging, entry)
+        return metrics
+
+    def counts_tokens(self, path: Path) -> bool:
+        return self._lexer(path.suffix[1:]) is not None
+
+    @staticmethod
+    def _measure_stream(path: Path) -> dict:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        size, lines, nws = 0, 0, 0
+        last = b''
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                size += len(chunk)
+                lines += chunk.count(b'\n')
+                # Words may be split by the chunk boundary, but only their lengths are summed.
+                nws += sum(len(word) for word in decoder.decode(chunk).split())
+                last = chunk[-1:]
+        nws += sum(len(word) for word in decoder.decode(b'', final=True).split())
+
+        if last and last != b'\n':
+            lines += 1
+
+        return {'bytes': size, 'nws': nws, 'lines': lines}
+
+    def _lexer(self, extension: str):
+        """
+        Returns the generated lexer class for the file type (None if unavailable).
+        """
+        if extension in self.lexers:
+            return self.lexers[extension]
+
+        self.lexers[extension] = None
+
+        from redubear.reducers.grammars.grammars import GRAMMARS
+        from redubear.reducers.grammars import build_cache
+
+        if extension not in GRAMMARS or not self.antlr or not which('java') or find_spec('antlr4') is None:
+            return None
+
+        grammars = [str(g) for g in GRAMMARS[extension][0]]
+        try:
+            directory = build_cache.build_lexer(grammars, self.antlr, self.cache_dir / 'lexers')
+        except (OSError, CalledProcessError) as e:
+            self.logger.warning(f'The lexer of {extension} files cannot be generated: {e}')
+            return None
+
+        for grammar in grammars:
+            text = Path(grammar).read_text() if grammar.endswith('.g4') else ''
+            lexer = re.search(r'^\s*lexer\s+grammar\s+(\w+)\s*;', text, re.MULTILINE)
+            combined = re.search(r'^\s*grammar\s+(\w+)\s*;', text, re.MULTILINE)
+            name = lexer.group(1) if lexer else f'{combined.group(1)}Lexer' if combined else None
+            if name and (directory / f'{name}.py').exists():
+                if str(directory) not in sys.path:
+                    sys.path.append(str(directory))
+                self.lexers[extension] = getattr(importlib.import_module(name), name)
+                break
+
+        return self.lexers[extension]
+
+    def _tokens(self, path: Path, extension: str) -> int:
+        lexer_class = self._lexer(extension)
+        if lexer_class is None:
+            return None
+
+        from antlr4 import FileStream, Token
+
+        lexer = lexer_class(FileStream(str(path), encoding='utf-8', errors='replace'))
+        lexer.removeErrorListeners()
+
+        tokens = 0
+        token = lexer.nextToken()
+        while token.type != Token.EOF:
+            if token.channel == Token.DEFAULT_CHANNEL:
+                tokens += 1
+            token = lexer.nextToken()
+        return tokens
@@ -0,0 +1,98 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import shutil
+
+from pathlib import Path
+from subprocess import run, DEVNULL
+from tempfile import mkdtemp
+
+from redubear.utils import get_logger
+
+# Headroom for the intermediate files of the reducer (relative to the input size) and
+# for the rest of the system.
+INPUT_FACTOR = 8
+RESERVE = 256 * 1024 * 1024
+
+
+class Workspace:
+    """
+    Isolated per-run copy of the directory of a test (oracle and input). The workspace is
+    created under a RAM-backed root (tmpfs) if it has enough capacity, otherwise under the
+    fallback directory on the disk. The reduction runs inside the workspace, only its final
+    artifacts are copied out, then the workspace is deleted.
+    """
+
+    def __init__(self, root: Path, fallback: Path) -> None:
+        self.root = root
+        self.fallback = fallback
+        self.path = None
+        self.logger = get_logger('ReduBear')
+
+    def create(self, name: str, oracle: Path, input_file: Path):
+        """
+        Returns the oracle, the input file and the temporary directory inside the workspace.
+        """
+        test_dir = oracle.parent
+        required = _size(test_dir) + INPUT_FACTOR * input_file.stat().st_size
+        if input_file.parent != test_dir:
+            required += input_file.stat().st_size
+
+        root = self.root
+        if _available(root) < required + RESERVE:
+            self.logger.warning(f'{name}: not enough space in {root}, the workspace falls back to {self.fallback}.')
+            root = self.fallback
+
+        root.mkdir(parents=True, exist_ok=True)
+        self.path = Path(mkdtemp(prefix=f'{name}-', dir=root))
+
+        workspace_test_dir = self.path / 'test'
+        _copy_tree(test_dir, workspace_test_dir)
+        workspace_input = workspace_test_dir / input_file.name
+        if input_file.parent != test_dir:
+            shutil.copy2(input_file, workspace_input)
+
+        temp_dir = self.path / 'reduction'
+        temp_dir.mkdir()
+
+        return workspace_test_dir / oracle.name, workspace_input, temp_dir
+
+    def remove(self) -> None:
+        if self.path:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.path = None
+
+
+def _size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob('*') if p.is_file() and not p.is_symlink())
+
+
+def _available(root: Path) -> int:
+    """
+    Free space of the file system of root. Files on tmpfs consume RAM, hence the
+    available memory is a limit too.
+    """
+    existing = root
+    while not existing.exists():
+        existing = existing.parent
+
+    available = shutil.disk_usage(existing).free
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    available = min(available, int(line.split()[1]) * 1024)
+    except OSError:
+        pass
+
+    return available
+
+
+def _copy_tree(source: Path, destination: Path) -> None:
+    # Reflinks are cheap copies on file systems that support them (btrfs, xfs).
+    if run(['cp', '-a', '--reflink=auto', str(source), str(destination)], stdout=DEVNULL, stderr=DEVNULL).returncode != 0:
+        shutil.rmtree(destination, ignore_errors=True)
+        shutil.copytree(source, destination, symlinks=True)
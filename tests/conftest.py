@@ -0,0 +1,123 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import sys
+import time
+import types
+
+from pathlib import Path
+from shutil import copy2
+
+import pytest
+
+from redubear.reducers import Reducer
+
+
+class Token:
+    EOF = -1
+    DEFAULT_CHANNEL = 0
+
+    def __init__(self, type, channel=0):
+        self.type = type
+        self.channel = channel
+
+
+class FileStream:
+    def __init__(self, path, encoding=None, errors=None):
+        with open(path, encoding=encoding, errors=errors) as f:
+            self.text = f.read()
+
+
+class WordLexer:
+    """
+    Words are tokens on the default channel, comments (#...) are on a hidden channel.
+    """
+
+    def __init__(self, stream):
+        self.tokens = iter([Token(1, 1 if word.startswith('#') else 0) for word in stream.text.split()])
+
+    def removeErrorListeners(self):
+        pass
+
+    def nextToken(self):
+        return next(self.tokens, Token(Token.EOF))
+
+
+@pytest.fixture
+def word_lexer(monkeypatch):
+    """
+    A lexer of words in place of a generated one, with a minimal ANTLR runtime.
+    """
+    monkeypatch.setitem(sys.modules, 'antlr4', types.SimpleNamespace(FileStream=FileStream, Token=Token))
+    return WordLexer
+
+
+class ShellReducer(Reducer):
+    """
+    A reducer in a few lines of shell. It checks the input, tries its first line as a
+    smaller candidate, then sleeps the seconds of the "delay" file next to the input (0 if
+    there is none). The pids of the reducer and of its sleep are appended to the "pids"
+    file next to the input. An uninteresting input is an error (exit code 3).
+    """
+
+    SCRIPT = """
+echo $$ >> "$5"
+"$1" "$2" || exit 3
+head -n 1 "$2" > "$3/candidate"
+best="$2"
+if "$1" "$3/candidate"; then best="$3/candidate"; fi
+sleep "$(cat "$(dirname "$2")/delay" 2>/dev/null || echo 0)" &
+echo $! >> "$5"
+wait $!
+cp "$best" "$3/output"
+echo '{}' > "$4"
+"""
+
+    def generate_command(self, oracle, input_file, temp, stats) -> list[str]:
+        return ['sh', '-c', self.SCRIPT, 'shell', str(oracle), str(input_file), str(temp), str(stats),
+                str(input_file.parent / 'pids')]
+
+    def post_process(self, stat_file, input_file, out_dir, temp_dir) -> dict:
+        destination = out_dir / input_file.name
+        copy2(temp_dir / 'output', destination)
+        return {'path_input': str(input_file), 'path_output': str(destination)}
+
+
+def make_test(root: Path, name: str, content: str, delay: float = 0.) -> tuple:
+    """
+    A test of the ShellReducer: (name, oracle, input file), the oracle looks for "bug".
+    """
+    directory = root / name
+    directory.mkdir(parents=True)
+    oracle = directory / 'test.sh'
+    oracle.write_text('#!/bin/sh\ngrep -q bug "$1"\n')
+    oracle.chmod(0o755)
+    input_file = directory / 'input.c'
+    input_file.write_text(content)
+    if delay:
+        (directory / 'delay').write_text(str(delay))
+    return name, oracle, input_file
+
+
+def alive(pid: int) -> bool:
+    try:
+        with open(f'/proc/{pid}/stat') as stat:
+            return stat.read().rpartition(')')[2].split()[0] != 'Z'
+    except OSError:
+        return False
+
+
+def wait_for_pids(path: Path, count: int, timeout: float = 10.) -> list[int]:
+    """
+    The pids of the ShellReducer (and of its sleep) once count of them are recorded.
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        pids = path.read_text().split() if path.exists() else []
+        if len(pids) >= count:
+            return [int(pid) for pid in pids]
+        time.sleep(.05)
+    raise TimeoutError(f'{path} has no {count} pids')
@@ -0,0 +1,87 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import json
+
+import pytest
+
+from redubear.benchmark import adaptive
+from redubear.benchmark.adaptive import AdaptiveConcurrency
+
+
+@pytest.fixture
+def machine(monkeypatch):
+    """
+    An idle machine with 4 CPUs, whose state is changed by the tests.
+    """
+    state = {'cpu': 0., 'memory': 0., 'available': 16384., 'run_queue': 0}
+    monkeypatch.setattr(adaptive, 'read_pressure', lambda resource: state[resource])
+    monkeypatch.setattr(adaptive, 'read_memory_available', lambda: state['available'])
+    monkeypatch.setattr(adaptive, 'read_run_queue', lambda: state['run_queue'])
+    monkeypatch.setattr(adaptive, 'sched_getaffinity', lambda pid: set(range(4)))
+    return state
+
+
+def test_raised_when_idle_and_saturated(machine, tmp_path):
+    concurrency = AdaptiveConcurrency(4, interval=0., log=tmp_path / 'log.jsonl')
+    assert concurrency.limit == 2
+
+    # Free slots, no reason to raise.
+    assert concurrency.update(1) == 2
+    assert concurrency.update(2) == 3
+    assert concurrency.update(3) == 4
+    assert concurrency.update(4) == 4
+
+    decisions = [json.loads(line) for line in (tmp_path / 'log.jsonl').read_text().splitlines()]
+    assert [(d['previous'], d['limit'], d['reason']) for d in decisions] == [(2, 3, 'idle resources'), (3, 4, 'idle resources')]
+
+
+@pytest.mark.parametrize('resource, value, reason', [
+    ('memory', 20., 'memory pressure'),
+    ('available', 100., 'low available memory'),
+    ('cpu', 50., 'cpu pressure'),
+    ('run_queue', 10, 'long run queue'),
+])
+def test_lowered_under_pressure(machine, tmp_path, resource, value, reason):
+    concurrency = AdaptiveConcurrency(8, min_workers=3, interval=0., log=tmp_path / 'log.jsonl')
+    machine[resource] = value
+
+    assert concurrency.update(4) == 3
+    assert concurrency.update(3) == 3
+    decisions = [json.loads(line) for line in (tmp_path / 'log.jsonl').read_text().splitlines()]
+    assert [(d['limit'], d['reason']) for d in decisions] == [(3, reason)]
+
+
+def test_unavailable_psi_is_ignored(machine):
+    machine.update(cpu=None, memory=None, available=None, run_queue=None)
+    concurrency = AdaptiveConcurrency(4, interval=0.)
+
+    assert concurrency.update(2) == 3
+
+
+def test_updated_once_per_interval(machine):
+    concurrency = AdaptiveConcurrency(4, interval=3600.)
+
+    assert concurrency.update(2) == 3
+    assert concurrency.update(3) == 3
+
+
+def test_fits():
+    concurrency = AdaptiveConcurrency(4)
+
+    # The first run, unknown peaks and unknown memory are admitted.
+    assert concurrency.fits('a', 4096., 0, 1024., 0.)
+    assert concurrency.fits('a', None, 1, 1024., 0.)
+    assert concurrency.fits('a', 4096., 1, None, 0.)
+
+    # The running run reserved 2048 MB and uses 512 MB of it.
+    concurrency.acquire('b', 2048.)
+    assert concurrency.fits('a', 1024., 1, 4000., 512.)
+    assert not concurrency.fits('a', 2048., 1, 4000., 512.)
+    assert concurrency.deferred == {'a'}
+
+    concurrency.release('b')
+    assert concurrency.fits('a', 2048., 1, 4000., 512.)
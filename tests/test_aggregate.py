@@ -0,0 +1,74 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import pytest
+
+from redubear.benchmark.aggregate import aggregate, bootstrap_ci
+from redubear.cli import parse_args
+
+
+def test_median_run_is_kept():
+    stats = aggregate({
+        'rep-0': {'runtime': 3., 'tests_started': 30, 'path_output': 'c'},
+        'rep-1': {'runtime': 1., 'tests_started': 10, 'path_output': 'a'},
+        'rep-2': {'runtime': 2., 'tests_started': 20, 'path_output': 'b'},
+    })
+
+    assert stats['path_output'] == 'b'
+    assert stats['repeat'] == 3
+    assert stats['failed_runs'] == 0
+    assert stats['statistics']['runtime']['median'] == 2.
+    assert stats['statistics']['runtime']['min'] == 1.
+    assert stats['statistics']['runtime']['mad'] == 1.
+    assert stats['statistics']['tests_started']['samples'] == [30, 10, 20]
+
+
+def test_failed_runs_are_excluded():
+    stats = aggregate({
+        'rep-0': {'runtime': 1.},
+        'rep-1': {'error': 'timeout'},
+    })
+
+    assert stats['repeat'] == 1
+    assert stats['failed_runs'] == 1
+    assert stats['statistics']['runtime']['ci95'] == [1., 1.]
+
+
+def test_metrics_missing_from_a_run_are_not_summarized():
+    stats = aggregate({
+        'rep-0': {'runtime': 1., 'peak_memory (MB)': 10.},
+        'rep-1': {'runtime': 2.},
+    })
+
+    assert 'peak_memory (MB)' not in stats['statistics']
+
+
+def test_every_run_failed():
+    assert aggregate({'rep-0': {'error': 'timeout'}}) == {'error': 'timeout'}
+
+
+def test_no_runs():
+    assert 'error' in aggregate({})
+
+
+def test_bootstrap_ci():
+    samples = [1., 2., 3., 4., 100.]
+    low, high = bootstrap_ci(samples)
+
+    assert low <= 3. <= high
+    assert 1. <= low and high <= 100.
+    # Reproducible for the same samples.
+    assert bootstrap_ci(samples) == [low, high]
+
+
+def test_bootstrap_ci_of_a_single_sample():
+    assert bootstrap_ci([5.]) == [5., 5.]
+
+
+@pytest.mark.parametrize('options', [['--repeat', '0'], ['--warmup', '-1']])
+def test_invalid_repetitions_are_rejected(options):
+    with pytest.raises(SystemExit):
+        parse_args(['-t', 'tag'] + options + ['picire'])
@@ -0,0 +1,44 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import pytest
+
+from redubear.benchmark import calibration
+from redubear.cli import parse_args
+
+
+@pytest.fixture
+def test_dir(tmp_path):
+    directory = tmp_path / 'test'
+    directory.mkdir()
+    oracle = directory / 'test.sh'
+    oracle.write_text('#!/bin/sh\ngrep -q bug "$1"\n')
+    oracle.chmod(0o755)
+    (directory / 'input.c').write_text('int main() { bug(); }\n')
+    return directory
+
+
+def test_calibrate(tmp_path, test_dir):
+    stats = calibration.calibrate(test_dir / 'test.sh', test_dir / 'input.c', 3, tmp_path / 'work')
+
+    assert stats['runs'] == 3
+    assert stats['interesting']
+    assert stats['latency_p95 (s)'] >= stats['latency_mean (s)'] > 0
+    assert not (tmp_path / 'work').exists()
+
+
+def test_p95_is_the_nearest_rank(tmp_path, test_dir, monkeypatch):
+    # The oracle of the nth run takes n seconds.
+    ticks = iter([0, 1, 0, 2, 0, 3, 0, 4, 0, 5])
+    monkeypatch.setattr(calibration.time, 'perf_counter', lambda: next(ticks))
+
+    stats = calibration.calibrate(test_dir / 'test.sh', test_dir / 'input.c', 5, tmp_path / 'work')
+    assert stats['latency_p95 (s)'] == 5
+
+
+def test_negative_runs_are_rejected():
+    with pytest.raises(SystemExit):
+        parse_args(['-t', 'tag', '--calibrate', '-1', 'picire'])
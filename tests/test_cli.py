@@ -0,0 +1,27 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import subprocess
+import sys
+
+from pathlib import Path
+
+
+def test_in_process_restarts_optimized_once(tmp_path):
+    # The restarted interpreter stops before running the benchmark.
+    code = ('import sys\n'
+            f'sys.path.insert(0, {str(Path(__file__).parent.parent)!r})\n'
+            'if sys.flags.optimize:\n'
+            '    print(sys.flags.isolated, sys.argv[1:])\n'
+            '    sys.exit(0)\n'
+            'from redubear.cli import main\n'
+            'main()\n')
+    # PYTHONOPTIMIZE is ignored by isolated interpreters.
+    result = subprocess.run([sys.executable, '-I', '-c', code, '-t', 'tag', '-o', str(tmp_path), '--in-process', 'picire'],
+                            capture_output=True, text=True, timeout=30)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == f"1 ['-t', 'tag', '-o', '{tmp_path}', '--in-process', 'picire']"
@@ -0,0 +1,89 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import pytest
+
+from redubear.benchmark.aggregate import permutation_test
+from redubear.commands.compare import Compare, geomean, holm
+
+
+def repeated(samples: list[float]) -> dict:
+    return {'runtime': sorted(samples)[len(samples) // 2], 'statistics': {'runtime': {'samples': samples}}}
+
+
+def test_permutation_test():
+    # Every candidate sample is larger: the only split at least as extreme as observed.
+    assert permutation_test([1., 2., 3.], [10., 11., 12.]) == pytest.approx(1 / 20)
+    assert permutation_test([10., 11., 12.], [1., 2., 3.]) == 1.
+
+
+def test_permutation_test_floor_of_two_samples():
+    assert permutation_test([1., 2.], [10., 11.]) == pytest.approx(1 / 6)
+
+
+def test_holm():
+    assert holm([0.01, 0.04, 0.03]) == pytest.approx([0.03, 0.06, 0.06])
+    assert holm([0.5, 0.9]) == pytest.approx([1., 1.])
+    assert holm([]) == []
+
+
+def test_geomean():
+    assert geomean([2., 0.5]) == pytest.approx(1.)
+    assert geomean([4.]) == pytest.approx(4.)
+
+
+def test_single_samples_are_gated_by_the_geomean_only():
+    baseline = {'a': {'runtime': 10.}, 'b': {'runtime': 10.}}
+    candidate = {'a': {'runtime': 20.}, 'b': {'runtime': 10.}}
+
+    comparison = Compare.compare(baseline, candidate, threshold=0.05, alpha=0.05)
+
+    assert comparison['tests']['a']['runtime']['ratio'] == 2.
+    assert not comparison['tests']['a']['runtime']['regression']
+    assert comparison['geomean']['all']['runtime'] == pytest.approx(2 ** 0.5)
+
+
+def test_significant_regression_with_enough_samples():
+    baseline = {'a': repeated([10., 10.1, 9.9, 10.2, 9.8])}
+    candidate = {'a': repeated([20., 20.1, 19.9, 20.2, 19.8])}
+
+    stats = Compare.compare(baseline, candidate, threshold=0.05, alpha=0.05)['tests']['a']['runtime']
+
+    assert stats['significant'] and stats['regression']
+    assert stats['p_adjusted'] == pytest.approx(1 / 252)
+
+
+def test_too_few_samples_are_not_gated():
+    baseline = {'a': repeated([10., 10.1])}
+    candidate = {'a': repeated([20., 20.1])}
+
+    stats = Compare.compare(baseline, candidate, threshold=0.05, alpha=0.05)['tests']['a']['runtime']
+
+    assert stats['p'] == pytest.approx(1 / 6)
+    assert not stats['regression']
+    assert 'p_adjusted' not in stats
+
+
+def test_correction_across_tests():
+    baseline = {name: repeated([10., 10.1, 9.9]) for name in 'abcdefghij'}
+    candidate = {name: repeated([20., 20.1, 19.9]) for name in 'abcdefghij'}
+
+    tests = Compare.compare(baseline, candidate, threshold=0.05, alpha=0.05, min_samples=3)['tests']
+
+    # p = 1/20 per test, not significant for ten tests.
+    assert all(stats['runtime']['p'] == pytest.approx(1 / 20) for stats in tests.values())
+    assert not any(stats['runtime']['regression'] for stats in tests.values())
+
+
+def test_failed_and_missing_tests():
+    baseline = {'a': {'runtime': 1.}, 'b': {'error': 'timeout'}, 'c': {'runtime': 1.}}
+    candidate = {'a': {'runtime': 1.}, 'b': {'runtime': 1.}}
+
+    comparison = Compare.compare(baseline, candidate, threshold=0.05, alpha=0.05)
+
+    assert list(comparison['tests']) == ['a']
+    assert comparison['failed'] == ['b']
+    assert comparison['missing'] == ['c']
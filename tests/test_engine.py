@@ -0,0 +1,67 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import asyncio
+
+import pytest
+
+from conftest import alive, make_test, wait_for_pids, ShellReducer
+from redubear.benchmark import Benchmark
+from redubear.utils import SizeMetrics
+
+
+def benchmark(tmp_path, tests, **options) -> Benchmark:
+    return Benchmark(tests, ShellReducer(), 'sh', 2, None, tmp_path / 'out', tmp_path / 'temp', False,
+                     size_metrics=SizeMetrics(tmp_path / 'sizes'), **options)
+
+
+async def consume(executor: Benchmark) -> list:
+    return [event async for event in executor.events()]
+
+
+def test_events(tmp_path):
+    tests = [make_test(tmp_path / 'tests', 'good', 'bug();\nint x;\n'), make_test(tmp_path / 'tests', 'bad', 'int x;\n')]
+    executor = benchmark(tmp_path, tests)
+    # The worker processes are only created by run_all.
+    assert executor.executor is None
+
+    events = asyncio.run(consume(executor))
+
+    assert sorted((event['event'], event['test']) for event in events) == \
+        [('failed', 'bad'), ('finished', 'good'), ('started', 'bad'), ('started', 'good')]
+    for test in ['good', 'bad']:
+        started = [i for i, event in enumerate(events) if event['test'] == test]
+        assert events[started[0]]['event'] == 'started' and len(started) == 2
+
+    finished = next(event for event in events if event['event'] == 'finished')
+    assert finished['stats']['bytes_input'] == 14 and finished['stats']['bytes_output'] == 7
+    failed = next(event for event in events if event['event'] == 'failed')
+    assert failed['stats'] == {'error': 3}
+
+    # Journaled as with run_all.
+    report = executor.reports()['sh']
+    assert report['good'] == finished['stats'] and report['bad'] == {'error': 3}
+    assert len(executor.journals['sh'].summaries()) == 1
+
+
+def test_cancelled_consumer_kills_the_process_group(tmp_path):
+    name, oracle, input_file = make_test(tmp_path / 'tests', 'slow', 'bug();\n', delay=60)
+    executor = benchmark(tmp_path, [(name, oracle, input_file)])
+
+    async def cancel():
+        task = asyncio.ensure_future(consume(executor))
+        # The reducer and its sleep (in the same process group) are started.
+        pids = await asyncio.get_running_loop().run_in_executor(None, wait_for_pids, input_file.parent / 'pids', 2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return pids
+
+    pids = asyncio.run(asyncio.wait_for(cancel(), 30))
+
+    assert not any(alive(pid) for pid in pids)
+    # The cancelled run is not journaled as finished, it is run again on resume.
+    assert 'slow' not in executor.journals['sh'].finished()
@@ -0,0 +1,87 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import asyncio
+import subprocess
+
+from pathlib import Path
+
+from conftest import make_test, wait_for_pids, ShellReducer
+from redubear.benchmark import Benchmark
+from redubear.oracle import OracleCheckpoint
+from redubear.utils import SizeMetrics
+
+
+def benchmark(tmp_path, tests, **options) -> Benchmark:
+    return Benchmark(tests, ShellReducer(), 'sh', 2, None, tmp_path / 'out', tmp_path / 'temp', False,
+                     size_metrics=SizeMetrics(tmp_path / 'sizes'), checkpoint=True, grace_period=5., **options)
+
+
+async def consume(executor: Benchmark) -> list:
+    return [event async for event in executor.events()]
+
+
+def test_interrupted_run_is_saved_and_resumed(tmp_path):
+    tests = [make_test(tmp_path / 'tests', 'slow', 'bug();\nint x;\n', delay=60),
+             make_test(tmp_path / 'tests', 'quick', 'bug();\nint y;\n')]
+    _, _, slow_input = tests[0]
+    executor = benchmark(tmp_path, tests)
+
+    async def interrupt():
+        events = []
+        async for event in executor.events():
+            events.append(event)
+            if (event['event'], event['test']) == ('finished', 'quick'):
+                # The slow reducer has found its smaller candidate and sleeps.
+                await asyncio.get_running_loop().run_in_executor(None, wait_for_pids, slow_input.parent / 'pids', 2)
+                executor.interrupt()
+        return events
+
+    events = asyncio.run(asyncio.wait_for(interrupt(), 30))
+
+    assert [(event['event'], event['test']) for event in events if event['event'] != 'started'] == \
+        [('finished', 'quick'), ('failed', 'slow')]
+    report = executor.reports()['sh']
+    assert 'error' not in report['quick']
+    assert report['slow']['error'] == 'interrupted'
+    # The smallest interesting candidate of the oracle checkpoint.
+    assert Path(report['slow']['path_output']).read_text() == 'bug();\n'
+    assert report['slow']['bytes_output'] == 7
+    assert executor.journals['sh'].summaries()[-1]['interrupted']
+    # No temporary directories are left behind.
+    assert list((tmp_path / 'temp' / 'redubear').iterdir()) == []
+
+    (slow_input.parent / 'delay').unlink()
+    resumed = benchmark(tmp_path, tests, resume=True)
+    events = asyncio.run(consume(resumed))
+
+    assert [(event['event'], event['test']) for event in events] == [('started', 'slow'), ('finished', 'slow')]
+    report = resumed.reports()['sh']
+    assert 'error' not in report['slow'] and 'error' not in report['quick']
+
+
+def test_checkpoint_keeps_the_smallest_of_parallel_calls(tmp_path):
+    oracle = tmp_path / 'test.sh'
+    oracle.write_text('#!/bin/sh\ngrep -q bug "$1"\n')
+    oracle.chmod(0o755)
+    input_file = tmp_path / 'input.c'
+    input_file.write_text('bug' + 'x' * 100)
+    (tmp_path / 'temp').mkdir()
+
+    checkpoint = OracleCheckpoint(tmp_path / 'temp')
+    shim = checkpoint.wrap(oracle, input_file)
+    candidates = []
+    for size in range(40):
+        candidate = tmp_path / f'candidate{size}.c'
+        candidate.write_text('bug' + 'x' * size)
+        candidates.append(candidate)
+
+    # The larger candidates are started last, they finish right after the smaller ones.
+    processes = [subprocess.Popen([str(shim), str(candidate)]) for candidate in reversed(candidates)]
+    assert all(process.wait() == 0 for process in processes)
+
+    assert checkpoint.get().read_text() == 'bug'
+    assert checkpoint.best_size.read_text().strip() == '3'
@@ -0,0 +1,80 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+
+from redubear.utils import Journal
+
+
+def test_latest_entry_wins(tmp_path):
+    journal = Journal(tmp_path / 'journal.jsonl')
+    journal.reset()
+    journal.append('a', {'error': 'timeout'})
+    journal.append('b', {'runtime': 1.})
+    journal.append('a', {'runtime': 2.})
+
+    assert journal.read() == {'a': {'runtime': 2.}, 'b': {'runtime': 1.}}
+    assert journal.finished() == {'a': {'runtime': 2.}, 'b': {'runtime': 1.}}
+
+
+def test_failed_tests_are_unfinished(tmp_path):
+    journal = Journal(tmp_path / 'journal.jsonl')
+    journal.reset()
+    journal.append('a', {'error': 'interrupted'})
+
+    assert journal.read() == {'a': {'error': 'interrupted'}}
+    assert journal.finished() == {}
+
+
+def test_runs_are_separate_from_tests(tmp_path):
+    journal = Journal(tmp_path / 'journal.jsonl')
+    journal.reset()
+    journal.append('a', {'runtime': 1.}, run='rep-0')
+    journal.append('a', {'runtime': 3.}, run='rep-1')
+    journal.append_summary({'makespan (s)': 4.})
+
+    assert journal.read() == {}
+    assert journal.runs() == {'a': {'rep-0': {'runtime': 1.}, 'rep-1': {'runtime': 3.}}}
+    assert journal.summaries() == [{'makespan (s)': 4.}]
+
+
+def test_partial_line_is_skipped(tmp_path):
+    journal = Journal(tmp_path / 'journal.jsonl')
+    journal.reset()
+    journal.append('a', {'runtime': 1.})
+    with open(journal.path, 'a') as file:
+        file.write('{"test": "b", "sta')
+
+    assert journal.read() == {'a': {'runtime': 1.}}
+
+
+def test_append_after_partial_line(tmp_path):
+    journal = Journal(tmp_path / 'journal.jsonl')
+    journal.reset()
+    journal.append('a', {'runtime': 1.})
+    with open(journal.path, 'a') as file:
+        file.write('{"test": "b", "sta')
+
+    # The resumed benchmark appends after the partial line of the crashed one.
+    journal.append('c', {'runtime': 3.})
+    journal.append('d', {'runtime': 4.})
+
+    assert journal.read() == {'a': {'runtime': 1.}, 'c': {'runtime': 3.}, 'd': {'runtime': 4.}}
+
+
+def test_missing_journal_is_empty(tmp_path):
+    journal = Journal(tmp_path / 'missing.jsonl')
+
+    assert journal.read() == {}
+    assert journal.runs() == {}
+
+
+def test_reset_restarts_the_journal(tmp_path):
+    journal = Journal(tmp_path / 'sub' / 'journal.jsonl')
+    journal.reset()
+    journal.append('a', {'runtime': 1.})
+    journal.reset()
+
+    assert journal.read() == {}
@@ -0,0 +1,41 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import signal
+
+from pathlib import Path
+
+from redubear.utils import run_command, Limits
+
+
+def test_sigxcpu_is_timeout():
+    assert Limits(cpu_time=10).classify(-signal.SIGXCPU, '') == 'timeout'
+
+
+def test_sigkill_is_timeout_only_at_the_cpu_limit():
+    limits = Limits(cpu_time=10)
+
+    assert limits.classify(-signal.SIGKILL, '', cpu_time=15.) == 'timeout'
+    assert limits.classify(-signal.SIGKILL, '', cpu_time=0.5) is None
+    assert limits.classify(-signal.SIGKILL, '') is None
+
+
+def test_signals_without_cpu_limit():
+    assert Limits(wall_time=10).classify(-signal.SIGXCPU, '') is None
+
+
+def test_oom_markers():
+    limits = Limits(memory=100)
+
+    assert limits.classify(1, 'Traceback ...\nMemoryError') == 'oom'
+    assert limits.classify(0, 'MemoryError') is None
+    assert Limits().classify(1, 'MemoryError') is None
+
+
+def test_external_kill_is_not_timeout(tmp_path):
+    exit_code, _ = run_command(['sh', '-c', 'kill -9 $$'], Path(tmp_path), limits=Limits(cpu_time=10))
+
+    assert exit_code == -signal.SIGKILL
@@ -0,0 +1,142 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import json
+import subprocess
+
+from pathlib import Path
+from threading import Thread
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+from conftest import make_test as make_shell_test, ShellReducer
+from redubear.benchmark import Benchmark, Coordinator
+from redubear.benchmark.remote import Agent
+from redubear.utils import SizeMetrics
+
+
+def reduce(name: str, tag: str, run_id: str, oracle: Path, input_file: Path, output: Path, temp: Path,
+           cpus=None, verdict_cache: Path = None, result_cache: Path = None) -> dict:
+    """
+    Stand-in of run_single: runs the oracle once and keeps the input as the output.
+    """
+    out_dir = output / name / tag
+    out_dir.mkdir(parents=True, exist_ok=True)
+    exit_code = subprocess.call([str(oracle), str(input_file)])
+    (out_dir / input_file.name).write_bytes(input_file.read_bytes())
+    return {name: {'exit_code': exit_code, 'path_output': str(out_dir / input_file.name)}}
+
+
+def make_test(root: Path, name: str, delay: float) -> tuple[Path, Path]:
+    directory = root / name
+    directory.mkdir(parents=True)
+    oracle = directory / 'test.sh'
+    oracle.write_text(f'#!/bin/sh\nsleep {delay}\ngrep -q bug "$1"\n')
+    oracle.chmod(0o755)
+    input_file = directory / 'input.c'
+    input_file.write_text(f'int {name}() {{ bug(); }}\n')
+    return oracle, input_file
+
+
+def post(url: str, body: dict, data: bytes = None, method: str = 'POST') -> tuple[int, dict]:
+    request = Request(url, data=data if data is not None else json.dumps(body).encode(), method=method)
+    with urlopen(request, timeout=10) as response:
+        content = response.read()
+        return response.status, json.loads(content) if content else None
+
+
+@pytest.fixture
+def coordinator():
+    coordinator = Coordinator('127.0.0.1:0', lease_timeout=1.5)
+    yield coordinator
+    coordinator.shutdown(wait=False)
+
+
+def test_agents(tmp_path, coordinator):
+    url = f'http://127.0.0.1:{coordinator.server.server_port}'
+    output = tmp_path / 'output'
+
+    lost = coordinator.submit(reduce, 'lost', 'tag', None, *make_test(tmp_path / 'tests', 'lost', 0), output, tmp_path / 'temp')
+    # An agent leases the first job and is killed before it reports.
+    status, job = post(f'{url}/lease', {'agent': 'killed'})
+    assert status == 200 and job['id'] == '0'
+
+    # Runs longer than the lease, kept alive by the heartbeats.
+    slow = coordinator.submit(reduce, 'slow', 'tag', None, *make_test(tmp_path / 'tests', 'slow', 3), output, tmp_path / 'temp')
+
+    agents = [Agent(url, 1, tmp_path / name, name=name, heartbeat=.3, poll=.1) for name in ['a1', 'a2']]
+    exit_codes = dict()
+    threads = [Thread(target=lambda agent=agent: exit_codes.update({agent.name: agent.run()})) for agent in agents]
+    for thread in threads:
+        thread.start()
+
+    lost_result = lost.result(timeout=30)['lost']
+    slow_result = slow.result(timeout=30)['slow']
+
+    assert coordinator.jobs['0']['attempts'] == 2
+    assert lost_result['agent'] in ['a1', 'a2']
+    assert coordinator.jobs['1']['attempts'] == 1
+    assert slow_result['agent'] in ['a1', 'a2']
+
+    # The artifacts are uploaded and the results point to them.
+    for result in [lost_result, slow_result]:
+        assert result['exit_code'] == 0
+        assert Path(result['path_output']).parent.parent.parent == output
+        assert 'bug' in Path(result['path_output']).read_text()
+
+    # The late uploads and the late result of the killed agent are rejected.
+    with pytest.raises(HTTPError) as error:
+        post(f'{url}/artifact/0/input.c?agent=killed', None, data=b'stale', method='PUT')
+    assert error.value.code == 409
+    assert 'stale' not in Path(lost_result['path_output']).read_text()
+
+    status, response = post(f'{url}/result/0', {'agent': 'killed', 'out_dir': '/nonexistent', 'result': {'lost': {'exit_code': 1}}})
+    assert status == 200 and response == {'accepted': False}
+    assert lost.result()['lost']['exit_code'] == 0
+
+    coordinator.shutdown()
+    for thread in threads:
+        thread.join(timeout=30)
+    assert exit_codes == {'a1': 0, 'a2': 0}
+
+
+def test_result_of_another_agent_is_rejected(tmp_path, coordinator):
+    url = f'http://127.0.0.1:{coordinator.server.server_port}'
+    future = coordinator.submit(reduce, 'test', 'tag', None, *make_test(tmp_path / 'tests', 'test', 0), tmp_path / 'output', tmp_path / 'temp')
+    post(f'{url}/lease', {'agent': 'holder'})
+
+    with pytest.raises(HTTPError) as error:
+        post(f'{url}/result/0', {'agent': 'expired', 'out_dir': '/nonexistent', 'result': {'test': {'exit_code': 1}}})
+    assert error.value.code == 409
+    assert not future.done()
+
+
+def test_benchmark_on_agents(tmp_path, coordinator):
+    url = f'http://127.0.0.1:{coordinator.server.server_port}'
+    tests = [make_shell_test(tmp_path / 'tests', 'good', 'bug();\nint x;\n'), make_shell_test(tmp_path / 'tests', 'bad', 'int x;\n')]
+    # The reducer and the size metrics are pickled with run_single to the agents.
+    executor = Benchmark(tests, ShellReducer(), 'sh', 2, None, tmp_path / 'output', tmp_path / 'temp', False,
+                         size_metrics=SizeMetrics(tmp_path / 'sizes'), executor=coordinator)
+
+    agents = [Agent(url, 1, tmp_path / name, name=name, heartbeat=.3, poll=.1) for name in ['a1', 'a2']]
+    threads = [Thread(target=agent.run) for agent in agents]
+    for thread in threads:
+        thread.start()
+    report = executor.run()
+    for thread in threads:
+        thread.join(timeout=30)
+
+    good = report['good']
+    assert good['agent'] in ['a1', 'a2']
+    # The arguments are localized on the agent, the results point to the coordinator.
+    assert good['path_input'] == str(tests[0][2])
+    assert Path(good['path_output']) == tmp_path / 'output' / 'good' / 'sh' / 'input.c'
+    assert Path(good['path_output']).read_text() == 'bug();\n'
+    assert good['bytes_input'] == 14 and good['bytes_output'] == 7
+    assert report['bad']['error'] == 3
+    assert not (tests[0][2].parent / 'pids').exists()
@@ -0,0 +1,32 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import pytest
+
+from redubear.utils import ReportGenerator
+
+
+def test_json_round_trip(tmp_path):
+    report = {'a': {'runtime': 1.5, 'tests_started': 10}}
+    ReportGenerator.dump(report, tmp_path / 'report.json')
+
+    assert ReportGenerator.read(tmp_path / 'report.json') == report
+
+
+def test_sqlite_runs_of_a_tag(tmp_path):
+    database = tmp_path / 'results.db'
+    ReportGenerator.dump({'a': {'runtime': 1.}}, database, tag='x', reducer='picire')
+    ReportGenerator.dump({'a': {'runtime': 2.}}, database, tag='x', reducer='picire')
+
+    assert ReportGenerator.read(database, 'x')['a']['runtime'] == 2.
+
+
+@pytest.mark.parametrize('name', ['missing.db', 'missing.sqlite', 'missing.json'])
+def test_missing_report(tmp_path, name):
+    with pytest.raises(FileNotFoundError):
+        ReportGenerator.read(tmp_path / name)
+
+    assert not (tmp_path / name).exists()
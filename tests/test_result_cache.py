@@ -0,0 +1,126 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import json
+import platform
+import shutil
+
+import pytest
+
+from redubear.benchmark import ResultCache
+from redubear.reducers import Perses, Picire
+
+
+def picire(**options):
+    arguments = dict(atom='line', dd_star=False, greeddy=False, cache='config', cache_fail=False,
+                     evict_after_fail=True, jobs=1, measure_memory=False)
+    arguments.update(options)
+    return Picire(**arguments)
+
+
+@pytest.fixture
+def test_dir(tmp_path):
+    directory = tmp_path / 'test'
+    directory.mkdir()
+    (directory / 'test.sh').write_text('#!/bin/sh\ngrep -q bug "$1"\n')
+    (directory / 'input.c').write_text('int main() { bug(); }\n')
+    return directory
+
+
+def fingerprint(test_dir, reducer=None, settings=None):
+    return ResultCache.fingerprint(reducer or picire(), test_dir / 'test.sh', test_dir / 'input.c', settings or {'run_id': None})
+
+
+def test_fingerprint_is_stable(test_dir):
+    assert fingerprint(test_dir) == fingerprint(test_dir)
+
+
+def test_fingerprint_ignores_the_location(test_dir, tmp_path):
+    copy = tmp_path / 'copy'
+    copy.mkdir()
+    for path in test_dir.iterdir():
+        (copy / path.name).write_bytes(path.read_bytes())
+
+    assert fingerprint(test_dir) == fingerprint(copy)
+
+
+def test_fingerprint_depends_on_the_inputs(test_dir):
+    original = fingerprint(test_dir)
+
+    assert fingerprint(test_dir, reducer=picire(jobs=4)) != original
+    assert fingerprint(test_dir, settings={'run_id': 'rep-0'}) != original
+
+    (test_dir / 'helper.py').write_text('print()\n')
+    helper = fingerprint(test_dir)
+    assert helper != original
+
+    (test_dir / 'input.c').write_text('int main() { bug(); bug(); }\n')
+    assert fingerprint(test_dir) != helper
+
+
+def test_fingerprint_ignores_the_reducer_artifacts(test_dir, tmp_path):
+    jar = tmp_path / 'perses.jar'
+    jar.write_bytes(b'jar')
+    perses = Perses(jar, jar, 'COMPACT_QUERY_CACHE', 1)
+    original = fingerprint(test_dir, reducer=perses)
+
+    # Written by a concurrent reduction of the same test.
+    (test_dir / 'input.1700000000000.orig').write_text('int main() {}\n')
+    assert fingerprint(test_dir, reducer=perses) == original
+
+
+def test_fingerprint_depends_on_the_host(test_dir, monkeypatch):
+    original = fingerprint(test_dir)
+    monkeypatch.setattr(platform, 'node', lambda: 'another-host')
+
+    assert fingerprint(test_dir) != original
+
+
+def test_store_and_load(tmp_path):
+    out_dir = tmp_path / 'out' / 'a' / 'tag'
+    out_dir.mkdir(parents=True)
+    (out_dir / 'input.c').write_text('bug();\n')
+    (out_dir / 'picire.json').write_text(json.dumps({'runtime': 1., 'path_output': str(out_dir / 'input.c')}))
+
+    cache = ResultCache(tmp_path / 'cache')
+    assert cache.load('0123', tmp_path / 'other') is None
+    cache.store('0123', out_dir)
+
+    stats = cache.load('0123', tmp_path / 'other')
+    assert stats['runtime'] == 1.
+    assert stats['path_output'] == str(tmp_path / 'other' / 'input.c')
+    assert (tmp_path / 'other' / 'input.c').read_text() == 'bug();\n'
+
+
+def test_load_during_store_is_a_miss(tmp_path, monkeypatch):
+    out_dir = tmp_path / 'out'
+    out_dir.mkdir()
+    (out_dir / 'picire.json').write_text(json.dumps({'runtime': 1.}))
+    cache = ResultCache(tmp_path / 'cache')
+    cache.store('0123', out_dir)
+
+    # Another worker renames the entry aside to replace it while it is copied.
+    entry = tmp_path / 'cache' / '01' / '0123'
+    copy2 = shutil.copy2
+
+    def replaced(source, destination):
+        entry.rename(entry.with_name('0123.1.old'))
+        return copy2(source, destination)
+
+    monkeypatch.setattr(shutil, 'copy2', replaced)
+    assert cache.load('0123', tmp_path / 'other') is None
+
+
+def test_store_replaces_the_entry(tmp_path):
+    out_dir = tmp_path / 'out'
+    out_dir.mkdir()
+    cache = ResultCache(tmp_path / 'cache')
+    for runtime in [1., 2.]:
+        (out_dir / 'picire.json').write_text(json.dumps({'runtime': runtime}))
+        cache.store('0123', out_dir)
+
+    assert cache.load('0123', tmp_path / 'other')['runtime'] == 2.
+    assert [path.name for path in (tmp_path / 'cache' / '01').iterdir()] == ['0123']
@@ -0,0 +1,76 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import sys
+
+from pathlib import Path
+
+from redubear.memory import ProcSampler
+from redubear.utils import run_command, run_in_process, ResourceUsage
+
+SPIN = 'import time\ndef spin():\n    end = time.time() + 0.3\n    while time.time() < end:\n        pass\n'
+
+
+def measure(code: str, tmp_path) -> dict:
+    usage = ResourceUsage()
+    exit_code, _ = run_command([sys.executable, '-c', code], Path(tmp_path), usage=usage)
+    assert exit_code == 0
+    return usage.get()
+
+
+def test_single_threaded_reducer_is_split(tmp_path):
+    stats = measure(SPIN + 'import subprocess\nsubprocess.call(["true"])\nspin()\n', tmp_path)
+
+    assert stats['cpu_user_reducer_s'] > 0
+    assert stats['nvcsw_reducer'] + stats['nvcsw_sut'] == stats['nvcsw']
+    assert stats['nivcsw_reducer'] + stats['nivcsw_sut'] == stats['nivcsw']
+
+
+def test_context_switches_of_multithreaded_reducer_are_not_split(tmp_path):
+    stats = measure(SPIN + 'import threading\nthread = threading.Thread(target=spin)\nthread.start()\nthread.join()\n', tmp_path)
+
+    assert stats['cpu_user_reducer_s'] > 0
+    assert 'nvcsw' in stats and 'nvcsw_reducer' not in stats and 'nvcsw_sut' not in stats
+    assert 'nivcsw_reducer' not in stats
+
+
+def test_counters_are_not_split_without_reducer_usage():
+    usage = ResourceUsage()
+    usage.tree = {'user': 1., 'sys': 0., 'majflt': 0, 'nvcsw': 10, 'nivcsw': 5}
+    usage.maxrss_tree = 2048
+
+    assert usage.get() == {'cpu_user_s': 1., 'cpu_sys_s': 0., 'majflt': 0, 'nvcsw': 10, 'nivcsw': 5, 'maxrss_tree': 2.}
+
+
+def test_in_process_peak_is_per_run(tmp_path):
+    def allocate(size):
+        def run():
+            data = bytearray(size)
+            data[::4096] = b'x' * len(data[::4096])
+        return run
+
+    usage = ResourceUsage()
+    run_in_process(allocate(256 << 20), Path(tmp_path), usage=usage)
+    large = usage.get()
+    usage = ResourceUsage()
+    run_in_process(allocate(1 << 20), Path(tmp_path), usage=usage)
+    small = usage.get()
+
+    # The lifetime peak of the worker (ru_maxrss) is not reported as the peak of the run.
+    assert 'maxrss_tree' not in small and small['maxrss_sut'] is None
+    assert small['maxrss_reducer'] < large['maxrss_reducer'] - 200
+
+
+def test_peak_only_sampler(tmp_path):
+    sampler = ProcSampler(0.05, peak_only=True)
+    code = 'import time\ndata = bytearray(64 << 20)\ndata[::4096] = b"x" * len(data[::4096])\ntime.sleep(0.5)\n'
+    try:
+        run_command([sys.executable, '-c', code], Path(tmp_path), on_start=sampler.start)
+    finally:
+        sampler.stop()
+
+    assert sampler.peak_hwm > 64 * 1024
+    assert sampler.samples == [] and sampler.peak_pss == 0
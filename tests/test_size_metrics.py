@@ -0,0 +1,48 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+from redubear.benchmark import Benchmark
+from redubear.utils import SizeMetrics
+
+
+def test_measure(tmp_path):
+    path = tmp_path / 'input.txt'
+    path.write_text('int main() {\n  bug();\n}')
+
+    assert SizeMetrics(tmp_path / 'cache').measure(path) == {'bytes': 23, 'nws': 17, 'lines': 3}
+
+
+def test_tokens(tmp_path, word_lexer):
+    path = tmp_path / 'input.c'
+    path.write_text('int main ( ) #comment\n{ bug ( ) ; }\n')
+
+    metrics = SizeMetrics(tmp_path / 'cache')
+    metrics.lexers['c'] = word_lexer
+    assert metrics.counts_tokens(path)
+    assert metrics.measure(path)['tokens'] == 10
+
+
+def test_memoized(tmp_path, word_lexer):
+    path = tmp_path / 'input.c'
+    path.write_text('a b c\n')
+
+    metrics = SizeMetrics(tmp_path / 'cache')
+    metrics.lexers['c'] = word_lexer
+    assert metrics.measure(path)['tokens'] == 3
+
+    # A new instance (e.g., of another worker) reads the memoized result.
+    class UnusedLexer(word_lexer):
+        def __init__(self, stream):
+            raise AssertionError('the file is lexed again')
+
+    metrics = SizeMetrics(tmp_path / 'cache')
+    metrics.lexers['c'] = UnusedLexer
+    assert metrics.measure(path) == {'bytes': 6, 'nws': 3, 'lines': 1, 'tokens': 3}
+
+
+def test_benchmark_default(tmp_path):
+    benchmark = Benchmark([], None, 'tag', 1, None, tmp_path / 'out', tmp_path / 'temp', False)
+    assert isinstance(benchmark.size_metrics, SizeMetrics)
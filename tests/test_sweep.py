@@ -0,0 +1,86 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import pytest
+
+from redubear.benchmark.sweep import config_tag, expand, load_spec, parse_axis, remove_options, to_arguments
+from redubear.cli import parse_args, sweep_variants
+from redubear.utils import get_logger
+
+
+def test_expand_axes_and_configs():
+    configs = expand({'axes': {'cache': ['config', 'none'], 'jobs': [1, 4]},
+                      'configs': [{'tag': 'special', 'atom': 'char'}]})
+
+    assert configs == [
+        {'cache': 'config', 'jobs': 1},
+        {'cache': 'config', 'jobs': 4},
+        {'cache': 'none', 'jobs': 1},
+        {'cache': 'none', 'jobs': 4},
+        {'tag': 'special', 'atom': 'char'},
+    ]
+
+
+def test_expand_empty():
+    assert expand({}) == []
+
+
+def test_parse_axis():
+    assert parse_axis('cache=config,config-tuple') == ('cache', ['config', 'config-tuple'])
+    assert parse_axis('dd_star=true,false') == ('dd_star', [True, False])
+    with pytest.raises(Exception):
+        parse_axis('cache')
+
+
+def test_to_arguments():
+    assert to_arguments({'tag': 'x', 'jobs': 4, 'dd_star': True, 'greeddy': False, 'cache': None}) == ['--jobs', '4', '--dd-star']
+    assert to_arguments({'phase': ['prune', 'hoist']}, {'--phase': ['--phase']}) == ['--phase', 'prune', '--phase', 'hoist']
+
+
+def test_remove_options():
+    argv = ['picireny', '--phase', 'prune', '--jobs', '2', '--phase=hoist']
+
+    assert remove_options(argv, ['--phase']) == ['picireny', '--jobs', '2']
+    assert remove_options(['picire', '--dd-star', '--jobs', '2'], [], ['--dd-star']) == ['picire', '--jobs', '2']
+
+
+def test_config_tag():
+    assert config_tag('T', {'cache': 'config-tuple', 'jobs': 4}) == 'T-cache=config-tuple-jobs=4'
+    assert config_tag('T', {'tag': 'named', 'jobs': 4}) == 'named'
+    assert config_tag('T', {'a': 'x/y z'}) == 'T-a=x_y_z'
+
+
+def test_load_toml_spec(tmp_path):
+    spec = tmp_path / 'sweep.toml'
+    spec.write_text('[axes]\njobs = [1, 2]\n')
+
+    assert load_spec(spec) == {'axes': {'jobs': [1, 2]}}
+
+    spec.write_text('[other]\njobs = [1, 2]\n')
+    with pytest.raises(Exception):
+        load_spec(spec)
+
+
+def test_repeatable_options_are_replaced():
+    argv = ['-t', 'T', '--set', 'phase=prune,hoist', 'picireny', '--phase', 'coarse-prune']
+    variants = sweep_variants(parse_args(argv), argv, get_logger('ReduBear'))
+
+    assert {tag: args.phase for tag, args in variants.items()} == {'T-phase=prune': ['prune'], 'T-phase=hoist': ['hoist']}
+
+
+def test_identical_configurations_run_once():
+    argv = ['-t', 'T', '--set', 'cache=config,config-tuple,config', 'picire']
+    variants = sweep_variants(parse_args(argv), argv, get_logger('ReduBear'))
+
+    assert {tag: args.cache for tag, args in variants.items()} == {'T-cache=config': 'config', 'T-cache=config-tuple': 'config-tuple'}
+
+
+def test_false_turns_off_flags_of_the_command_line():
+    argv = ['-t', 'T', '--set', 'dd_star=true,false', 'picire', '--dd-star', '--greeddy']
+    variants = sweep_variants(parse_args(argv), argv, get_logger('ReduBear'))
+
+    assert {tag: (args.dd_star, args.greeddy) for tag, args in variants.items()} == \
+        {'T-dd_star=True': (True, True), 'T-dd_star=False': (False, True)}
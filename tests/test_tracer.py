@@ -0,0 +1,27 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import json
+
+from redubear.oracle import OracleTracer
+
+
+def test_get(tmp_path):
+    tracer = OracleTracer(tmp_path)
+    # Calls of 1 to 5 seconds, the last two overlap the previous ones.
+    calls = [(0, 1), (1, 3), (3, 6), (4, 8), (5, 10)]
+    tracer.trace_file.write_text(''.join(json.dumps({'start': int(start * 1e9), 'end': int(end * 1e9)}) + '\n'
+                                         for start, end in calls))
+
+    stats = tracer.get(12., 2)
+    assert stats['calls'] == 5
+    assert stats['latency_mean (s)'] == 3.
+    assert stats['latency_median (s)'] == 3.
+    # Nearest rank: the maximum of the five calls.
+    assert stats['latency_p95 (s)'] == 5.
+    assert stats['time_oracle_busy (s)'] == 10.
+    assert stats['time_outside_oracle (s)'] == 2.
+    assert stats['utilization'] == 0.625
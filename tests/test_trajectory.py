@@ -0,0 +1,80 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import json
+import subprocess
+import time
+
+from redubear.oracle import OracleCheckpoint
+from redubear.oracle.checkpoint import trajectory_metrics
+from redubear.utils import SizeMetrics
+
+
+def test_trajectory_metrics():
+    metrics = trajectory_metrics([(0., 100), (1., 50), (3., 10), (6., 0)], 10.)
+
+    assert metrics['time_to_50% (s)'] == 1.
+    assert metrics['time_to_90% (s)'] == 3.
+    assert metrics['time_to_95% (s)'] == 6.
+    assert metrics['time_to_99% (s)'] == 6.
+    # (100 * 1 + 50 * 2 + 10 * 3 + 0 * 4) / (100 * 10)
+    assert metrics['auc'] == 0.23
+
+
+def test_trajectory_metrics_without_reduction():
+    metrics = trajectory_metrics([(0., 100), (5., 100)], 5.)
+
+    assert metrics['time_to_50% (s)'] == 0.
+    assert metrics['auc'] == 1.
+
+
+def test_trajectory_metrics_of_empty_runs():
+    assert trajectory_metrics([(0., 0), (0., 0)], 0.)['auc'] is None
+    assert trajectory_metrics([(0., 100), (0., 10)], 0.)['auc'] is None
+
+
+def test_get_trajectory(tmp_path):
+    input_file = tmp_path / 'input.c'
+    input_file.write_bytes(b'x' * 100)
+    output_file = tmp_path / 'output.c'
+    output_file.write_bytes(b'x' * 10)
+
+    checkpoint = OracleCheckpoint(tmp_path, trajectory=True)
+    start = 1000.
+    # Out of order (parallel oracle calls), a non-improving point and one after the end.
+    checkpoint.trajectory.write_text('\n'.join(json.dumps({'time': int(seconds * 1e9), 'bytes': size})
+                                               for seconds, size in [(1003., 20), (1001., 50), (1002., 60), (1020., 15)]) + '\nbroken\n')
+
+    trajectory = checkpoint.get_trajectory(start, 10., input_file, output_file)
+    assert trajectory['series'] == [[0., 100], [1., 50], [3., 20], [10., 15], [10., 10]]
+    assert trajectory['time_to_50% (s)'] == 1.
+    assert trajectory['time_to_90% (s)'] == 10.
+
+
+def test_tokens_of_kept_candidates(tmp_path, word_lexer):
+    oracle = tmp_path / 'test.sh'
+    oracle.write_text('#!/bin/sh\ngrep -q bug "$1"\n')
+    oracle.chmod(0o755)
+    input_file = tmp_path / 'input.c'
+    input_file.write_text('a b c d bug e f\n')
+    (tmp_path / 'temp').mkdir()
+
+    checkpoint = OracleCheckpoint(tmp_path / 'temp', trajectory=True, keep_candidates=True)
+    shim = checkpoint.wrap(oracle, input_file)
+    start = time.time()
+    candidate = tmp_path / 'candidate.c'
+    for content in ['a b bug e f\n', 'x\n', 'bug e\n']:
+        candidate.write_text(content)
+        subprocess.call([str(shim), str(candidate)])
+    runtime = time.time() - start + 1.
+
+    metrics = SizeMetrics(tmp_path / 'cache')
+    metrics.lexers['c'] = word_lexer
+    trajectory = checkpoint.get_trajectory(start, runtime, input_file, candidate, metrics)
+
+    # The copies keep the extension of the input, hence their tokens are counted too.
+    assert [path.suffix for path in checkpoint.candidates.iterdir()] == ['.c', '.c']
+    assert [point[1:] for point in trajectory['series']] == [[16, 7], [12, 5], [6, 2]]
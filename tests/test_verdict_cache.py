@@ -0,0 +1,65 @@
+# Copyright (c) 2024 Daniel Vince.
+#
+# Licensed under the BSD 3-Clause License
+# <LICENSE.md or https://opensource.org/licenses/BSD-3-Clause>.
+# This file may not be copied, modified, or distributed except
+# according to those terms.
+import sqlite3
+
+from redubear.oracle import OracleCache, VerdictStore
+
+
+def test_lookup(tmp_path):
+    store = VerdictStore(tmp_path / 'verdicts.db')
+    store.put('a', 0, 1.5)
+
+    assert store.get('a') == (0, 1.5)
+    assert store.get('b') is None
+
+
+def test_least_recently_used_are_evicted(tmp_path):
+    store = VerdictStore(tmp_path / 'verdicts.db', max_entries=3)
+    for key in 'abc':
+        store.put(key, 0)
+    store.get('a')
+    store.put('d', 1)
+
+    assert store.size() == 3
+    assert store.get('b') is None
+    assert store.get('a') is not None
+
+
+def test_updates_are_not_counted(tmp_path):
+    store = VerdictStore(tmp_path / 'verdicts.db')
+    store.put('a', 0)
+    store.put('a', 1)
+
+    assert store.size() == 1
+    assert store.get('a') == (1, None)
+
+
+def test_store_without_counter_is_migrated(tmp_path):
+    path = tmp_path / 'verdicts.db'
+    with sqlite3.connect(path) as connection:
+        connection.execute('CREATE TABLE verdicts (key TEXT PRIMARY KEY, verdict INTEGER NOT NULL, last_used REAL NOT NULL)')
+        connection.executemany('INSERT INTO verdicts VALUES (?, ?, ?)', [('a', 0, 1.), ('b', 1, 2.)])
+
+    store = VerdictStore(path)
+    store.put('c', 0, 0.5)
+
+    assert store.size() == 3
+    assert store.get('a') == (0, None)
+    assert store.get('c') == (0, 0.5)
+
+
+def test_counters(tmp_path):
+    cache = OracleCache(tmp_path, tmp_path / 'verdicts.db', 10)
+    cache.counters.write_text('m 0.05 1.0\nh 0.05 1.0\nh 0.05 1.0\nm 0.05 3.0\n')
+
+    stats = cache.get()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 2
+    assert stats['hit_rate'] == 0.5
+    assert stats['overhead (s)'] == 0.2
+    assert stats['oracle_latency (s)'] == 2.
+    assert stats['saved (s)'] == 1.8